@@ -7,6 +7,12 @@ DATA_DIR = os.path.join(ROOT_DIR, 'data')
 RECORDS_DIR = os.path.join(DATA_DIR, 'records')
 os.makedirs(RECORDS_DIR, exist_ok=True)
 # --- end data dir snippet ---
+
+# Make `import homeolabel.*` work when this file is run directly (python src/homeolabel/app.py)
+import sys
+SRC_DIR = os.path.dirname(PACKAGE_DIR)
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
 # homeo_label_printer_font9_responsive.py
 """
 Responsive Homeopathy Label Generator
@@ -17,29 +23,43 @@ Responsive Homeopathy Label Generator
 
 Notes:
 - The UI scales based on two factors: the monitor DPI scaling (from Qt) and a window-size ratio.
+- Medicine search matches any part of a name, except for catalogs of LARGE_CATALOG_ROWS
+  rows or more: those are served from the on-disk string table (sstable.py), which
+  matches word starts only. The search box placeholder says which mode is on.
 - Avoids setFixedWidth/Height for critical widgets; uses minimum sizes + expanding policies.
 """
-import sys
-import os
-
+import copy
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from PyQt5 import QtWidgets, QtCore, QtGui
+from PyQt5 import QtWidgets, QtCore
 from PyQt5.QtWidgets import QCompleter, QTableWidgetItem, QMessageBox, QSizePolicy
-from pathlib import Path
 import platform
-import win32print
-import win32ui
-import win32api
-import win32con
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import mm
+try:
+    import win32print
+except ImportError:
+    win32print = None  # Linux / SKIP_WIN32 runs (loadtest.py): no printer enumeration
+from homeolabel.labeljob import LabelJob
+from homeolabel.geometry import ProfileStore
+from homeolabel.preview import LabelPreview
+from homeolabel.catalog import CatalogIndex, load_remedies_frame, frame_rows, split_aliases, ALIAS_COL
+from homeolabel.catalogwatch import CatalogWatcher
+from homeolabel.catalogimport import import_catalog
+from homeolabel.snapshot import load_snapshot, save_snapshot, source_stamp, remove_stale_temp_files
+from homeolabel.sstable import latest_string_table, write_string_table, LARGE_CATALOG_ROWS
+from homeolabel.labelcache import RenderCache, render_label_cached
+from homeolabel.prerender import Prerenderer
+from homeolabel.spooler import BackgroundSpooler, PdfPrinterBackend, PrintJob, PrintUncertain
+from homeolabel.printerpool import PrinterPool, POOL_NAME, load_pool_config, save_pool_config
+from homeolabel.logsetup import setup_logging
+from homeolabel.memwatch import MemoryWatch
+from homeolabel.printerhealth import PrinterHealthMonitor, HealthCheckedBackend, READY, BUSY
+from homeolabel.printhelper import HelperPrinterBackend, HELPER_FLAG, main as print_helper_main
+from homeolabel.raster import RawRoutingBackend
 import traceback
 import tempfile
 import time
-import subprocess
-import shutil
 
 # Enable Qt high-DPI scaling before creating QApplication
 try:
@@ -56,10 +76,11 @@ if platform.system() == "Windows":
     except Exception:
         pass
 
-# Ensure records dir + logging
+# Ensure records dir + logging (queued: file writes happen on the listener thread, rotated by size + day).
+# A frozen build re-runs this module as the print helper; it gets its own log so two processes
+# never rotate the same file.
 os.makedirs("records", exist_ok=True)
-logging.basicConfig(filename="records/error_log.txt", level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+setup_logging("records/print_helper_log.txt" if HELPER_FLAG in sys.argv else "records/error_log.txt")
 
 
 def get_system_scaling(app=None):
@@ -78,173 +99,41 @@ def get_system_scaling(app=None):
         return 1.0
 
 
-def fit_lines_to_box(lines, c, fontname, base_fontsize, max_width_mm, min_fontsize=6):
-    out_lines = []
-    max_width = max_width_mm * mm
-    for text in lines:
-        words = str(text).split()
-        if not words:
-            out_lines.append(("", base_fontsize))
-            continue
-        running = words[0]
-        font_size = base_fontsize
-        for word in words[1:]:
-            test_str = running + " " + word
-            c.setFont(fontname, font_size)
-            str_width = c.stringWidth(test_str, fontname, font_size)
-            if str_width <= max_width:
-                running = test_str
-            else:
-                actual_size = font_size
-                while actual_size > min_fontsize and c.stringWidth(running, fontname, actual_size) > max_width:
-                    actual_size -= 1
-                out_lines.append((running, actual_size))
-                running = word
-        actual_size = font_size
-        while actual_size > min_fontsize and c.stringWidth(running, fontname, actual_size) > max_width:
-            actual_size -= 1
-        out_lines.append((running, actual_size))
-    return out_lines
-
-
-def split_medicine_name(name, potency, max_chars=18):
-    words = name.strip().split()
-    line1 = ""
-    line2 = ""
-    for word in words:
-        if len((line1 + " " + word).strip()) <= max_chars or not line1:
-            if line1:
-                line1 += " "
-            line1 += word
-        else:
-            if line2:
-                line2 += " "
-            line2 += word
-    if line2:
-        line2 = f"{line2} {potency}".strip()
-    else:
-        line2 = potency
-    return line1, line2
-
-
-# --- Sumatra detection + PDF->printer helper ---
-def find_sumatra_exe():
-    path_exe = shutil.which("SumatraPDF.exe") or shutil.which("sumatrapdf.exe") or shutil.which("SumatraPDF")
-    if path_exe:
-        return path_exe
-    program_files = [os.environ.get("ProgramFiles"), os.environ.get("ProgramFiles(x86)")]
-    for base in program_files:
-        if not base:
-            continue
-        candidate = os.path.join(base, "SumatraPDF", "SumatraPDF.exe")
-        if os.path.exists(candidate):
-            return candidate
-    script_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
-    for name in ("SumatraPDF.exe", "sumatrapdf.exe"):
-        c = os.path.join(script_dir, name)
-        if os.path.exists(c):
-            return c
-    return None
-
-
-def print_pdf_to_printer(pdf_path, printer_name, wait_seconds=2, log=logging):
-    if not os.path.exists(pdf_path):
-        raise FileNotFoundError(pdf_path)
-    if not printer_name:
-        raise ValueError("Printer name required")
-
-    args = f'"{printer_name}"'
-    try:
-        rc = win32api.ShellExecute(0, "printto", pdf_path, args, ".", 0)
-        rc_int = int(rc)
-        if rc_int > 32:
-            log.info(f"ShellExecute printto succeeded (code {rc_int}) for '{printer_name}'")
-            time.sleep(wait_seconds)
-            return True
-        else:
-            log.warning(f"ShellExecute returned code {rc_int}; falling back to Sumatra.")
-    except Exception as e:
-        log.warning(f"ShellExecute printto failed: {e}. Trying Sumatra fallback.")
-
-    sumatra = find_sumatra_exe()
-    if sumatra:
-        try:
-            cmd = [sumatra, "-print-to", printer_name, pdf_path]
-            log.info(f"Running Sumatra: {' '.join(cmd)}")
-            proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=40)
-            if proc.returncode == 0:
-                log.info("Sumatra printed successfully.")
-                time.sleep(wait_seconds)
-                return True
-            else:
-                stdout = proc.stdout.decode(errors="ignore")
-                stderr = proc.stderr.decode(errors="ignore")
-                log.error(f"Sumatra returned {proc.returncode}. stdout:{stdout} stderr:{stderr}")
-        except Exception as e:
-            log.error(f"Sumatra printing failed: {e}")
-
-    raise RuntimeError(
-        "Printing failed: ShellExecute(printto) failed and SumatraPDF fallback unavailable/failed. "
-        "Install SumatraPDF (portable) and place SumatraPDF.exe in Program Files or the application folder, "
-        "or configure a PDF viewer that supports the 'printto' verb. Alternatively open the PDF manually and print."
-    )
-
+class _SpoolEvents(QtCore.QObject):
+    # Carries spooler completions (daemon thread) back to the GUI thread
+    finished = QtCore.pyqtSignal(object, object)
 
-# --- GDI direct printing (safe CreateFont usage) ---
-def print_label_direct(printer_name, fit_lines, base_font_size=9, label_w_mm=50, label_h_mm=30):
-    if not printer_name:
-        raise ValueError("Printer name required")
-    hprinter = None
-    try:
-        hprinter = win32print.OpenPrinter(printer_name)
-        hDC = win32ui.CreateDC()
-        hDC.CreatePrinterDC(printer_name)
-        hDC.StartDoc("Homeopathy Label")
-        hDC.StartPage()
 
-        dpi_x = hDC.GetDeviceCaps(win32con.LOGPIXELSX)
-        dpi_y = hDC.GetDeviceCaps(win32con.LOGPIXELSY)
+class _PrinterEvents(QtCore.QObject):
+    # Carries printer status changes (health monitor thread) to the GUI thread
+    changed = QtCore.pyqtSignal(str, object)
 
-        page_width_px = int(label_w_mm / 25.4 * dpi_x)
-        page_height_px = int(label_h_mm / 25.4 * dpi_y)
 
-        margin_x = int(2 * dpi_x / 25.4)  # 2mm margin
-        margin_y = int(2 * dpi_y / 25.4)
+class _CatalogEvents(QtCore.QObject):
+    # Carries a hot-reloaded catalog index (watcher thread) to the GUI thread
+    reloaded = QtCore.pyqtSignal(object, object, int, int)
+    # A background remedies.xlsx save finished: (index, frame, medicine, error or "")
+    saved = QtCore.pyqtSignal(object, object, str, str)
+    # Remedy list import on the same worker: (rows done, total or None, rows/s), then
+    # (ImportResult, frame, index, source path, error or "")
+    import_progress = QtCore.pyqtSignal(int, object, float)
+    imported = QtCore.pyqtSignal(object, object, object, str, str)
 
-        # Draw rectangle border
-        hDC.Rectangle((margin_x, margin_y, page_width_px - margin_x, page_height_px - margin_y))
 
-        x_center = page_width_px // 2
-        y = margin_y + int(3 * dpi_y / 25.4)  # start ~3mm from top
-
-        for text, fontsize in fit_lines:
-            font_height = -int(fontsize * dpi_y / 72.0)
-            font_spec = {"name": "Arial", "height": font_height, "weight": 400}
-            try:
-                font = win32ui.CreateFont(font_spec)
-            except Exception:
-                font = win32ui.CreateFont({"name": "Arial", "height": font_height})
-            hDC.SelectObject(font)
-            text_width = hDC.GetTextExtent(text)[0]
-            hDC.TextOut(int(x_center - text_width // 2), int(y), text)
-            y += int(fontsize * dpi_y / 72.0 * 1.15)
-
-        hDC.EndPage()
-        hDC.EndDoc()
-        hDC.DeleteDC()
-    finally:
-        if hprinter:
-            try:
-                win32print.ClosePrinter(hprinter)
-            except Exception:
-                pass
+def _with_new_medicine(frame, med_name):
+    new_row = {'common_col': med_name, 'latin_col': med_name}
+    if ALIAS_COL in frame.columns:
+        new_row[ALIAS_COL] = ''
+    return pd.concat([frame, pd.DataFrame([new_row])], ignore_index=True)
 
 
 # ---------------- Main app (responsive UI + auto-print) ----------------
 class HomeoLabelApp(QtWidgets.QWidget):
     BASE_WINDOW = (1280, 720)  # reference size used to compute window ratio
 
-    def __init__(self, scaling=1.0):
+    def __init__(self, scaling=1.0, print_backend=None, status_backend=None):
+        # print_backend / status_backend: stand-ins for the helper process and the Win32
+        # status query (the load harness prints to spooler.FakePrinter)
         super().__init__()
         self.setWindowTitle("🏥 Homeopathy Label Generator (Responsive)")
         self.setWindowFlags(QtCore.Qt.Window)
@@ -253,13 +142,11 @@ class HomeoLabelApp(QtWidgets.QWidget):
         self.resize(*self.BASE_WINDOW)
 
         self.scaling = scaling if scaling and scaling > 0 else 1.0
-        self.base_print_font = 9
 
         # UI base sizes (pre-scaling)
         self._ui = {
             'search_font_pt': 14,
             'label_font_pt': 20,
-            'preview_font_pt': 15,
             'suggestion_font_pt': 13,
             'button_font_pt': 15,
             'control_font_pt': 12,
@@ -271,33 +158,198 @@ class HomeoLabelApp(QtWidgets.QWidget):
 
         self.records_folder = "records"
         os.makedirs(self.records_folder, exist_ok=True)
+        # Label stocks (size, margins, fonts) and which printer has which stock loaded
+        self.label_profiles = ProfileStore(os.path.join(self.records_folder, "label_profiles.json"))
+        self.label_geometry = self.label_profiles.get(None)
+        self.base_print_font = self.label_geometry.base_font_size
         self.excel_file = os.path.join(self.records_folder, 'records.xlsx')
         self.autocomplete_file = os.path.join(self.records_folder, 'autocomplete.json')
         self.remedies_file = 'remedies.xlsx'
         self.df_remedies = None
-        self.load_remedies()
-        self.autocomplete_data = self.load_autocomplete()
+        self.catalog = CatalogIndex([])
+        # Very large catalogs are served from a memory-mapped string table instead of RAM
+        self.table_dir = os.path.join(self.records_folder, "catalog_table")
+        # Warm start: reuse the prebuilt index / lists from the last run when their sources are unchanged
+        self.snapshot_dir = os.path.join(self.records_folder, "warm_start")
+        remove_stale_temp_files(self.snapshot_dir)
+        self.snapshot = load_snapshot(self.snapshot_dir)
+        warm_index = latest_string_table(self.table_dir, self.remedies_file)
+        if warm_index is not None and len(warm_index) < LARGE_CATALOG_ROWS:
+            warm_index.close()  # built under a lower HOMEOLABEL_LARGE_CATALOG_ROWS
+            warm_index = None
+        if warm_index is None and self.snapshot is not None and self.snapshot.fresh('remedies', self.remedies_file):
+            try:
+                warm_index = self.snapshot.catalog_index()
+            except Exception as e:
+                logging.warning(f"Snapshot catalog unusable, loading remedies.xlsx: {e}")
+        if warm_index is not None:
+            self.catalog = warm_index  # df_remedies is read from the xlsx only when it is needed
+            logging.info(f"Remedies loaded from {getattr(warm_index, 'path', None) or self.snapshot.path}")
+        else:
+            self.load_remedies()
+        self._autocomplete_stamp = source_stamp(self.autocomplete_file)
+        if self.snapshot is not None and self.snapshot.fresh('autocomplete', self.autocomplete_file):
+            self.autocomplete_data = self.snapshot.state.get('autocomplete', {})
+        else:
+            self.autocomplete_data = self.load_autocomplete()
         self.record_buffer = []
         self.auto_print_enabled = True
+        # Layout of the label currently shown in the preview; the print path reuses it
+        self.current_layout = None
+        # Repeat prescriptions reuse the already rendered label (memory LRU + records/label_cache)
+        self.render_cache = RenderCache(os.path.join(self.records_folder, "label_cache"))
+        # A complete label is rendered in the background while it sits in the preview; printing takes it
+        self.prerender = Prerenderer(self.render_cache)
+
+        # Print jobs go through a background spooler so a slow/stuck printer never blocks the UI
+        self.spool_folder = os.path.join(self.records_folder, "spool")
+        os.makedirs(self.spool_folder, exist_ok=True)
+        # Jobs are handed to a long-lived print helper process per printer; in-process printing is the fallback.
+        # Printers set to RAW in label_profiles.json get the 1-bit bitmap instead (raster.py)
+        self.print_backend = print_backend or RawRoutingBackend(
+            self.label_profiles.raw_settings,
+            HelperPrinterBackend(fallback=PdfPrinterBackend(base_font_size=self.base_print_font)))
+        # Printer status is polled in the background; a printer known to be offline fails at once
+        self._printer_events = _PrinterEvents()
+        self._printer_events.changed.connect(self._on_printer_status)
+        self.printer_health = PrinterHealthMonitor(
+            status_backend,
+            on_change=lambda printer, status: self._printer_events.changed.emit(printer, status))
+        self.spooler = BackgroundSpooler(HealthCheckedBackend(self.print_backend, self.printer_health),
+                                         timeout=60.0, max_retries=2)
+        self._spool_events = _SpoolEvents()
+        self._spool_events.finished.connect(self._on_print_job_finished)
+        # Counters with several identical printers can spread labels over them (records/printer_pool.json)
+        self.pool_file = os.path.join(self.records_folder, "printer_pool.json")
+        self.pool_enabled, self.pool_printers = load_pool_config(self.pool_file)
+        self._apply_pool()
+
+        # Pick up a new remedies.xlsx from head office without restarting the counter
+        self._catalog_events = _CatalogEvents()
+        self._catalog_events.reloaded.connect(self._on_catalog_reloaded)
+        self._catalog_events.saved.connect(self._on_catalog_saved)
+        self._catalog_events.import_progress.connect(self._on_import_progress)
+        self._catalog_events.imported.connect(self._on_imported)
+        # Rewriting remedies.xlsx takes seconds on a big list: one worker, so saves and imports land in order
+        self._catalog_saver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog-save")
+        self._import_progress = None
+        self.catalog_watcher = CatalogWatcher(
+            self.remedies_file, self.catalog,
+            lambda index, df, removed, added: self._catalog_events.reloaded.emit(index, df, len(removed),
+                                                                                len(added)),
+            rebuild=lambda records: write_string_table(self.table_dir, records, self.remedies_file))
+        self.catalog_watcher.start()
 
         self.init_ui()
+        self.printer_health.start()
         # Apply initial scaled styling
         self.apply_scaled_style()
+        if self.snapshot is not None and self.snapshot.state.get('geometry'):
+            self.restoreGeometry(QtCore.QByteArray.fromBase64(self.snapshot.state['geometry'].encode("ascii")))
+
+        # Snapshot is rewritten on clean exit and every few minutes in case the counter PC is switched off
+        # Serializing + fsync of a big catalog takes a while: written by one worker, in order
+        self._snapshot_written = None
+        self._snapshot_saver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot-save")
+        self.snapshot_timer = QtCore.QTimer(self)
+        self.snapshot_timer.timeout.connect(self.write_snapshot)
+        self.snapshot_timer.start(5 * 60 * 1000)
+
+        # HOMEOLABEL_MEMWATCH=1: tracemalloc + live Qt object counts into records/memory_report.txt
+        self.memwatch = None
+        if os.environ.get("HOMEOLABEL_MEMWATCH", "") not in ("", "0"):
+            self.memwatch = MemoryWatch(os.path.join(self.records_folder, "memory_report.txt")).start()
+            self.memwatch_timer = QtCore.QTimer(self)
+            self.memwatch_timer.timeout.connect(lambda: self.memwatch.sample("periodic"))
+            self.memwatch_timer.start(int(float(os.environ.get("HOMEOLABEL_MEMWATCH_INTERVAL", 300)) * 1000))
+            logging.info("Memory diagnostics on: records/memory_report.txt")
+
+    @property
+    def catalog(self):
+        return self._catalog
+
+    @catalog.setter
+    def catalog(self, index):
+        # Swapping between the in-memory index and the string table changes what a search
+        # matches; show it rather than switch silently
+        previous = getattr(self, '_catalog', None)
+        self._catalog = index
+        if previous is not None and previous.match_mode != index.match_mode:
+            logging.warning(f"Medicine search now matches {index.match_mode}s ({len(index)} remedies)")
+            self._show_search_mode()
+            if hasattr(self, 'status'):
+                self.status.setText(f"Medicine list has {len(index)} remedies: search now matches "
+                                    f"{index.match_mode}s.")
+
+    def _show_search_mode(self):
+        if not hasattr(self, 'medicine_search'):
+            return
+        if self.catalog.match_mode == "substring":
+            self.medicine_search.setPlaceholderText("Type medicine name (Latin or Common)")
+            self.medicine_search.setToolTip("Matches any part of the name or an alias")
+        else:
+            self.medicine_search.setPlaceholderText("Type the start of any word of the name (Latin or Common)")
+            self.medicine_search.setToolTip(f"Large medicine list ({LARGE_CATALOG_ROWS}+ remedies): "
+                                            f"matches the start of each word, e.g. 'vom' for Nux vomica")
 
     def load_remedies(self):
-        if not os.path.exists(self.remedies_file):
-            df = pd.DataFrame({
-                'latin_col': ['Arnica montana', 'Bryonia alba', 'Atropa belladonna'],
-                'common_col': ['Arnica', 'Bryonia', 'Belladonna']
-            })
-            df.to_excel(self.remedies_file, index=False, engine="openpyxl")
         try:
-            self.df_remedies = pd.read_excel(self.remedies_file, engine="openpyxl")
-            self.df_remedies.fillna('', inplace=True)
+            self.df_remedies = load_remedies_frame(self.remedies_file)
             logging.info("Remedies loaded successfully.")
         except Exception as e:
             logging.error(f"Failed to load remedies.xlsx: {e}")
             QMessageBox.critical(self, "Error", f"Failed to load remedies.xlsx:{e}")
+        if self.df_remedies is not None and len(self.df_remedies) >= LARGE_CATALOG_ROWS:
+            # Too big to hold on a low-RAM counter PC: build the on-disk table and drop the frame
+            self.catalog = write_string_table(self.table_dir, frame_rows(self.df_remedies), self.remedies_file)
+            self.df_remedies = None
+            return
+        self.catalog = CatalogIndex.from_dataframe(self.df_remedies)
+
+    def _on_catalog_reloaded(self, index, df, removed, added):
+        # GUI thread: swap in the index the watcher built; searches never see a half-built one
+        self.catalog = index
+        self.df_remedies = df if isinstance(index, CatalogIndex) else None
+        if self.medicine_search.text().strip():
+            self.update_suggestions()
+        self.status.setText(f"Medicine list updated (+{added} / -{removed}).")
+
+    def _remedies_frame(self):
+        # After a warm start the DataFrame is only needed when the catalog is edited
+        if self.df_remedies is None:
+            self.df_remedies = load_remedies_frame(self.remedies_file)
+        return self.df_remedies
+
+    def _snapshot_state(self):
+        printers = [self.printer_combo.itemText(i) for i in range(self.printer_combo.count())]
+        return {'autocomplete': self.autocomplete_data, 'printers': printers,
+                'printer': self.printer_combo.currentText(),
+                'geometry': bytes(self.saveGeometry().toBase64()).decode("ascii")}
+
+    def write_snapshot(self):
+        # GUI thread: gather the state; the worker serializes and writes it
+        try:
+            state = self._snapshot_state()
+            if self._snapshot_written == (self.catalog, state):
+                return  # nothing changed since the last write
+            # Stamps of the files this data was loaded from, not of what is on disk right now
+            sources = {'remedies': self.catalog_watcher.stamp, 'autocomplete': self._autocomplete_stamp}
+            # The index is immutable; the lists are copied so later edits don't race the write
+            written = (self.catalog, copy.deepcopy(state))
+            self._snapshot_written = written
+            self._snapshot_saver.submit(self._save_snapshot, sources, written)
+        except Exception as e:
+            logging.warning(f"Snapshot write failed: {e}")
+
+    def _save_snapshot(self, sources, written):
+        # Worker thread
+        catalog, state = written
+        try:
+            save_snapshot(self.snapshot_dir, sources, state, catalog if isinstance(catalog, CatalogIndex) else None)
+        except Exception as e:
+            logging.warning(f"Snapshot write failed: {e}")
+            if self._snapshot_written is written:
+                self._snapshot_written = None  # the next timer tick tries again
 
     def load_autocomplete(self):
         if os.path.exists(self.autocomplete_file):
@@ -336,11 +388,8 @@ class HomeoLabelApp(QtWidgets.QWidget):
             self.direct_print_btn.setStyleSheet(f"font-size:{sf(self._ui['button_font_pt'])}pt; padding:8px;")
             self.auto_print_checkbox.setStyleSheet(f"font-size:{sf(self._ui['control_font_pt'])}pt;")
             self.status.setStyleSheet(f"font-size:{sf(self._ui['control_font_pt'])}pt; color: darkgreen;")
-            # Preview labels font depends on calculated print fitting; set a reasonable default
-            for lbl in self.preview_labels:
-                lbl.setStyleSheet(f"font-size:{sf(self._ui['control_font_pt'])}pt;")
-            # Minimum sizes
-            self.preview_frame.setMinimumWidth(self._ui['preview_min_width'] * self.scaling)
+            # Minimum sizes (the preview scales its own fonts to the label)
+            self.label_preview.setMinimumWidth(int(self._ui['preview_min_width'] * self.scaling))
             self.suggestion_table.setMinimumWidth(self._ui['suggestion_min_width'] * self.scaling)
             self.suggestion_table.setMinimumHeight(self._ui['suggestion_min_height'] * self.scaling)
             self.suggestion_table.horizontalHeader().setDefaultSectionSize(max(80, int(self.width() * 0.25)))
@@ -355,8 +404,9 @@ class HomeoLabelApp(QtWidgets.QWidget):
         left_panel.setSpacing(self._ui['spacing'])
 
         self.medicine_search = QtWidgets.QLineEdit()
-        self.medicine_search.setPlaceholderText("Type medicine name (Latin or Common)")
+        self._show_search_mode()
         self.medicine_search.textChanged.connect(self.update_suggestions)
+        self.medicine_search.textChanged.connect(self.prerender.invalidate)
 
         lbl_find = QtWidgets.QLabel("Find Medicine")
         left_panel.addWidget(lbl_find)
@@ -381,6 +431,10 @@ class HomeoLabelApp(QtWidgets.QWidget):
         self.add_new_btn.setToolTip("Add a medicine not in the list")
         self.add_new_btn.clicked.connect(self.add_new_medicine)
         left_panel.addWidget(self.add_new_btn)
+        self.import_btn = QtWidgets.QPushButton("Import Remedy List")
+        self.import_btn.setToolTip("Add a supplier's CSV / Excel list; duplicates are skipped, conflicts reported")
+        self.import_btn.clicked.connect(self.import_medicines)
+        left_panel.addWidget(self.import_btn)
         left_panel.addStretch()
 
         right_panel = QtWidgets.QVBoxLayout()
@@ -429,34 +483,59 @@ class HomeoLabelApp(QtWidgets.QWidget):
 
         right_panel.addLayout(form)
 
-        # Preview frame - allow it to expand but set a sensible minimum
-        self.preview_frame = QtWidgets.QFrame()
-        self.preview_frame.setFrameShape(QtWidgets.QFrame.StyledPanel)
-        self.preview_frame.setStyleSheet("background-color:#f8f8f8; border:2px solid #888;")
-        self.preview_frame.setSizePolicy(QSizePolicy.Minimum, QSizePolicy.Minimum)
-        preview_layout = QtWidgets.QVBoxLayout(self.preview_frame)
-        self.preview_labels = []
-        for i in range(8):
-            lbl = QtWidgets.QLabel("")
-            lbl.setAlignment(QtCore.Qt.AlignCenter)
-            lbl.setWordWrap(True)
-            preview_layout.addWidget(lbl)
-            self.preview_labels.append(lbl)
+        # Preview - painted at true label proportions, expands with the panel
+        self.label_preview = LabelPreview(geometry=self.label_geometry)
 
         right_panel.addWidget(QtWidgets.QLabel("Label Preview"))
-        right_panel.addWidget(self.preview_frame)
+        right_panel.addWidget(self.label_preview)
 
         controls_layout = QtWidgets.QHBoxLayout()
         controls_layout.setSpacing(self._ui['spacing'])
-        controls_layout.addWidget(QtWidgets.QLabel(f"Font Size: {self.base_print_font}pt"))
+        self.font_size_label = QtWidgets.QLabel(f"Font Size: {self.base_print_font}pt")
+        controls_layout.addWidget(self.font_size_label)
         self.printer_combo = QtWidgets.QComboBox()
-        self.refresh_printers()
+        last_printers = self.snapshot.state.get('printers') if self.snapshot is not None else None
+        if last_printers:
+            # Last run's list now, the real enumeration (slow with network printers) once the window is up
+            self.printer_combo.addItems(last_printers)
+            self.printer_combo.setCurrentText(self.snapshot.state.get('printer', ''))
+            self.printer_health.watch(last_printers)
+            QtCore.QTimer.singleShot(0, self.refresh_printers)
+        else:
+            self.refresh_printers()
         controls_layout.addWidget(QtWidgets.QLabel("Printer:"))
         controls_layout.addWidget(self.printer_combo)
+        self.printer_state_label = QtWidgets.QLabel("")
+        self.printer_combo.currentTextChanged.connect(self._show_printer_state)
+        controls_layout.addWidget(self.printer_state_label)
+        controls_layout.addWidget(QtWidgets.QLabel("Label:"))
+        self.profile_combo = QtWidgets.QComboBox()
+        self.profile_combo.addItems(self.label_profiles.names())
+        self.profile_combo.setToolTip("Label stock loaded in this printer")
+        self.profile_combo.activated[str].connect(self._on_profile_chosen)
+        self.printer_combo.currentTextChanged.connect(self._apply_printer_profile)
+        controls_layout.addWidget(self.profile_combo)
         self.printer_refresh_btn = QtWidgets.QPushButton("Refresh")
         self.printer_refresh_btn.clicked.connect(self.refresh_printers)
         controls_layout.addWidget(self.printer_refresh_btn)
+        self.pool_checkbox = QtWidgets.QCheckBox("Pool")
+        self.pool_checkbox.setChecked(self.pool_enabled)
+        self.pool_checkbox.setToolTip("Send each label to the least busy printer of the pool")
+        self.pool_checkbox.toggled.connect(self.toggle_pool)
+        controls_layout.addWidget(self.pool_checkbox)
+        self.pool_btn = QtWidgets.QPushButton("Pool…")
+        self.pool_btn.setToolTip("Choose the printers in the pool")
+        self.pool_btn.clicked.connect(self.choose_pool_printers)
+        controls_layout.addWidget(self.pool_btn)
+        controls_layout.addWidget(QtWidgets.QLabel("Copies:"))
+        self.copies_input = QtWidgets.QSpinBox()
+        self.copies_input.setRange(1, 99)
+        self.copies_input.setValue(1)
+        self.copies_input.setToolTip("Print this many labels as one job")
+        self.copies_input.valueChanged.connect(lambda _value: self.update_preview())
+        controls_layout.addWidget(self.copies_input)
         right_panel.addLayout(controls_layout)
+        self._apply_printer_profile()
 
         self.auto_print_checkbox = QtWidgets.QCheckBox("Auto Print")
         self.auto_print_checkbox.setChecked(True)
@@ -501,38 +580,60 @@ class HomeoLabelApp(QtWidgets.QWidget):
         self.update_preview()
         if not self.auto_print_enabled:
             return
-        med_name = self.medicine_search.text().strip()
-        potency = self.potency_input.currentText().strip()
-        dose = self.dose_input.currentText().strip()
-        time_val = self.time_input.currentText().strip()
-        shop = self.shop_input.currentText().strip()
-        branch = self.branch_phone_input.currentText().strip()
-        if med_name and potency and dose and time_val and shop and branch:
+        if self.current_layout.job.complete:
             QtCore.QTimer.singleShot(150, self.print_label_and_direct)
 
+    def _current_label_fields(self):
+        return (self.medicine_search.text(), self.potency_input.currentText(),
+                self.dose_input.currentText(), self.time_input.currentText(),
+                self.shop_input.currentText(), self.branch_phone_input.currentText())
+
+    def _apply_printer_profile(self, printer=None):
+        # The selected printer's label stock drives the preview, the layout and the PDF size
+        geometry = self.label_profiles.for_printer(self.printer_combo.currentText())
+        self.profile_combo.setCurrentText(geometry.name)
+        if geometry == self.label_geometry:
+            return
+        self.label_geometry = geometry
+        self.base_print_font = geometry.base_font_size
+        self.font_size_label.setText(f"Font Size: {self.base_print_font}pt")
+        self.label_preview.set_geometry(geometry)
+        self.update_preview()
+
+    def _on_profile_chosen(self, name):
+        self.label_profiles.assign(self.printer_combo.currentText(), name)
+        self._apply_printer_profile()
+
+    def _current_layout(self):
+        # Laid out once per field change: reuse the preview's layout while the fields match
+        job = LabelJob(self._current_label_fields(), self.base_print_font, self.label_geometry)
+        if self.current_layout is None or self.current_layout.job != job:
+            self.current_layout = job.layout()
+        return self.current_layout
+
+    def _render_current_label(self, pdf_file, copies=1):
+        layout = self._current_layout()
+        rendered = self.prerender.take(layout.job, copies)
+        if rendered is None:
+            rendered = render_label_cached(self.render_cache, layout.job.fields,
+                                           base_font_size=layout.job.base_font_size, copies=copies,
+                                           fitlines=layout.lines, geometry=layout.job.geometry)
+        fitlines, pdf_bytes = rendered
+        with open(pdf_file, "wb") as f:
+            f.write(pdf_bytes)
+        return fitlines
+
     def print_label_and_direct(self):
-        med_name = self.medicine_search.text().strip().upper()
-        potency = self.potency_input.currentText().upper()
-        line1, line2 = split_medicine_name(med_name, potency, max_chars=18)
-        line3 = f"{self.dose_input.currentText()}   {self.time_input.currentText()}"
-        line4 = f"{self.shop_input.currentText()}"
-        line5 = f"{self.branch_phone_input.currentText()}"
-        raw_lines = [line1, line2, line3, line4, line5]
         try:
-            width_mm, height_mm = 50, 30
-            pdf_file = os.path.join(self.records_folder, "label.pdf")
-            c = canvas.Canvas(pdf_file, pagesize=(width_mm * mm, height_mm * mm))
-            c.setLineWidth(1)
-            c.rect(2 * mm, 2 * mm, (width_mm - 4) * mm, (height_mm - 4) * mm)
-            y = height_mm * mm - (0.12 * height_mm * mm)
-            fitlines = fit_lines_to_box(raw_lines, c, "Helvetica", self.base_print_font, max_width_mm=44)
-            for text, fsize in fitlines:
-                c.setFont("Helvetica", fsize)
-                c.drawCentredString((width_mm / 2) * mm, y, text)
-                y -= (fsize * 1.15)
-            c.save()
-            self.send_pdf_to_printer(pdf_file, fitlines)
-            self.status.setText("Label PDF generated and print attempted.")
+            fd, pdf_file = tempfile.mkstemp(prefix="label_", suffix=".pdf", dir=self.spool_folder)
+            os.close(fd)
+            copies = self.copies_input.value()
+            fitlines = self._render_current_label(pdf_file, copies=copies)
+            if not self.send_pdf_to_printer(pdf_file, fitlines, copies=copies):
+                os.remove(pdf_file)
+            elif copies > 1:
+                # Multi-copy is a per-prescription choice; don't carry it into the next label
+                self.copies_input.setValue(1)
         except Exception as e:
             logging.error(traceback.format_exc())
             QMessageBox.critical(self, "Error", f"Print failed: {e}")
@@ -541,54 +642,191 @@ class HomeoLabelApp(QtWidgets.QWidget):
     def manual_print_label_and_direct(self):
         self.print_label_and_direct()
 
-    def send_pdf_to_printer(self, pdf_file, fitlines):
-        self.refresh_printers()
+    def _pool_active(self):
+        return self.pool_enabled and len(self.pool_printers) > 1
+
+    def _apply_pool(self):
+        # The spooler balances jobs sent to POOL_NAME over the members; health comes from the monitor
+        if self._pool_active():
+            # Next to the printer combo's list: the selected printer stays watched for fail-fast
+            self.printer_health.watch(self.pool_printers, owner="pool")
+            self.spooler.add_pool(PrinterPool(POOL_NAME, self.pool_printers, health=self.printer_health))
+        else:
+            self.printer_health.watch([], owner="pool")
+            self.spooler.remove_pool(POOL_NAME)
+
+    def toggle_pool(self, checked):
+        self.pool_enabled = bool(checked)
+        if self.pool_enabled and len(self.pool_printers) < 2:
+            self.choose_pool_printers()
+        save_pool_config(self.pool_file, self.pool_enabled, self.pool_printers)
+        self._apply_pool()
+        if self._pool_active():
+            self.status.setText(f"Printer pool on: {', '.join(self.pool_printers)}")
+        else:
+            self.status.setText("Printer pool off")
+
+    def choose_pool_printers(self):
+        dialog = QtWidgets.QDialog(self)
+        dialog.setWindowTitle("Printer Pool")
+        layout = QtWidgets.QVBoxLayout(dialog)
+        layout.addWidget(QtWidgets.QLabel("Printers with the same label stock to share the labels:"))
+        printers = [self.printer_combo.itemText(i) for i in range(self.printer_combo.count())]
+        listing = QtWidgets.QListWidget()
+        for printer in dict.fromkeys(printers + self.pool_printers):
+            item = QtWidgets.QListWidgetItem(printer)
+            item.setFlags(item.flags() | QtCore.Qt.ItemIsUserCheckable)
+            item.setCheckState(QtCore.Qt.Checked if printer in self.pool_printers else QtCore.Qt.Unchecked)
+            listing.addItem(item)
+        layout.addWidget(listing)
+        buttons = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
+        buttons.accepted.connect(dialog.accept)
+        buttons.rejected.connect(dialog.reject)
+        layout.addWidget(buttons)
+        if dialog.exec_() != QtWidgets.QDialog.Accepted:
+            return
+        self.pool_printers = [listing.item(i).text() for i in range(listing.count())
+                              if listing.item(i).checkState() == QtCore.Qt.Checked]
+        if len(self.pool_printers) < 2:
+            QMessageBox.information(self, "Printer Pool", "Choose at least two printers for a pool.")
+        save_pool_config(self.pool_file, self.pool_enabled, self.pool_printers)
+        self._apply_pool()
+
+    def send_pdf_to_printer(self, pdf_file, fitlines, copies=1):
+        # Re-enumerate only when nothing is listed; the Refresh button covers printer changes
+        if self.printer_combo.count() == 0:
+            self.refresh_printers()
+        if self._pool_active():
+            # The spooler picks the member (and moves the job if that printer fails)
+            job = PrintJob(POOL_NAME, pdf_file, fitlines, copies=copies, geometry=self.label_geometry)
+            self.status.setText(f"Label PDF generated and queued for the printer pool "
+                                f"({len(self.pool_printers)} printers)")
+            self._submit(job)
+            return True
         printer_name = self.printer_combo.currentText()
         if not printer_name:
             QMessageBox.warning(self, "Printer Required", "Select a printer first.")
+            return False
+        printer_name = self._printer_or_alternative(printer_name)
+        if not printer_name:
+            return False
+        job = PrintJob(printer_name, pdf_file, fitlines, copies=copies, geometry=self.label_geometry)
+        # Status first: a fast printer can finish (and report) before submit() returns
+        self.status.setText(f"Label PDF generated and queued for printer: {printer_name}")
+        self._submit(job)
+        return True
+
+    def _submit(self, job):
+        future = self.spooler.submit(job)
+        future.add_done_callback(lambda f, job=job: self._spool_events.finished.emit(
+            job, None if f.cancelled() else f.exception()))
+
+    def _printer_or_alternative(self, printer_name):
+        # Fail fast on a printer the monitor knows is offline / in error, or move the job to a ready one
+        status = self.printer_health.cached(printer_name)
+        if status.ready:
+            return printer_name
+        problem = f"{printer_name} is {status.state}" + (f" ({status.detail})" if status.detail else "")
+        others = [p for p in self.printer_health.ready_printers() if p != printer_name]
+        if not others:
+            QMessageBox.warning(self, "Printer Unavailable", f"{problem}.\nNo other printer is ready.")
+            self.status.setText(f"Not printed: {problem}")
+            return None
+        answer = QMessageBox.question(self, "Printer Unavailable", f"{problem}.\nPrint on {others[0]} instead?",
+                                      QMessageBox.Yes | QMessageBox.No)
+        if answer != QMessageBox.Yes:
+            self.status.setText(f"Not printed: {problem}")
+            return None
+        logging.info(f"Rerouting label from {printer_name} to {others[0]}")
+        return others[0]
+
+    def _on_printer_status(self, printer, status):
+        if printer == self.printer_combo.currentText():
+            self._show_printer_state()
+
+    def _show_printer_state(self, *args):
+        status = self.printer_health.cached(self.printer_combo.currentText())
+        color = {READY: "darkgreen", BUSY: "darkgreen"}.get(status.state, "gray" if status.ready else "red")
+        self.printer_state_label.setText(f"● {status.state}")
+        self.printer_state_label.setToolTip(status.detail)
+        self.printer_state_label.setStyleSheet(f"color:{color};")
+
+    def _on_print_job_finished(self, job, error):
+        if error is None:
+            if job.route == "gdi":
+                self.status.setText(f"GDI printed to {job.printer} (fallback).")
+            else:
+                copies_note = f" ({job.copies} copies)" if job.copies > 1 else ""
+                pool_note = " (pool)" if job.pool else ""
+                self.status.setText(f"Label sent to printer: {job.printer}{pool_note}{copies_note}")
+            try:
+                os.remove(job.pdf_path)
+            except OSError:
+                pass
             return
-        try:
-            print_pdf_to_printer(pdf_file, printer_name, wait_seconds=2)
-            self.status.setText(f"Label sent to printer: {printer_name}")
+        if isinstance(error, PrintUncertain):
+            # Not retried on purpose: it may have printed. Keep the PDF for a manual reprint.
+            QMessageBox.warning(self, "Check the Printer",
+                                f"{job.printer} did not confirm the label.\n{error}\n"
+                                f"Check whether it printed; reprint only if it did not.\n"
+                                f"The label PDF was kept at {job.pdf_path}")
+            self.status.setText(f"Unconfirmed: check {job.printer}")
             return
-        except Exception as e_pdf:
-            logging.warning(f"PDF->printer failed: {e_pdf}")
-            try:
-                print_label_direct(printer_name, fitlines, base_font_size=self.base_print_font)
-                self.status.setText(f"GDI printed to {printer_name} (fallback).")
-            except Exception as e_gdi:
-                logging.error(traceback.format_exc())
-                QMessageBox.critical(self, "Direct Print Failed", f"PDF printing failed and GDI fallback also failed.PDF error: {e_pdf}GDI error: {e_gdi}")
-                self.status.setText("Print failed (both PDF and GDI).")
+        # Dead-lettered: keep the PDF in records/spool so it can be reprinted by hand
+        logging.error(f"Print job failed after {job.attempts} attempts: {job.errors}")
+        QMessageBox.critical(self, "Direct Print Failed",
+                             f"Printing to {job.printer} failed after {job.attempts} attempts.\n{error}\n"
+                             f"The label PDF was kept at {job.pdf_path}")
+        self.status.setText("Print failed (both PDF and GDI).")
+
+    def closeEvent(self, event):
+        self.catalog_watcher.stop()
+        self._catalog_saver.shutdown(wait=True)  # let a pending remedies.xlsx save finish
+        self.printer_health.stop()
+        self.snapshot_timer.stop()
+        self.write_snapshot()
+        self._snapshot_saver.shutdown(wait=True)
+        if self._pool_active():
+            logging.info(f"Printer pool: {self.spooler.pool_metrics()}")
+        self.spooler.shutdown()
+        if hasattr(self.print_backend, 'close'):
+            self.print_backend.close()
+        self.prerender.close()
+        logging.info(f"Label render cache: {self.render_cache.stats()}, pre-render: {self.prerender.stats()}")
+        if self.memwatch is not None:
+            self.memwatch_timer.stop()
+            self.memwatch.sample("close")
+            self.memwatch.stop()
+        super().closeEvent(event)
 
     def update_suggestions(self):
         text = self.medicine_search.text().lower().strip()
         self.suggestion_table.setRowCount(0)
         if not text:
             return
-        for _, row in self.df_remedies.iterrows():
-            common = str(row['common_col'])
-            latin = str(row['latin_col'])
-            if text in common.lower() or text in latin.lower():
-                row_idx = self.suggestion_table.rowCount()
-                self.suggestion_table.insertRow(row_idx)
-                item_common = QTableWidgetItem(common)
-                item_common.setTextAlignment(QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter)
-                item_common.setFlags(item_common.flags() & ~QtCore.Qt.ItemIsEditable)
-                item_common.setToolTip(common)
-                item_latin = QTableWidgetItem(latin)
-                item_latin.setTextAlignment(QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter)
-                item_latin.setFlags(item_latin.flags() & ~QtCore.Qt.ItemIsEditable)
-                item_latin.setToolTip(latin)
-                self.suggestion_table.setItem(row_idx, 0, item_common)
-                self.suggestion_table.setItem(row_idx, 1, item_latin)
+        for (common, latin), alias in self.catalog.search_matches(text):
+            row_idx = self.suggestion_table.rowCount()
+            self.suggestion_table.insertRow(row_idx)
+            # Matched through an alias: show it next to the canonical name, but pick the canonical one
+            shown = f"{common}  ({alias})" if alias else common
+            item_common = QTableWidgetItem(shown)
+            item_common.setData(QtCore.Qt.UserRole, common)
+            item_common.setTextAlignment(QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter)
+            item_common.setFlags(item_common.flags() & ~QtCore.Qt.ItemIsEditable)
+            item_common.setToolTip(f"{common}\nmatched alias: {alias}" if alias else common)
+            item_latin = QTableWidgetItem(latin)
+            item_latin.setTextAlignment(QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter)
+            item_latin.setFlags(item_latin.flags() & ~QtCore.Qt.ItemIsEditable)
+            item_latin.setToolTip(latin)
+            self.suggestion_table.setItem(row_idx, 0, item_common)
+            self.suggestion_table.setItem(row_idx, 1, item_latin)
         # Let the table decide row heights for wrapped text
         self.suggestion_table.resizeRowsToContents()
 
     def on_suggestion_clicked(self, row, column):
         item = self.suggestion_table.item(row, column)
         if item:
-            self.medicine_search.setText(item.text())
+            self.medicine_search.setText(item.data(QtCore.Qt.UserRole) or item.text())
             self.update_selected_medicine()
 
     def add_new_medicine(self):
@@ -598,62 +836,147 @@ class HomeoLabelApp(QtWidgets.QWidget):
             self.medicine_search.setText(new_name.strip())
             self.update_suggestions()
 
+    def import_medicines(self):
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Import Remedy List", "",
+                                                        "Remedy lists (*.csv *.xlsx);;All files (*)")
+        if not path:
+            return
+        # Reading, deduping and writing a 50k-row list takes a while: it runs on the catalog worker and
+        # reports back with signals. Adding a medicine meanwhile would edit the same list, so it waits.
+        self._import_progress = QtWidgets.QProgressDialog("Importing remedies...", None, 0, 0, self)
+        self._import_progress.setWindowModality(QtCore.Qt.WindowModal)
+        self._import_progress.setMinimumDuration(0)
+        self._import_progress.show()
+        self.import_btn.setEnabled(False)
+        self.add_new_btn.setEnabled(False)
+        self.status.setText(f"Importing {os.path.basename(path)}...")
+        report = os.path.join(self.records_folder, f"import_conflicts_{time.strftime('%Y%m%d_%H%M%S')}.csv")
+        self._catalog_saver.submit(self._run_import, path, report, self.df_remedies)
+
+    def _run_import(self, path, report, frame):
+        # Worker thread: import, then build the new index, so the GUI thread only swaps references
+        events = self._catalog_events
+        try:
+            result, frame = import_catalog(path, self.remedies_file, report_path=report, frame=frame,
+                                           progress=events.import_progress.emit)
+            index = None
+            if result.written:
+                catalog = self.catalog
+                if isinstance(catalog, CatalogIndex) and len(frame) < LARGE_CATALOG_ROWS:
+                    index = catalog.apply_changes(added=result.added)
+                else:
+                    index = write_string_table(self.table_dir, frame_rows(frame), self.remedies_file)
+                self.catalog_watcher.note_written(index)
+        except Exception as e:
+            logging.error(traceback.format_exc())
+            events.imported.emit(None, None, None, path, str(e) or type(e).__name__)
+            return
+        events.imported.emit(result, frame, index, path, "")
+
+    def _on_import_progress(self, done, total, rate):
+        progress = self._import_progress
+        if progress is None:
+            return
+        if total:
+            progress.setMaximum(total)
+            progress.setValue(min(done, total))
+        progress.setLabelText(f"Importing remedies... {done} rows ({rate:.0f} rows/s)")
+
+    def _on_imported(self, result, frame, index, path, error):
+        if self._import_progress is not None:
+            self._import_progress.close()
+            self._import_progress = None
+        self.import_btn.setEnabled(True)
+        self.add_new_btn.setEnabled(True)
+        if error:
+            QMessageBox.critical(self, "Import Failed", f"Could not import {path}:\n{error}")
+            self.status.setText("Import failed.")
+            return
+        if result.written:
+            # Same hand-over as save_new_medicine, once for the whole list
+            self.catalog = index
+            self.df_remedies = frame if isinstance(index, CatalogIndex) else None
+            if self.medicine_search.text().strip():
+                self.update_suggestions()
+        elif self.df_remedies is None and isinstance(self.catalog, CatalogIndex):
+            self.df_remedies = frame  # loaded by the worker; keep it for the next edit
+        summary = (f"{result.read} rows read: {len(result.added)} added, {result.duplicates} already listed, "
+                   f"{len(result.conflicts)} conflicts, {result.invalid} without a name "
+                   f"({result.rows_per_sec:.0f} rows/s)")
+        if result.report_path:
+            summary += f"\nConflicts were written to {result.report_path}"
+        QMessageBox.information(self, "Import Finished", summary)
+        self.status.setText(f"Imported {len(result.added)} remedies from {os.path.basename(path)}.")
+
     def update_selected_medicine(self):
         self.update_preview()
 
     def update_preview(self):
-        med_name = self.medicine_search.text().strip().upper()
-        potency = self.potency_input.currentText().upper()
-        line1, line2 = split_medicine_name(med_name, potency, max_chars=18)
-        line3 = f"{self.dose_input.currentText()}   {self.time_input.currentText()}"
-        line4 = f"{self.shop_input.currentText()}"
-        line5 = f"{self.branch_phone_input.currentText()}"
-        raw_lines = [line1, line2, line3, line4, line5]
-
-        temp_c = canvas.Canvas("dummy.pdf")
-        preview_lines = fit_lines_to_box(raw_lines, temp_c, "Helvetica", self.base_print_font, max_width_mm=44)
-
-        for lbl in self.preview_labels:
-            lbl.setText("")
-
-        for i, (txt, size) in enumerate(preview_lines):
-            if i < len(self.preview_labels):
-                # clamp preview font size so it doesn't become tiny or huge
-                psize = max(6, min(size, 20))
-                self.preview_labels[i].setText(txt)
-                self.preview_labels[i].setStyleSheet(f"font-size:{self.scaled_pt(psize)}pt;")
-        temp_c.save()
+        # Repaints only when a break or a size changed
+        layout = self._current_layout()
+        self.label_preview.set_lines(layout)
+        # A complete label is likely the next one printed: render it now, off the GUI thread
+        if layout.job.complete:
+            self.prerender.request(layout, self.copies_input.value() if hasattr(self, 'copies_input') else 1)
+        else:
+            self.prerender.invalidate()
 
     def save_new_medicine(self, med_name):
+        if not isinstance(self.catalog, CatalogIndex):
+            # Large list: the string table answers the duplicate check; the frame is loaded and
+            # extended by the worker, never on the GUI thread
+            if not self.catalog.has_name(med_name):
+                self.status.setText(f"Saving {med_name} to the medicine list...")
+                self._catalog_saver.submit(self._write_remedies, None, None, med_name)
+            return
+        self._remedies_frame()
         exists = ((self.df_remedies['common_col'].str.lower() == med_name.lower()) |
                   (self.df_remedies['latin_col'].str.lower() == med_name.lower())).any()
+        if not exists and ALIAS_COL in self.df_remedies.columns:
+            # Already an accepted alias of a remedy: don't add it again as a duplicate
+            exists = any(med_name.lower() == alias.lower()
+                         for value in self.df_remedies[ALIAS_COL] for alias in split_aliases(value))
         if not exists:
-            new_row = {'common_col': med_name, 'latin_col': med_name}
-            self.df_remedies = pd.concat([self.df_remedies, pd.DataFrame([new_row])], ignore_index=True)
-            self.df_remedies.to_excel(self.remedies_file, index=False, engine='openpyxl')
-            logging.info(f"New medicine added: {med_name}")
+            self.df_remedies = _with_new_medicine(self.df_remedies, med_name)
+            # The search finds the new name at once; only the file write waits
+            self.catalog = index = self.catalog.apply_changes(added=[(med_name, med_name)])
+            self.status.setText(f"Saving {med_name} to the medicine list...")
+            self._catalog_saver.submit(self._write_remedies, self.df_remedies, index, med_name)
+
+    def _write_remedies(self, frame, index, med_name):
+        # Worker thread: rewrite remedies.xlsx (and rebuild a string table) off the GUI thread.
+        # frame None: a string-table catalog; load the list here and append the new name.
+        try:
+            if frame is None:
+                frame = _with_new_medicine(load_remedies_frame(self.remedies_file), med_name)
+            frame.to_excel(self.remedies_file, index=False, engine='openpyxl')
+            if index is None:
+                index = write_string_table(self.table_dir, frame_rows(frame), self.remedies_file)
+            self.catalog_watcher.note_written(index)
+        except Exception as e:
+            logging.error(f"Saving {med_name} to {self.remedies_file} failed: {e}")
+            self._catalog_events.saved.emit(None, frame, med_name, str(e))
+            return
+        self._catalog_events.saved.emit(index, frame, med_name, "")
+
+    def _on_catalog_saved(self, index, frame, med_name, error):
+        if error:
+            QMessageBox.warning(self, "Save Failed", f"{med_name} could not be saved to {self.remedies_file}:\n{error}")
+            self.status.setText(f"Saving {med_name} failed.")
+            return
+        logging.info(f"New medicine added: {med_name}")
+        if not isinstance(index, CatalogIndex):
+            self.catalog = index
+            if self.df_remedies is frame:
+                self.df_remedies = None  # large list: keep only the table (a later save re-reads the xlsx)
+            if self.medicine_search.text().strip():
+                self.update_suggestions()
+        self.status.setText(f"New medicine saved: {med_name}")
 
     def print_label(self):
-        med_name = self.medicine_search.text().strip().upper()
-        potency = self.potency_input.currentText().upper()
-        line1, line2 = split_medicine_name(med_name, potency, max_chars=18)
-        line3 = f"{self.dose_input.currentText()}   {self.time_input.currentText()}"
-        line4 = f"{self.shop_input.currentText()}"
-        line5 = f"{self.branch_phone_input.currentText()}"
-        raw_lines = [line1, line2, line3, line4, line5]
         try:
-            width_mm, height_mm = 50, 30
             pdf_file = os.path.join(self.records_folder, "label.pdf")
-            c = canvas.Canvas(pdf_file, pagesize=(width_mm * mm, height_mm * mm))
-            c.setLineWidth(1)
-            c.rect(2 * mm, 2 * mm, (width_mm - 4) * mm, (height_mm - 4) * mm)
-            y = height_mm * mm - (0.12 * height_mm * mm)
-            fitlines = fit_lines_to_box(raw_lines, c, "Helvetica", self.base_print_font, max_width_mm=44)
-            for text, fsize in fitlines:
-                c.setFont("Helvetica", fsize)
-                c.drawCentredString((width_mm / 2) * mm, y, text)
-                y -= (fsize * 1.15)
-            c.save()
+            self._render_current_label(pdf_file)
             os.startfile(pdf_file)
             self.status.setText("Label preview opened.")
         except Exception as e:
@@ -663,34 +986,32 @@ class HomeoLabelApp(QtWidgets.QWidget):
 
     def refresh_printers(self):
         try:
+            if win32print is None:
+                logging.warning("win32print not available; printer list not refreshed")
+                return
             if hasattr(self, 'printer_combo'):
-                self.printer_combo.clear()
+                selected = self.printer_combo.currentText()
                 printers = [printer[2] for printer in win32print.EnumPrinters(
                     win32print.PRINTER_ENUM_LOCAL | win32print.PRINTER_ENUM_CONNECTIONS)]
+                self.printer_combo.clear()
                 self.printer_combo.addItems(printers)
+                if selected in printers:
+                    self.printer_combo.setCurrentText(selected)
+                self.printer_health.watch(printers)
                 logging.info(f"Refreshed printer list: {printers}")
                 QtWidgets.QApplication.processEvents()
         except Exception as e:
             logging.error(f"Failed to refresh printers: {e}")
 
     def check_printer_ready(self, printer_name):
-        if not printer_name:
-            return False
-        try:
-            printer_handle = win32print.OpenPrinter(printer_name)
-            printer_info = win32print.GetPrinter(printer_handle, 2)
-            win32print.ClosePrinter(printer_handle)
-            status = printer_info.get('Status', 0)
-            if status == 0 and (printer_info.get('Attributes', 0) & win32print.PRINTER_ATTRIBUTE_LOCAL):
-                return True
-            logging.warning(f"Printer '{printer_name}' status: {status}, attributes: {printer_info.get('Attributes')}")
-            return False
-        except Exception as e:
-            logging.error(f"Printer check failed: {e}")
-            return False
+        # Cached status within its TTL, else a fresh query (blocks on a slow network printer)
+        return bool(printer_name) and self.printer_health.status(printer_name).ready
 
 
 if __name__ == "__main__":
+    if HELPER_FLAG in sys.argv:
+        # Frozen builds re-launch this executable as the persistent print helper
+        sys.exit(print_helper_main(sys.argv[1:]))
     app = QtWidgets.QApplication(sys.argv)
     scaling = get_system_scaling(app)
     w = HomeoLabelApp(scaling)
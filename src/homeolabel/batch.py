@@ -0,0 +1,342 @@
+# batch.py
+"""
+Bulk label rendering (stock relabelling, pre-packed kits)
+- Jobs are (medicine, potency, dose, time, shop, branch) tuples, e.g. read from a CSV
+- BulkRenderer shards the jobs into chunks and renders each chunk in a
+  ProcessPoolExecutor worker (fit_label + reportlab, one page per label)
+- Chunks come back in order and are merged into one PDF with PyMuPDF, or kept as
+  a numbered set of spool files (also the fallback when PyMuPDF is missing)
+- StreamingBatchWriter: bounded-memory path for very large runs. A reportlab
+  canvas keeps every page until save(), and merging segment PDFs with PyMuPDF
+  grows with the batch too, so this writer emits the PDF objects itself: each
+  label page is written (and flushed every N pages) as soon as it is laid out,
+  and only the page tree + xref are written at the end. Rolling output files of
+  N pages are the alternative to one merged file.
+
+CLI:   python -m homeolabel.batch jobs.csv -o labels.pdf --workers 4
+Bench: python -m homeolabel.batch --bench --labels 2000 --max-workers 4
+Stream: python -m homeolabel.batch jobs.csv -o labels.pdf --stream --segment-pages 500
+        python -m homeolabel.batch --stream-bench --labels 1000 5000 20000
+"""
+import os
+import sys
+import csv
+import zlib
+import json
+import time
+import logging
+import shutil
+import argparse
+import multiprocessing
+import concurrent.futures
+from array import array
+
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from homeolabel.render import fit_label, render_labels_pdf
+from homeolabel.geometry import DEFAULT_GEOMETRY, DEFAULT_PROFILE, PROFILES
+from homeolabel.timing import peak_rss_bytes
+
+JOB_COLUMNS = ("medicine", "potency", "dose", "time", "shop", "branch")
+
+
+def read_jobs_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            yield tuple((row.get(col) or "").strip() for col in JOB_COLUMNS)
+
+
+def _render_chunk(chunk_index, jobs, base_font_size, geometry=None):
+    # Runs in a worker process; keep it top-level so it pickles under the spawn start method
+    _, pdf_bytes = render_labels_pdf((fit_label(job, base_font_size, geometry) for job in jobs),
+                                     geometry=geometry)
+    return chunk_index, pdf_bytes
+
+
+def _chunks(jobs, chunk_size):
+    chunk = []
+    for job in jobs:
+        chunk.append(tuple(job))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def merge_pdfs(pdf_chunks, out_path):
+    # pdf_chunks: PDF byte strings in page order
+    import pymupdf
+    with pymupdf.open() as merged:
+        for pdf_bytes in pdf_chunks:
+            with pymupdf.open(stream=pdf_bytes, filetype="pdf") as part:
+                merged.insert_pdf(part)
+        merged.save(out_path, garbage=1, deflate=True)
+
+
+class BulkRenderer:
+    def __init__(self, workers=None, chunk_size=250, base_font_size=None, geometry=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = max(1, int(chunk_size))
+        self.geometry = geometry or DEFAULT_GEOMETRY
+        self.base_font_size = base_font_size or self.geometry.base_font_size
+
+    def _render_chunks(self, jobs):
+        # Yields chunk PDFs in job order while later chunks are still rendering
+        chunks = _chunks(jobs, self.chunk_size)
+        if self.workers <= 1:
+            for i, chunk in enumerate(chunks):
+                yield len(chunk), _render_chunk(i, chunk, self.base_font_size, self.geometry)[1]
+            return
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers) as pool:
+            pending = [(len(chunk), pool.submit(_render_chunk, i, chunk, self.base_font_size, self.geometry))
+                       for i, chunk in enumerate(chunks)]
+            for count, future in pending:
+                yield count, future.result()[1]
+
+    def render(self, jobs, out_path=None, spool_dir=None):
+        # One merged PDF at out_path, or numbered chunk files in spool_dir. Returns run stats.
+        start = time.perf_counter()
+        labels = 0
+        files = []
+        if out_path and spool_dir is None:
+            try:
+                import pymupdf  # noqa: F401
+            except ImportError:
+                spool_dir = os.path.splitext(out_path)[0] + "_spool"
+                logging.warning(f"PyMuPDF not installed; writing chunk files to {spool_dir} instead of merging")
+        if spool_dir:
+            os.makedirs(spool_dir, exist_ok=True)
+            for n, (count, pdf_bytes) in enumerate(self._render_chunks(jobs), start=1):
+                path = os.path.join(spool_dir, f"labels_{n:05d}.pdf")
+                with open(path, "wb") as f:
+                    f.write(pdf_bytes)
+                files.append(path)
+                labels += count
+        else:
+            parts = []
+            for count, pdf_bytes in self._render_chunks(jobs):
+                parts.append(pdf_bytes)
+                labels += count
+            if out_path:
+                merge_pdfs(parts, out_path)
+                files.append(out_path)
+        elapsed = time.perf_counter() - start
+        return {'labels': labels, 'workers': self.workers, 'chunk_size': self.chunk_size, 'files': files,
+                'seconds': round(elapsed, 3), 'labels_per_sec': round(labels / elapsed, 1) if elapsed else 0.0}
+
+
+def _pdf_text(text):
+    # Standard-14 Helvetica uses WinAnsiEncoding, same as reportlab's built-in fonts
+    raw = str(text).encode("cp1252", errors="replace")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def label_page_stream(fitlines, geometry=None, width_fn=stringWidth):
+    # Page content for one label: the same border / baseline / centring as render.draw_label
+    g = geometry or DEFAULT_GEOMETRY
+    ops = [b"1 w", b"%.2f %.2f %.2f %.2f re S" % g.border_rect]
+    y = g.baseline_y
+    for text, fsize in fitlines:
+        x = g.center_x - width_fn(text, g.font, fsize) / 2.0
+        ops.append(b"BT /F1 %g Tf 1 0 0 1 %.2f %.2f Tm (%s) Tj ET" % (fsize, x, y, _pdf_text(text)))
+        y -= (fsize * g.line_gap)
+    return b"\n".join(ops)
+
+
+class _StreamingPdf:
+    # Minimal PDF writer that writes each page as soon as it is drawn. Only the xref
+    # offsets (8 bytes per object) stay in memory; the page tree and xref are written
+    # by close(). Objects: 1 catalog, 2 page tree, 3 font, then content/page pairs.
+    _FIRST_PAGE_OBJ = 4
+
+    def __init__(self, path, width_pt, height_pt, compress=True, font=DEFAULT_GEOMETRY.font):
+        self.f = open(path, "wb")
+        self.width_pt = width_pt
+        self.height_pt = height_pt
+        self.compress = compress
+        self.offsets = array("q")
+        self.pages = 0
+        self.f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        self._obj(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>"
+                  % font.encode("ascii"))
+
+    def _obj(self, num, body):
+        if len(self.offsets) <= num:
+            self.offsets.extend([0] * (num + 1 - len(self.offsets)))
+        self.offsets[num] = self.f.tell()
+        self.f.write(b"%d 0 obj\n" % num + body + b"\nendobj\n")
+
+    def add_page(self, content):
+        content_num = self._FIRST_PAGE_OBJ + 2 * self.pages
+        if self.compress:
+            content = zlib.compress(content)
+            head = b"<< /Length %d /Filter /FlateDecode >>" % len(content)
+        else:
+            head = b"<< /Length %d >>" % len(content)
+        self._obj(content_num, head + b"\nstream\n" + content + b"\nendstream")
+        self._obj(content_num + 1, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] "
+                                   b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+                  % (self.width_pt, self.height_pt, content_num))
+        self.pages += 1
+
+    def flush(self):
+        self.f.flush()
+
+    def close(self):
+        kids = b" ".join(b"%d 0 R" % (self._FIRST_PAGE_OBJ + 2 * i + 1) for i in range(self.pages))
+        self._obj(2, b"<< /Type /Pages /Count %d /Kids [%s] >>" % (self.pages, kids))
+        xref_at = self.f.tell()
+        count = len(self.offsets)
+        self.f.write(b"xref\n0 %d\n0000000000 65535 f \n" % count)
+        for offset in self.offsets[1:]:
+            self.f.write(b"%010d 00000 n \n" % offset)
+        self.f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (count, xref_at))
+        self.f.close()
+
+
+class StreamingBatchWriter:
+    # Bounded-memory writer: pages go to disk as they are laid out, flushed every
+    # pages_per_segment pages. merge=False writes rolling files of that many pages instead.
+    def __init__(self, out_path, pages_per_segment=500, base_font_size=None, merge=True, geometry=None):
+        self.out_path = out_path
+        self.pages_per_segment = max(1, int(pages_per_segment))
+        self.geometry = geometry or DEFAULT_GEOMETRY
+        self.base_font_size = base_font_size or self.geometry.base_font_size
+        self.merge = merge
+
+    def _open(self, path):
+        return _StreamingPdf(path, self.geometry.width_pt, self.geometry.height_pt, font=self.geometry.font)
+
+    def _rolling_path(self, n):
+        base, ext = os.path.splitext(self.out_path)
+        return f"{base}_{n:05d}{ext or '.pdf'}"
+
+    def write(self, jobs):
+        start = time.perf_counter()
+        labels = 0
+        files = []
+        pdf = None
+        for job in jobs:
+            if pdf is None:
+                files.append(self.out_path if self.merge else self._rolling_path(len(files) + 1))
+                pdf = self._open(files[-1])
+            pdf.add_page(label_page_stream(fit_label(job, self.base_font_size, self.geometry), self.geometry))
+            labels += 1
+            if pdf.pages % self.pages_per_segment == 0:
+                if self.merge:
+                    pdf.flush()
+                else:
+                    pdf.close()
+                    pdf = None
+        if pdf is None and not files:
+            files.append(self.out_path)
+            pdf = self._open(self.out_path)
+        if pdf is not None:
+            pdf.close()
+        elapsed = time.perf_counter() - start
+        return {'labels': labels, 'files': files, 'pages_per_segment': self.pages_per_segment,
+                'seconds': round(elapsed, 3), 'labels_per_sec': round(labels / elapsed, 1) if elapsed else 0.0,
+                'peak_rss_mb': _mb(peak_rss_bytes())}
+
+
+def _mb(value):
+    return round(value / (1024 * 1024), 1) if value else None
+
+
+def sample_jobs(count):
+    names = ["Arnica montana", "Bryonia alba", "Atropa belladonna", "Nux vomica", "Rhus toxicodendron",
+             "Pulsatilla nigricans", "Calcarea carbonica", "Lycopodium clavatum"]
+    potencies = ["6C", "30C", "200C", "1M", "Q"]
+    for i in range(count):
+        yield (names[i % len(names)], potencies[i % len(potencies)], "4 pills", "Twice daily",
+               "Homeo Mahanagar", f"Branch {i % 7 + 1}")
+
+
+def benchmark(labels=2000, max_workers=None, chunk_size=250):
+    # Scaling run from 1 to max_workers processes over the same synthetic jobs (no merge / disk)
+    max_workers = max_workers or os.cpu_count() or 1
+    jobs = list(sample_jobs(labels))
+    results = []
+    base = None
+    for workers in range(1, max_workers + 1):
+        stats = BulkRenderer(workers=workers, chunk_size=chunk_size).render(jobs)
+        base = base or stats['seconds']
+        stats['speedup'] = round(base / stats['seconds'], 2) if stats['seconds'] else 0.0
+        results.append(stats)
+    return results
+
+
+def _stream_bench_one(mode, labels, out_path, pages_per_segment):
+    # Runs in a fresh process so peak RSS belongs to this run alone
+    if mode == "stream":
+        stats = StreamingBatchWriter(out_path, pages_per_segment=pages_per_segment).write(sample_jobs(labels))
+    else:
+        start = time.perf_counter()
+        render_labels_pdf((fit_label(job) for job in sample_jobs(labels)), out_path)
+        stats = {'labels': labels, 'seconds': round(time.perf_counter() - start, 3),
+                 'peak_rss_mb': _mb(peak_rss_bytes())}
+    stats['mode'] = mode
+    return stats
+
+
+def stream_benchmark(sizes=(1000, 5000, 20000), pages_per_segment=500, out_dir=None):
+    # Peak RSS of the streaming writer vs one reportlab canvas, per batch size
+    import tempfile
+    out_dir = out_dir or tempfile.mkdtemp(prefix="label_stream_bench_")
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for labels in sizes:
+        for mode in ("single-canvas", "stream"):
+            out_path = os.path.join(out_dir, f"{mode}_{labels}.pdf")
+            with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                stats = pool.submit(_stream_bench_one, mode, labels, out_path, pages_per_segment).result()
+            stats['file_mb'] = _mb(os.path.getsize(out_path))
+            results.append(stats)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render many labels in parallel")
+    parser.add_argument("jobs_csv", nargs="?", help="CSV with columns: " + ", ".join(JOB_COLUMNS))
+    parser.add_argument("-o", "--out", default="labels.pdf", help="merged output PDF")
+    parser.add_argument("--spool-dir", help="write numbered chunk PDFs here instead of one merged PDF")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=250)
+    parser.add_argument("--bench", action="store_true", help="scaling benchmark from 1 to --max-workers")
+    parser.add_argument("--labels", type=int, nargs="+", default=None,
+                        help="label count for --bench (several sizes for --stream-bench)")
+    parser.add_argument("--max-workers", type=int, default=None)
+    parser.add_argument("--stream", action="store_true", help="bounded-memory streaming writer")
+    parser.add_argument("--segment-pages", type=int, default=500, help="pages per rolling segment (--stream)")
+    parser.add_argument("--no-merge", action="store_true", help="--stream: rolling files of --segment-pages pages")
+    parser.add_argument("--stream-bench", action="store_true", help="peak RSS: streaming vs single canvas")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, choices=sorted(PROFILES), help="label stock")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.bench:
+        labels = args.labels[0] if args.labels else 2000
+        for row in benchmark(labels, args.max_workers, args.chunk_size):
+            print(json.dumps({k: v for k, v in row.items() if k != 'files'}))
+        return 0
+    if args.stream_bench:
+        for row in stream_benchmark(args.labels or (1000, 5000, 20000), args.segment_pages):
+            print(json.dumps({k: v for k, v in row.items() if k != 'files'}))
+        return 0
+    if not args.jobs_csv:
+        parser.error("jobs_csv is required unless --bench / --stream-bench is given")
+    if args.stream:
+        writer = StreamingBatchWriter(args.out, pages_per_segment=args.segment_pages, merge=not args.no_merge,
+                                      geometry=PROFILES[args.profile])
+        print(json.dumps(writer.write(read_jobs_csv(args.jobs_csv)), indent=2))
+        return 0
+    renderer = BulkRenderer(workers=args.workers, chunk_size=args.chunk_size, geometry=PROFILES[args.profile])
+    stats = renderer.render(read_jobs_csv(args.jobs_csv), out_path=args.out, spool_dir=args.spool_dir)
+    print(json.dumps(stats, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,332 @@
+# catalog.py
+"""
+Remedy catalog loading + search index
+- load_remedies_frame: reads remedies.xlsx (creating the 3-row default if missing)
+- normalize_key / normalize_series: the one normalization used for catalog keys and queries
+  (casefolded, diacritics and punctuation stripped, whitespace collapsed)
+- CatalogIndex: holds the catalog once and answers substring suggestions
+- Aliases: an optional alias_col ("Nux vom; Nux-v") gives one remedy several accepted
+  names; each alias becomes its own index entry pointing at the remedy, and
+  search_matches() reports which alias matched
+
+Keys are normalized once when the index is built and kept as one NumPy string
+array. A query of 3+ characters is narrowed with trigram posting lists (one
+contiguous int32 array, found by binary search over the packed gram codes) and the
+survivors are verified in one vectorized find(); shorter queries (and anything
+the trigrams cannot narrow) run the same vectorized find over the whole array.
+Results keep catalog order, same as the old iterrows() loop.
+
+apply_changes / diff_rows: hot reload builds the next index from the row diff
+(catalogwatch.py) instead of re-indexing the whole catalog.
+"""
+import os
+import re
+import unicodedata
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_REMEDIES = {
+    'latin_col': ['Arnica montana', 'Bryonia alba', 'Atropa belladonna'],
+    'common_col': ['Arnica', 'Bryonia', 'Belladonna']
+}
+
+# Optional remedies.xlsx column: "Nux vom; Nux-v; Nux vomica" - several names for one remedy
+ALIAS_COL = 'alias_col'
+ALIAS_SEP = ";"
+# Row haystacks join both names with a separator a normalized query can never contain
+_FIELD_SEP = "\n"
+# Latin combining diacritics only, so non-Latin scripts keep their vowel signs
+_DIACRITICS = "[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]"
+_DIACRITICS_RE = re.compile(_DIACRITICS)
+_PUNCT = r"[^\w\s]|_"
+_PUNCT_RE = re.compile(_PUNCT)
+_SPACES_RE = re.compile(r"\s+")
+
+# np.strings (NumPy 2) runs find() as a real ufunc; np.char is the older equivalent
+_np_strings = getattr(np, 'strings', np.char)
+
+
+def normalize_key(text):
+    text = _DIACRITICS_RE.sub("", unicodedata.normalize("NFKD", str(text))).casefold()
+    return _SPACES_RE.sub(" ", _PUNCT_RE.sub(" ", text)).strip()
+
+
+def normalize_series(series):
+    # Vectorized twin of normalize_key for whole catalog columns
+    s = series.astype(str).str.normalize("NFKD").str.replace(_DIACRITICS, "", regex=True).str.casefold()
+    return s.str.replace(_PUNCT, " ", regex=True).str.replace(r"\s+", " ", regex=True).str.strip()
+
+
+def load_remedies_frame(remedies_file, create=True):
+    if create and not os.path.exists(remedies_file):
+        pd.DataFrame(DEFAULT_REMEDIES).to_excel(remedies_file, index=False, engine="openpyxl")
+    df = pd.read_excel(remedies_file, engine="openpyxl")
+    df.fillna('', inplace=True)
+    return df
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _gram_pairs(keys, first_row=0, block_rows=50000):
+    # Every trigram of every key packed into one uint64 (3 x 21-bit code points), read
+    # straight off the UTF-32 buffer of the key array. Returns (codes, row ids) unsorted.
+    codes, row_ids = [], []
+    if keys.size and keys.dtype.itemsize >= 12:
+        width = keys.dtype.itemsize // 4
+        points = keys.view(np.uint32).reshape(len(keys), width).astype(np.uint64)
+        for start in range(0, len(points), block_rows):
+            block = points[start:start + block_rows]
+            packed = (block[:, :-2] << np.uint64(42)) | (block[:, 1:-1] << np.uint64(21)) | block[:, 2:]
+            valid = block[:, 2:] != 0  # keys are zero padded to the array width
+            codes.append(packed[valid])
+            row_ids.append((np.nonzero(valid)[0] + start + first_row).astype(np.int32))
+    if not codes:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int32)
+    return np.concatenate(codes), np.concatenate(row_ids)
+
+
+def diff_rows(old_rows, new_rows):
+    # (removed, added) between two row lists, duplicates counted; added keeps new-file order
+    old_count, new_count = Counter(old_rows), Counter(new_rows)
+    removed = list((old_count - new_count).elements())
+    pending = new_count - old_count
+    added = []
+    for row in new_rows:
+        if pending.get(row):
+            pending[row] -= 1
+            added.append(row)
+    return removed, added
+
+
+def split_aliases(value):
+    # alias_col cell -> tuple of names ("Nux vom; Nux-v" -> ("Nux vom", "Nux-v"))
+    return tuple(name.strip() for name in str(value or "").split(ALIAS_SEP) if name.strip())
+
+
+def frame_rows(df):
+    # Catalog records as (common, latin, aliases) - what diff_rows / apply_changes work on
+    if df is None or df.empty:
+        return []
+    common = df['common_col'].astype(str)
+    latin = df['latin_col'].astype(str)
+    if ALIAS_COL in df.columns:
+        aliases = [split_aliases(v) for v in df[ALIAS_COL]]
+    else:
+        aliases = [()] * len(df)
+    return list(zip(common, latin, aliases))
+
+
+def _record(row):
+    # (common, latin) or (common, latin, aliases) -> (common, latin, aliases)
+    common, latin = str(row[0]), str(row[1])
+    return (common, latin, tuple(row[2]) if len(row) > 2 else ())
+
+
+def _row_key(common, latin):
+    return f"{normalize_key(common)}{_FIELD_SEP}{normalize_key(latin)}"
+
+
+class CatalogIndex:
+    # Search runs over "entries": one key per remedy (both names) plus one key per alias,
+    # each pointing back at its remedy row. Aliases are expanded here, at build time, so a
+    # query costs the same whether it hits a name or an abbreviation.
+    match_mode = "substring"
+
+    def __init__(self, rows, keys=None, aliases=None, alias_keys=None):
+        # rows: iterable of (common, latin); keys: matching pre-normalized haystacks, if already built;
+        # aliases: per-row tuples of alias names; alias_keys: their normalized keys, flattened
+        self.rows = [(str(common), str(latin)) for common, latin in rows]
+        self.aliases = [tuple(a) for a in aliases] if aliases is not None else [()] * len(self.rows)
+        if keys is None:
+            keys = [_row_key(common, latin) for common, latin in self.rows]
+        entry_row = [np.arange(len(self.rows), dtype=np.int32)]
+        self.entry_alias = [None] * len(self.rows)
+        for i, names in enumerate(self.aliases):
+            if names:
+                entry_row.append(np.full(len(names), i, dtype=np.int32))
+                self.entry_alias.extend(names)
+        if alias_keys is None:
+            alias_keys = [normalize_key(name) for names in self.aliases for name in names]
+        self.keys = np.array(list(keys) + list(alias_keys), dtype=str)
+        self.entry_row = np.concatenate(entry_row)
+        self.entry_is_alias = np.arange(len(self.entry_row)) >= len(self.rows)
+        self._build_trigrams()
+
+    def _build_trigrams(self):
+        codes, entry_ids = _gram_pairs(self.keys)
+        order = np.argsort(codes, kind="stable")
+        self._set_postings(codes[order], entry_ids[order])
+
+    def _set_postings(self, codes, entry_ids):
+        # codes / entry_ids: one per (gram, entry), sorted by gram then entry.
+        # Postings for all grams live in one int32 array grouped by gram:
+        # gram i owns _postings[_offsets[i]:_offsets[i + 1]], entry ids ascending.
+        # A gram repeated inside one key only needs one posting
+        keep = np.ones(len(codes), dtype=bool)
+        keep[1:] = (codes[1:] != codes[:-1]) | (entry_ids[1:] != entry_ids[:-1])
+        codes, self._postings = codes[keep], entry_ids[keep].astype(np.int32)
+        self._gram_codes, starts = np.unique(codes, return_index=True)
+        self._offsets = np.append(starts, len(codes)).astype(np.int64)
+
+    def _posting(self, gram):
+        a, b, c = (ord(ch) for ch in gram)
+        code = np.uint64((a << 42) | (b << 21) | c)
+        i = int(np.searchsorted(self._gram_codes, code))
+        if i >= len(self._gram_codes) or self._gram_codes[i] != code:
+            return None
+        return self._postings[self._offsets[i]:self._offsets[i + 1]]
+
+    @classmethod
+    def from_dataframe(cls, df):
+        if df is None or df.empty:
+            return cls([])
+        common = df['common_col'].astype(str)
+        latin = df['latin_col'].astype(str)
+        keys = normalize_series(common) + _FIELD_SEP + normalize_series(latin)
+        aliases, alias_keys = None, None
+        if ALIAS_COL in df.columns:
+            aliases = [split_aliases(v) for v in df[ALIAS_COL]]
+            flat = pd.Series([name for names in aliases for name in names], dtype=object)
+            alias_keys = normalize_series(flat).tolist() if len(flat) else []
+        return cls(zip(common, latin), keys=keys.tolist(), aliases=aliases, alias_keys=alias_keys)
+
+    # Flat arrays for the warm-start snapshot (snapshot.py); from_arrays takes them back
+    # without touching a single key, so memory-mapped arrays stay memory-mapped
+    _ARRAY_FIELDS = ("keys", "entry_row", "entry_is_alias", "_gram_codes", "_postings", "_offsets")
+
+    def to_arrays(self):
+        arrays = {name.lstrip("_"): getattr(self, name) for name in self._ARRAY_FIELDS}
+        arrays['common'] = np.array([common for common, _ in self.rows], dtype=str)
+        arrays['latin'] = np.array([latin for _, latin in self.rows], dtype=str)
+        arrays['alias_names'] = np.array([a for a in self.entry_alias if a is not None], dtype=str)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        new = cls.__new__(cls)
+        for name in cls._ARRAY_FIELDS:
+            setattr(new, name, arrays[name.lstrip("_")])
+        new.rows = list(zip(arrays['common'].tolist(), arrays['latin'].tolist()))
+        new.entry_alias = [None] * len(new.entry_row)
+        names = iter(arrays['alias_names'].tolist())
+        aliases = [[] for _ in new.rows]
+        for entry in np.flatnonzero(new.entry_is_alias).tolist():
+            name = next(names)
+            new.entry_alias[entry] = name
+            aliases[new.entry_row[entry]].append(name)
+        new.aliases = [tuple(a) for a in aliases]
+        return new
+
+    def records(self):
+        return [(common, latin, names) for (common, latin), names in zip(self.rows, self.aliases)]
+
+    def apply_changes(self, removed=(), added=()):
+        # New index with `removed` records dropped and `added` appended (records as from
+        # frame_rows; plain (common, latin) pairs work too). Kept keys are not normalized
+        # again and their postings are filtered/renumbered instead of rebuilt; only the
+        # added keys are cut into trigrams, merged in by binary search. self is untouched,
+        # so searches keep running on it until the caller swaps the reference.
+        keep = np.ones(len(self.rows), dtype=bool)
+        pending = Counter(_record(r) for r in removed)
+        if pending:
+            for i, record in enumerate(self.records()):
+                if pending.get(record):
+                    pending[record] -= 1
+                    keep[i] = False
+        added = [_record(r) for r in added]
+        kept_rows = int(keep.sum())
+        keep_entry = keep[self.entry_row]
+
+        new = CatalogIndex.__new__(CatalogIndex)
+        new.rows = [row for row, k in zip(self.rows, keep) if k] + [(c, l) for c, l, _ in added]
+        new.aliases = [names for names, k in zip(self.aliases, keep) if k] + [names for _, _, names in added]
+        row_renumber = (np.cumsum(keep) - 1).astype(np.int32)
+        add_keys, add_rows, add_alias = [], [], []
+        for n, (common, latin, names) in enumerate(added):
+            add_keys.append(_row_key(common, latin))
+            add_rows.append(kept_rows + n)
+            add_alias.append(None)
+            for name in names:
+                add_keys.append(normalize_key(name))
+                add_rows.append(kept_rows + n)
+                add_alias.append(name)
+        add_keys = np.array(add_keys, dtype=str)
+        new.keys = np.concatenate([self.keys[keep_entry], add_keys]) if add_rows else self.keys[keep_entry]
+        new.entry_row = np.concatenate([row_renumber[self.entry_row[keep_entry]],
+                                        np.array(add_rows, dtype=np.int32)])
+        new.entry_alias = [a for a, k in zip(self.entry_alias, keep_entry.tolist()) if k] + add_alias
+        new.entry_is_alias = np.concatenate([self.entry_is_alias[keep_entry],
+                                             np.array([a is not None for a in add_alias], dtype=bool)])
+
+        codes = np.repeat(self._gram_codes, np.diff(self._offsets))
+        entry_ids = self._postings
+        if not keep_entry.all():
+            renumber = (np.cumsum(keep_entry) - 1).astype(np.int32)
+            alive = keep_entry[entry_ids]
+            codes, entry_ids = codes[alive], renumber[entry_ids[alive]]
+        if add_rows:
+            add_codes, add_ids = _gram_pairs(add_keys, first_row=int(keep_entry.sum()))
+            order = np.argsort(add_codes, kind="stable")
+            add_codes, add_ids = add_codes[order], add_ids[order]
+            # Added entries number after every kept one, so side="right" keeps each posting list ascending
+            at = np.searchsorted(codes, add_codes, side="right")
+            codes, entry_ids = np.insert(codes, at, add_codes), np.insert(entry_ids, at, add_ids)
+        new._set_postings(codes, entry_ids)
+        return new
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _candidates(self, text):
+        # Sorted entry ids sharing every trigram of `text`, or None when the map can't narrow it
+        if len(text) < 3:
+            return None
+        postings = []
+        for gram in _trigrams(text):
+            ids = self._posting(gram)
+            if ids is None:
+                return np.empty(0, dtype=np.int32)
+            postings.append(ids)
+        postings.sort(key=len)
+        found = postings[0]
+        for ids in postings[1:]:
+            found = np.intersect1d(found, ids, assume_unique=True)
+            if not len(found):
+                break
+        return found
+
+    def match_mask(self, text):
+        # Vectorized fallback: one boolean mask over every entry
+        return _np_strings.find(self.keys, text) >= 0
+
+    def search_matches(self, text, limit=None):
+        # [(row, matched_alias_or_None)] in catalog order, one per remedy; a remedy whose
+        # own names match is reported without an alias
+        # limit None: every match; a limit below 1 asks for none
+        text = normalize_key(text)
+        if not text or not len(self.keys) or (limit is not None and limit < 1):
+            return []
+        candidates = self._candidates(text)
+        if candidates is None:
+            hits = np.flatnonzero(self.match_mask(text))
+        elif len(candidates):
+            hits = candidates[_np_strings.find(self.keys[candidates], text) >= 0]
+        else:
+            return []
+        rows = self.entry_row[hits]
+        # Name entries (row, 0) sort ahead of alias entries (row, 1); keep the first per row
+        order = np.lexsort((self.entry_is_alias[hits], rows))
+        hits, rows = hits[order], rows[order]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = rows[1:] != rows[:-1]
+        hits, rows = hits[first], rows[first]
+        if limit is not None:
+            hits, rows = hits[:limit], rows[:limit]
+        return [(self.rows[r], self.entry_alias[h]) for r, h in zip(rows.tolist(), hits.tolist())]
+
+    def search(self, text, limit=None):
+        return [row for row, _ in self.search_matches(text, limit=limit)]
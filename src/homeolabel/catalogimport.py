@@ -0,0 +1,347 @@
+# catalogimport.py
+"""
+Bulk import of supplier remedy lists into remedies.xlsx
+- Reads CSV or XLSX in chunks (pandas chunksize / openpyxl read-only rows), so a
+  50k+ row list is never held twice; headers are matched loosely ("Common Name",
+  "latin", "Aliases", ...) and a file with one name column uses it for both
+- Names are tidied (whitespace collapsed) for display and keyed with the same
+  catalog.normalize_key normalization the search uses
+- Dedupe: one dict (normalized name -> remedy) over every common / latin / alias
+  name already in the catalog, plus the rows imported so far; each row is
+    new        -> appended
+    duplicate  -> both names already name the same remedy (case, accents, spacing
+                  and punctuation don't count)
+    conflict   -> one name belongs to a remedy whose other name differs, the two
+                  names belong to different remedies, or an alias is taken;
+                  skipped and listed in the conflicts report (CSV)
+    invalid    -> no name at all
+- Commit: the new rows are appended to the frame and remedies.xlsx is written
+  once, through a temporary file and an atomic rename (nothing is written on a
+  dry run or when nothing is new)
+- progress(done_rows, total_rows_or_None, rows_per_sec) is called after every chunk
+
+Run:   python -m homeolabel.catalogimport supplier.csv --remedies remedies.xlsx
+       python -m homeolabel.catalogimport supplier.xlsx --dry-run --report conflicts.csv
+Bench: python -m homeolabel.catalogimport --bench --rows 50000
+"""
+import os
+import sys
+import csv
+import json
+import time
+import logging
+import argparse
+
+import pandas as pd
+
+from homeolabel.catalog import (normalize_key, normalize_series, load_remedies_frame, split_aliases,
+                                ALIAS_COL, ALIAS_SEP)
+
+CHUNK_ROWS = 5000
+NEW, DUPLICATE, CONFLICT, INVALID = "new", "duplicate", "conflict", "invalid"
+# Accepted headers, normalized with normalize_key
+_HEADERS = {
+    'common_col': ("common col", "common", "common name", "name", "remedy", "remedy name", "medicine"),
+    'latin_col': ("latin col", "latin", "latin name", "botanical name", "scientific name"),
+    ALIAS_COL: ("alias col", "alias", "aliases", "synonyms", "other names", "abbreviations"),
+}
+
+
+def _columns(header):
+    # {'common_col' / 'latin_col' / ALIAS_COL: position in header}
+    found = {}
+    for pos, name in enumerate(header):
+        key = normalize_key(name or "")
+        for col, names in _HEADERS.items():
+            if col not in found and key in names:
+                found[col] = pos
+    if 'common_col' not in found and 'latin_col' not in found:
+        raise ValueError(f"no remedy name column in {list(header)} (expected e.g. common_col / latin_col)")
+    return found
+
+
+def _frame(rows, header):
+    # Raw rows -> DataFrame with common_col / latin_col / alias_col (strings, '' for missing)
+    cols = _columns(header)
+    data = {}
+    for col in ('common_col', 'latin_col', ALIAS_COL):
+        pos = cols.get(col)
+        data[col] = ["" if pos is None or pos >= len(r) or r[pos] is None else str(r[pos]) for r in rows]
+    return pd.DataFrame(data)
+
+
+def _csv_delimiter(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        sample = f.read(64 * 1024)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+    except csv.Error:
+        return ","
+
+
+def read_import_chunks(path, chunk_rows=CHUNK_ROWS):
+    # Yields DataFrames (common_col, latin_col, alias_col) of up to chunk_rows rows
+    if os.path.splitext(path)[1].lower() in (".xlsx", ".xlsm"):
+        from openpyxl import load_workbook
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= chunk_rows:
+                    yield _frame(chunk, header)
+                    chunk = []
+            if chunk:
+                yield _frame(chunk, header)
+        finally:
+            wb.close()
+        return
+    sep = _csv_delimiter(path)
+    for chunk in pd.read_csv(path, sep=sep, dtype=str, keep_default_na=False, chunksize=chunk_rows,
+                             encoding="utf-8-sig"):
+        yield _frame(chunk.values.tolist(), list(chunk.columns))
+
+
+def _tidy(series):
+    return series.astype(str).str.replace(r"\s+", " ", regex=True).str.strip()
+
+
+class ImportResult:
+    def __init__(self):
+        self.read = 0
+        self.added = []          # (common, latin, aliases) records appended to the catalog
+        self.duplicates = 0
+        self.conflicts = []      # dicts, see _conflict()
+        self.invalid = 0
+        self.seconds = 0.0
+        self.write_seconds = 0.0
+        self.written = False
+        self.report_path = None
+
+    @property
+    def rows_per_sec(self):
+        return round(self.read / self.seconds, 1) if self.seconds else 0.0
+
+    def summary(self):
+        return {'read': self.read, 'added': len(self.added), 'duplicates': self.duplicates,
+                'conflicts': len(self.conflicts), 'invalid': self.invalid, 'written': self.written,
+                'seconds': round(self.seconds, 3), 'write_seconds': round(self.write_seconds, 3),
+                'rows_per_sec': self.rows_per_sec, 'report': self.report_path}
+
+
+class CatalogImporter:
+    def __init__(self, remedies_file, chunk_rows=CHUNK_ROWS, frame=None):
+        # frame: the catalog already in memory (the app's df_remedies); read from remedies_file if None
+        self.remedies_file = remedies_file
+        self.chunk_rows = chunk_rows
+        self.frame = frame if frame is not None else load_remedies_frame(remedies_file)
+        self.records = []   # (common, latin) per remedy: existing ones, then the ones imported
+        self.index = {}     # normalized name -> position in self.records
+        common = _tidy(self.frame['common_col']).tolist() if len(self.frame) else []
+        latin = _tidy(self.frame['latin_col']).tolist() if len(self.frame) else []
+        aliases = ([split_aliases(v) for v in self.frame[ALIAS_COL]]
+                   if ALIAS_COL in self.frame.columns else [()] * len(common))
+        if common:
+            keys_c = normalize_series(pd.Series(common)).tolist()
+            keys_l = normalize_series(pd.Series(latin)).tolist()
+        else:
+            keys_c = keys_l = []
+        for c, l, kc, kl, names in zip(common, latin, keys_c, keys_l, aliases):
+            self._register(c, l, (kc, kl) + tuple(normalize_key(n) for n in names))
+
+    def _register(self, common, latin, keys):
+        rid = len(self.records)
+        self.records.append((common, latin))
+        for key in keys:
+            if key:
+                self.index.setdefault(key, rid)  # the first remedy keeps a name shared by several
+
+    @staticmethod
+    def _conflict(line, common, latin, reason, existing=None):
+        return {'line': line, 'common': common, 'latin': latin, 'reason': reason,
+                'existing_common': existing[0] if existing else "", 'existing_latin': existing[1] if existing else ""}
+
+    def classify(self, line, common, latin, names, kc, kl, alias_keys):
+        # -> (NEW / DUPLICATE / CONFLICT / INVALID, conflict dict or None); registers NEW rows
+        if not kc and not kl:
+            return INVALID, None
+        if not kc or not kl:
+            # One name only: it is both names (as "Add New Medicine" does)
+            common, latin, kc, kl = common or latin, latin or common, kc or kl, kl or kc
+        hit_c, hit_l = self.index.get(kc), self.index.get(kl)
+        if hit_c is not None or hit_l is not None:
+            if hit_c == hit_l:
+                return DUPLICATE, None
+            if hit_c is not None and hit_l is not None:
+                return CONFLICT, self._conflict(line, common, latin, "names belong to two different remedies",
+                                                self.records[hit_c])
+            hit = hit_c if hit_c is not None else hit_l
+            which = "common" if hit_c is not None else "latin"
+            return CONFLICT, self._conflict(line, common, latin, f"{which} name already used by another remedy",
+                                            self.records[hit])
+        for name, key in zip(names, alias_keys):
+            taken = self.index.get(key)
+            if taken is not None:
+                return CONFLICT, self._conflict(line, common, latin, f"alias '{name}' already names a remedy",
+                                                self.records[taken])
+        self._register(common, latin, (kc, kl) + tuple(alias_keys))
+        return NEW, None
+
+    def run(self, path, dry_run=False, report_path=None, progress=None, total=None):
+        result = ImportResult()
+        start = time.perf_counter()
+        line = 1  # header
+        for chunk in read_import_chunks(path, self.chunk_rows):
+            common = _tidy(chunk['common_col']).tolist()
+            latin = _tidy(chunk['latin_col']).tolist()
+            keys_c = normalize_series(pd.Series(common, dtype=object)).tolist()
+            keys_l = normalize_series(pd.Series(latin, dtype=object)).tolist()
+            for c, l, kc, kl, alias_cell in zip(common, latin, keys_c, keys_l, chunk[ALIAS_COL].tolist()):
+                line += 1
+                names = tuple(" ".join(n.split()) for n in split_aliases(alias_cell))
+                alias_keys = [normalize_key(n) for n in names]
+                kept = [(n, k) for n, k in zip(names, alias_keys) if k and k not in (kc, kl)]
+                names, alias_keys = tuple(n for n, _ in kept), [k for _, k in kept]
+                outcome, conflict = self.classify(line, c, l, names, kc, kl, alias_keys)
+                if outcome == NEW:
+                    common_name, latin_name = self.records[-1]
+                    result.added.append((common_name, latin_name, names))
+                elif outcome == DUPLICATE:
+                    result.duplicates += 1
+                elif outcome == CONFLICT:
+                    result.conflicts.append(conflict)
+                else:
+                    result.invalid += 1
+            result.read += len(chunk)
+            elapsed = time.perf_counter() - start
+            if progress is not None:
+                progress(result.read, total, result.read / elapsed if elapsed else 0.0)
+        result.seconds = time.perf_counter() - start
+        logging.info(f"Catalog import of {path}: {result.summary()}")
+        if report_path and result.conflicts:
+            write_conflicts(report_path, result.conflicts)
+            result.report_path = report_path
+        if result.added and not dry_run:
+            start = time.perf_counter()
+            self.commit(result.added)
+            result.write_seconds = time.perf_counter() - start
+            result.written = True
+        return result
+
+    def commit(self, added):
+        # One write of remedies.xlsx: temp file next to it, then an atomic rename
+        new_rows = pd.DataFrame({'common_col': [c for c, _, _ in added], 'latin_col': [l for _, l, _ in added]})
+        frame = self.frame
+        if ALIAS_COL in frame.columns or any(names for _, _, names in added):
+            new_rows[ALIAS_COL] = [f"{ALIAS_SEP} ".join(names) for _, _, names in added]
+            if ALIAS_COL not in frame.columns:
+                frame = frame.assign(**{ALIAS_COL: ""})
+        frame = pd.concat([frame, new_rows], ignore_index=True)
+        frame.fillna('', inplace=True)
+        base, ext = os.path.splitext(self.remedies_file)
+        tmp = f"{base}.importing{ext or '.xlsx'}"
+        frame.to_excel(tmp, index=False, engine="openpyxl")
+        os.replace(tmp, self.remedies_file)
+        self.frame = frame
+        return frame
+
+
+def write_conflicts(path, conflicts):
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=['line', 'common', 'latin', 'reason', 'existing_common',
+                                               'existing_latin'])
+        writer.writeheader()
+        writer.writerows(conflicts)
+
+
+def count_rows(path):
+    # Data rows in a CSV (for progress percentages); None for XLSX, where it would mean reading the file twice.
+    # Counted as records the way read_import_chunks parses them: a quoted name with a line break in it is one
+    # row, blank lines are none
+    if os.path.splitext(path)[1].lower() in (".xlsx", ".xlsm"):
+        return None
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return max(0, sum(1 for row in csv.reader(f, delimiter=_csv_delimiter(path)) if row) - 1)
+
+
+def import_catalog(path, remedies_file, dry_run=False, report_path=None, progress=None, chunk_rows=CHUNK_ROWS,
+                   frame=None):
+    # -> (ImportResult, catalog frame after the import)
+    importer = CatalogImporter(remedies_file, chunk_rows, frame)
+    result = importer.run(path, dry_run, report_path, progress, count_rows(path))
+    return result, importer.frame
+
+
+# ---------------- CLI / benchmark ----------------
+def _bench_files(directory, rows):
+    # remedies.xlsx with rows // 2 remedies and a supplier CSV of `rows` rows: half of them already in the
+    # catalog (in other spellings), a few conflicting, the rest new
+    from homeolabel.sstable import _sample_records
+    records = _sample_records(rows)
+    existing = records[:rows // 2]
+    remedies = os.path.join(directory, "remedies.xlsx")
+    pd.DataFrame({'latin_col': [l for _, l, _ in existing], 'common_col': [c for c, _, _ in existing],
+                  ALIAS_COL: [f"{ALIAS_SEP} ".join(a) for _, _, a in existing]}).to_excel(
+        remedies, index=False, engine="openpyxl")
+    supplier = os.path.join(directory, "supplier.csv")
+    with open(supplier, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Common Name", "Latin Name", "Synonyms"])
+        for i, (common, latin, aliases) in enumerate(records):
+            if i < rows // 2 and i % 3 == 0:
+                common, latin = common.upper(), f"  {latin.lower()} "
+            if i % 97 == 0:
+                latin = f"{latin} x"  # same common name, different latin: conflict
+            writer.writerow([common, latin, f"{ALIAS_SEP} ".join(aliases)])
+    return remedies, supplier
+
+
+def bench(rows=50000, chunk_rows=CHUNK_ROWS):
+    import shutil
+    import tempfile
+    directory = tempfile.mkdtemp(prefix="label_import_bench_")
+    try:
+        remedies, supplier = _bench_files(directory, rows)
+        start = time.perf_counter()
+        importer = CatalogImporter(remedies, chunk_rows)
+        index_s = time.perf_counter() - start
+        result = importer.run(supplier, report_path=os.path.join(directory, "conflicts.csv"))
+        summary = result.summary()
+        summary.update(catalog_rows=rows // 2, index_s=round(index_s, 3), report=None)
+        return summary
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import a supplier remedy list into remedies.xlsx")
+    parser.add_argument("source", nargs="?", help="CSV or XLSX with common / latin (/ alias) columns")
+    parser.add_argument("--remedies", default="remedies.xlsx")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--dry-run", action="store_true", help="classify and report only, don't write")
+    parser.add_argument("--report", help="write the conflicts here (CSV)")
+    parser.add_argument("--bench", action="store_true", help="import a synthetic list into a synthetic catalog")
+    parser.add_argument("--rows", type=int, default=50000, help="--bench: supplier rows")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.bench:
+        print(json.dumps(bench(args.rows, args.chunk_rows), indent=2))
+        return 0
+    if not args.source:
+        parser.error("source file required")
+
+    def _progress(done, total, rate):
+        share = f"{done}/{total}" if total else str(done)
+        print(f"  {share} rows, {rate:.0f} rows/s", file=sys.stderr)
+
+    result, _ = import_catalog(args.source, args.remedies, args.dry_run, args.report, _progress, args.chunk_rows)
+    print(json.dumps(result.summary(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
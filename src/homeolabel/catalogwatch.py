@@ -0,0 +1,109 @@
+# catalogwatch.py
+"""
+Hot reload of remedies.xlsx
+- CatalogWatcher polls the file's (mtime, size) on a daemon thread; no OS-specific
+  change notification APIs, so it works the same on network shares
+- A change is only picked up once two polls agree, so a file that head office is
+  still copying in is not read half-written (a failed read is retried next poll)
+- The new rows are diffed against the current index and only the removed / added
+  rows are applied (CatalogIndex.apply_changes); the old index keeps answering
+  searches while the new one is built
+- A memory-mapped string table (large catalogs) has no incremental update; it
+  is rebuilt into a new file by the `rebuild` callable instead
+- on_reload(index, df, removed, added) is called from the watcher thread; the GUI
+  hands it to the Qt thread with a signal and swaps its reference there
+"""
+import os
+import logging
+import threading
+
+from homeolabel.catalog import load_remedies_frame, frame_rows, diff_rows
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+class CatalogWatcher:
+    def __init__(self, path, index, on_reload, interval=2.0, loader=None, rebuild=None):
+        self.path = path
+        self.index = index
+        # rebuild(records) -> new index, for indexes without apply_changes (sstable.StringTable)
+        self.rebuild = rebuild
+        self.on_reload = on_reload
+        self.interval = interval
+        self.loader = loader or (lambda p: load_remedies_frame(p, create=False))
+        self.reloads = 0
+        self._stamp = _file_stamp(path)
+        self._seen = self._stamp
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="catalog-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def stamp(self):
+        # (mtime, size) of the file the current index was built from
+        return self._stamp
+
+    def note_written(self, index):
+        # The app wrote the file itself (save_new_medicine): adopt its index, skip the reload
+        with self._lock:
+            self.index = index
+            self._stamp = self._seen = _file_stamp(self.path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logging.error(f"Catalog watcher error: {e}")
+
+    def check(self):
+        # One poll. Returns True when a reload was applied.
+        stamp = _file_stamp(self.path)
+        if stamp is None or stamp == self._stamp:
+            self._seen = stamp
+            return False
+        if stamp != self._seen:
+            # Still changing (or first sight of the change): wait for it to settle
+            self._seen = stamp
+            return False
+        try:
+            df = self.loader(self.path)
+        except Exception as e:
+            logging.warning(f"Catalog reload of {self.path} failed, retrying: {e}")
+            self._seen = None
+            return False
+        with self._lock:
+            if _file_stamp(self.path) != stamp:
+                return False  # changed again while we were reading
+            records = frame_rows(df)
+            removed, added = diff_rows(self.index.records(), records)
+            self._stamp = stamp
+            if not removed and not added:
+                return False
+            if hasattr(self.index, 'apply_changes'):
+                self.index = self.index.apply_changes(removed, added)
+            else:
+                self.index = self.rebuild(records)
+            self.reloads += 1
+            index = self.index
+        logging.info(f"Catalog reloaded from {self.path}: +{len(added)} / -{len(removed)} rows")
+        self.on_reload(index, df, removed, added)
+        return True
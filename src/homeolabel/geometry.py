@@ -0,0 +1,193 @@
+# geometry.py
+"""
+Label geometry profiles (one per label stock)
+- LabelGeometry: size, border inset, text width, fonts, base / minimum font size,
+  line spacing, first baseline, max lines
+- Everything derived from those (sizes in points, border rectangle, text box,
+  first baseline, room for the lines) is computed once when the profile is made;
+  pixel values for GDI / raster output once per DPI (pixels(dpi_x, dpi_y))
+- PROFILES: the built-in stocks; ProfileStore reads records/label_profiles.json,
+  which can add / override profiles, says which printer uses which profile and
+  which printers take RAW 1-bit bitmaps (raster.py) instead of the PDF:
+
+    {"profiles": {"40x25": {"width_mm": 40, "height_mm": 25, "base_font_size": 8}},
+     "printers": {"TSC TE244": "40x25"},
+     "raw": {"TSC TE244": {"format": "tspl", "dpi": 203}}}
+"""
+import os
+import json
+import logging
+import threading
+
+MM_PT = 72.0 / 25.4
+DEFAULT_PROFILE = "50x30"
+
+
+class GeometryPixels:
+    # LabelGeometry at one device resolution (GDI printer DC / raster)
+    __slots__ = ('dpi_x', 'dpi_y', 'px_per_pt_x', 'px_per_pt_y', 'px_per_mm_x', 'px_per_mm_y',
+                 'page_w', 'page_h', 'margin_x', 'margin_y', 'x_center', 'text_top', 'line_px')
+
+    def __init__(self, geometry, dpi_x, dpi_y):
+        self.dpi_x = dpi_x
+        self.dpi_y = dpi_y
+        self.px_per_pt_x = dpi_x / 72.0
+        self.px_per_pt_y = dpi_y / 72.0
+        self.px_per_mm_x = dpi_x / 25.4
+        self.px_per_mm_y = dpi_y / 25.4
+        self.page_w = int(round(geometry.width_mm * self.px_per_mm_x))
+        self.page_h = int(round(geometry.height_mm * self.px_per_mm_y))
+        self.margin_x = int(round(geometry.border_mm * self.px_per_mm_x))
+        self.margin_y = int(round(geometry.border_mm * self.px_per_mm_y))
+        self.x_center = self.page_w // 2
+        # GDI TextOut places the top of the text; the first line starts ~3mm inside the border
+        self.text_top = self.margin_y + int(3 * self.px_per_mm_y)
+        self.line_px = max(1, int(round(self.px_per_pt_y)))  # 1pt border
+
+
+class LabelGeometry:
+    __slots__ = ('name', 'width_mm', 'height_mm', 'border_mm', 'text_width_mm', 'font', 'screen_font',
+                 'base_font_size', 'min_font_size', 'line_gap', 'first_baseline', 'max_lines', 'gap_mm',
+                 # derived, in points (PDF coordinates: origin bottom-left)
+                 'width_pt', 'height_pt', 'page_size', 'border_rect', 'center_x', 'baseline_y',
+                 'max_text_width', 'max_text_height', 'key', '_pixels')
+
+    FIELDS = ('width_mm', 'height_mm', 'border_mm', 'text_width_mm', 'font', 'screen_font', 'base_font_size',
+              'min_font_size', 'line_gap', 'first_baseline', 'max_lines', 'gap_mm')
+
+    def __init__(self, name, width_mm, height_mm, border_mm=2, text_width_mm=None, font="Helvetica",
+                 screen_font="Arial", base_font_size=9, min_font_size=6, line_gap=1.15, first_baseline=0.12,
+                 max_lines=6, gap_mm=2):
+        self.name = name
+        self.width_mm = width_mm
+        self.height_mm = height_mm
+        self.border_mm = border_mm
+        self.text_width_mm = text_width_mm if text_width_mm is not None else width_mm - 2 * (border_mm + 1)
+        self.font = font
+        self.screen_font = screen_font
+        self.base_font_size = base_font_size
+        self.min_font_size = min_font_size
+        self.line_gap = line_gap
+        self.first_baseline = first_baseline      # first baseline below the top edge, fraction of the height
+        self.max_lines = max_lines
+        self.gap_mm = gap_mm                      # gap between labels on the roll (TSPL)
+
+        self.width_pt = width_mm * MM_PT
+        self.height_pt = height_mm * MM_PT
+        self.page_size = (self.width_pt, self.height_pt)
+        border = border_mm * MM_PT
+        self.border_rect = (border, border, self.width_pt - 2 * border, self.height_pt - 2 * border)
+        self.center_x = self.width_pt / 2.0
+        self.baseline_y = self.height_pt - first_baseline * self.height_pt
+        self.max_text_width = self.text_width_mm * MM_PT
+        # First baseline down to just inside the bottom border (0.5mm + the 1pt line)
+        self.max_text_height = self.baseline_y - (border_mm + 0.5) * MM_PT - 1
+        self.key = (name,) + tuple(getattr(self, f) for f in self.FIELDS)
+        self._pixels = {}
+
+    def pixels(self, dpi_x, dpi_y=None):
+        dpi_y = dpi_x if dpi_y is None else dpi_y
+        px = self._pixels.get((dpi_x, dpi_y))
+        if px is None:
+            px = self._pixels[(dpi_x, dpi_y)] = GeometryPixels(self, dpi_x, dpi_y)
+        return px
+
+    def to_dict(self):
+        return {'name': self.name, **{f: getattr(self, f) for f in self.FIELDS}}
+
+    @classmethod
+    def from_dict(cls, data, name=None):
+        data = dict(data)
+        name = data.pop('name', None) or name
+        return cls(name, **{k: v for k, v in data.items() if k in cls.FIELDS})
+
+    def __eq__(self, other):
+        return isinstance(other, LabelGeometry) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __repr__(self):
+        return f"LabelGeometry({self.name!r}, {self.width_mm}x{self.height_mm}mm)"
+
+
+PROFILES = {
+    "50x30": LabelGeometry("50x30", 50, 30, text_width_mm=44),
+    "38x25": LabelGeometry("38x25", 38, 25, text_width_mm=33, base_font_size=8, max_lines=5),
+    "76x51": LabelGeometry("76x51", 76, 51, text_width_mm=68, border_mm=3, base_font_size=11, max_lines=8),
+}
+DEFAULT_GEOMETRY = PROFILES[DEFAULT_PROFILE]
+
+
+def get_profile(name, profiles=None):
+    return (profiles or PROFILES).get(name) or DEFAULT_GEOMETRY
+
+
+class ProfileStore:
+    # Built-in + records/label_profiles.json profiles, and the printer -> profile map
+    def __init__(self, path=None):
+        self.path = path
+        self.profiles = dict(PROFILES)
+        self.printers = {}
+        self.raw = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                for name, spec in (data.get('profiles') or {}).items():
+                    self.profiles[name] = LabelGeometry.from_dict(spec, name=name)
+                self.printers = {p: n for p, n in (data.get('printers') or {}).items() if n in self.profiles}
+                self.raw = {p: dict(s) for p, s in (data.get('raw') or {}).items() if s}
+            except Exception as e:
+                logging.error(f"Could not read label profiles from {path}: {e}")
+
+    def names(self):
+        return list(self.profiles)
+
+    def get(self, name):
+        return get_profile(name, self.profiles)
+
+    def for_printer(self, printer):
+        return self.get(self.printers.get(printer, DEFAULT_PROFILE))
+
+    def assign(self, printer, name):
+        # Remember the stock loaded in `printer`; written back to the JSON file
+        if not printer or name not in self.profiles or self.printers.get(printer) == name:
+            return
+        with self._lock:
+            self.printers[printer] = name
+            self.save()
+
+    def raw_settings(self, printer):
+        # {'format': 'tspl' | 'zpl', 'dpi': 203} when `printer` prints RAW bitmaps, else None
+        return self.raw.get(printer)
+
+    def set_raw(self, printer, raw_format=None, dpi=None):
+        # raw_format None: back to the PDF chain
+        if not printer:
+            return
+        with self._lock:
+            if raw_format:
+                self.raw[printer] = {'format': raw_format, 'dpi': int(dpi) if dpi else None}
+            else:
+                self.raw.pop(printer, None)
+            self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        custom = {n: g.to_dict() for n, g in self.profiles.items() if PROFILES.get(n) != g}
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({'profiles': custom, 'printers': self.printers, 'raw': self.raw}, f, indent=2)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logging.error(f"Could not save label profiles to {self.path}: {e}")
@@ -0,0 +1,189 @@
+# labelcache.py
+"""
+Content-addressed cache of rendered labels
+- Key: sha256 over the label fields + geometry profile + font + base size (+ a format version)
+- Tier 1: bounded in-memory LRU of (fitlines, pdf_bytes)
+- Tier 2: optional on-disk directory, evicted oldest-first once it passes max_disk_bytes;
+  an entry is one JSON header line with the fitlines followed by the raw PDF bytes
+  (no pickle: the folder is only data), unreadable entries are deleted
+- stats(): hits / misses / hit rate per tier
+
+A repeat prescription (same medicine, potency, dose, time, shop, branch) skips
+the line layout (fit_label) and the reportlab render entirely.
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from homeolabel.render import fit_label, render_label_pdf, BASE_PRINT_FONT
+from homeolabel.geometry import DEFAULT_GEOMETRY
+
+# Bump when the rendered output changes so stale disk entries stop matching
+CACHE_VERSION = 3
+_SUFFIX = ".lbl"
+
+
+def _encode_entry(value):
+    fitlines, pdf_bytes = value
+    header = json.dumps({'fitlines': fitlines}, ensure_ascii=False, separators=(",", ":"))
+    return header.encode("utf-8") + b"\n" + pdf_bytes
+
+
+def _decode_entry(data):
+    header, sep, pdf_bytes = data.partition(b"\n")
+    if not sep:
+        raise ValueError("no header line")
+    fitlines = json.loads(header.decode("utf-8"))['fitlines']
+    if not all(isinstance(text, str) and isinstance(size, (int, float)) for text, size in fitlines):
+        raise ValueError("bad fitlines")
+    return tuple((text, size) for text, size in fitlines), pdf_bytes
+
+
+def label_cache_key(fields, geometry=None, font=None, base_font_size=BASE_PRINT_FONT, copies=1):
+    g = geometry or DEFAULT_GEOMETRY
+    payload = json.dumps([CACHE_VERSION, [str(f) for f in fields], list(g.key), font or g.font, base_font_size,
+                          copies],
+                         ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    def __init__(self, cache_dir=None, max_items=256, max_disk_bytes=64 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_items = max_items
+        self.max_disk_bytes = max_disk_bytes
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        self.counters = {'mem_hits': 0, 'disk_hits': 0, 'misses': 0, 'evicted_mem': 0, 'evicted_disk': 0}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + _SUFFIX)
+
+    def _disk_entries(self):
+        out = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(_SUFFIX):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            out.append((name, st.st_size, st.st_mtime))
+        return out
+
+    def _remember(self, key, value):
+        self._mem[key] = value
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_items:
+            self._mem.popitem(last=False)
+            self.counters['evicted_mem'] += 1
+
+    def get(self, key):
+        with self._lock:
+            value = self._mem.get(key)
+            if value is not None:
+                self._mem.move_to_end(key)
+                self.counters['mem_hits'] += 1
+                return value
+            if self.cache_dir:
+                path = self._path(key)
+                try:
+                    with open(path, "rb") as f:
+                        value = _decode_entry(f.read())
+                    os.utime(path)  # disk tier evicts by mtime, so a hit refreshes it
+                except FileNotFoundError:
+                    value = None
+                except Exception as e:
+                    logging.warning(f"Dropping unreadable label cache entry {path}: {e}")
+                    self._drop(path)
+                    value = None
+                if value is not None:
+                    self.counters['disk_hits'] += 1
+                    self._remember(key, value)
+                    return value
+            self.counters['misses'] += 1
+            return None
+
+    def put(self, key, fitlines, pdf_bytes):
+        value = (tuple(tuple(line) for line in fitlines), bytes(pdf_bytes))
+        with self._lock:
+            self._remember(key, value)
+            if not self.cache_dir:
+                return
+            path = self._path(key)
+            tmp = path + ".tmp"
+            try:
+                with open(tmp, "wb") as f:
+                    f.write(_encode_entry(value))
+                old = os.path.getsize(path) if os.path.exists(path) else 0
+                os.replace(tmp, path)
+                self._disk_bytes += os.path.getsize(path) - old
+            except OSError as e:
+                logging.warning(f"Label cache write failed: {e}")
+                return
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _drop(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            self._disk_bytes -= size
+        except OSError:
+            pass
+
+    def _evict_disk(self):
+        # Oldest first until we are back under 90% of the budget
+        target = self.max_disk_bytes * 0.9
+        for name, size, _ in sorted(self._disk_entries(), key=lambda e: e[2]):
+            if self._disk_bytes <= target:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+                self._disk_bytes -= size
+                self.counters['evicted_disk'] += 1
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            if self.cache_dir:
+                for name, _, _ in self._disk_entries():
+                    try:
+                        os.remove(os.path.join(self.cache_dir, name))
+                    except OSError:
+                        pass
+                self._disk_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            c = dict(self.counters)
+            hits = c['mem_hits'] + c['disk_hits']
+            lookups = hits + c['misses']
+            c.update(hits=hits, lookups=lookups, hit_rate=round(hits / lookups, 4) if lookups else 0.0,
+                     mem_items=len(self._mem), disk_bytes=self._disk_bytes)
+            return c
+
+
+def render_label_cached(cache, fields, base_font_size=BASE_PRINT_FONT, copies=1, fitlines=None, geometry=None):
+    # fields: (medicine, potency, dose, time, shop, branch). Returns (fitlines, pdf_bytes).
+    # fitlines: a layout already computed for these fields (labeljob.LabelLayout), reused as is.
+    if cache is None:
+        return render_label_pdf(None, base_font_size=base_font_size, copies=copies, geometry=geometry,
+                                fitlines=fitlines or fit_label(fields, base_font_size, geometry))
+    key = label_cache_key(fields, geometry, base_font_size=base_font_size, copies=copies)
+    hit = cache.get(key)
+    if hit is not None:
+        return hit
+    fitlines, pdf_bytes = render_label_pdf(None, base_font_size=base_font_size, copies=copies, geometry=geometry,
+                                           fitlines=fitlines or fit_label(fields, base_font_size, geometry))
+    cache.put(key, fitlines, pdf_bytes)
+    return fitlines, pdf_bytes
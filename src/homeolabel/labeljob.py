@@ -0,0 +1,78 @@
+# labeljob.py
+"""
+Immutable label model shared by the preview, the PDF renderer and the GDI / RAW
+printers
+- LabelJob: the six label fields (stripped) + base font size + geometry profile;
+  hashable, compares by value, so "did the label change?" is one tuple compare
+- LabelLayout: a job and its fitted lines, computed once per field change by
+  LabelJob.layout(); iterates as [(text, font_size), ...], so it can be passed
+  anywhere fitlines are expected (draw_label, print_label_direct, raster)
+
+The GUI keeps the layout its preview painted and the print path reuses it, so an
+auto-printed label is laid out once.
+"""
+from homeolabel.render import fit_label
+from homeolabel.geometry import DEFAULT_GEOMETRY
+
+FIELD_NAMES = ("medicine", "potency", "dose", "time", "shop", "branch")
+
+
+class LabelJob:
+    __slots__ = ('fields', 'base_font_size', 'geometry', '_hash')
+
+    def __init__(self, fields, base_font_size=None, geometry=None):
+        fields = tuple(str(f or "").strip() for f in fields)
+        if len(fields) != len(FIELD_NAMES):
+            raise ValueError(f"expected {len(FIELD_NAMES)} label fields, got {len(fields)}")
+        geometry = geometry or DEFAULT_GEOMETRY
+        base_font_size = base_font_size or geometry.base_font_size
+        object.__setattr__(self, 'fields', fields)
+        object.__setattr__(self, 'base_font_size', base_font_size)
+        object.__setattr__(self, 'geometry', geometry)
+        object.__setattr__(self, '_hash', hash((fields, base_font_size, geometry)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("LabelJob is immutable")
+
+    def __eq__(self, other):
+        if not isinstance(other, LabelJob):
+            return NotImplemented
+        return (self.fields == other.fields and self.base_font_size == other.base_font_size
+                and self.geometry == other.geometry)
+
+    def __hash__(self):
+        return self._hash
+
+    def __repr__(self):
+        return f"LabelJob({self.fields!r}, {self.base_font_size}, {self.geometry.name!r})"
+
+    @property
+    def complete(self):
+        # Every field filled in (auto print only fires then)
+        return all(self.fields)
+
+    def layout(self):
+        return LabelLayout(self, fit_label(self.fields, self.base_font_size, self.geometry))
+
+
+class LabelLayout:
+    __slots__ = ('job', 'lines')
+
+    def __init__(self, job, lines):
+        object.__setattr__(self, 'job', job)
+        object.__setattr__(self, 'lines', tuple((str(text), size) for text, size in lines))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("LabelLayout is immutable")
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __getitem__(self, i):
+        return self.lines[i]
+
+    def __repr__(self):
+        return f"LabelLayout({self.job!r}, {self.lines!r})"
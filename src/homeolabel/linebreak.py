@@ -0,0 +1,289 @@
+# linebreak.py
+"""
+Width-aware line breaking for labels (replaces the fixed 18-character split)
+- break_paragraph: minimum-badness breaks, Knuth-Plass style: dynamic programming
+  over the words' real widths (PDF font metrics), cost = squared slack of every
+  line but the last + a penalty per line; a word too wide for the box on its own
+  gets a line to itself and is shrunk, at a high cost. The DP state is the line
+  count capped at min_lines, so it is O(words^2 * min_lines), not a rescan per count
+- solve_layout: chooses the font size of the medicine block and of the other lines
+  together - the cheapest breaks + shrinking whose lines fit the label height.
+  Smaller block sizes are not broken at all once their shrink penalty alone
+  exceeds the best layout found (the usual case: the base size fits)
+- Both are memoized on their input strings; while typing in one field only that
+  field's paragraph is broken again, everything else is a cache hit (each typed
+  prefix is new text, so typing itself runs cold: --bench measures that case)
+- Word widths come from the glyph table (metrics.GlyphWidths): one vectorized
+  lookup for a label's new paragraphs, a plain loop for the few words of a
+  keystroke, kept in font units so every size solve_layout tries reuses them
+  (units * 0.001 * size is exactly stringWidth)
+
+Bench: python -m homeolabel.linebreak --bench
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+from functools import lru_cache
+
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from homeolabel.metrics import glyph_widths
+
+LINE_GAP = 1.15          # baseline-to-baseline, in font sizes (same as draw_label)
+DESCENT = 0.21           # Helvetica descender, in font sizes
+SLACK_WEIGHT = 100.0     # cost of a line that is completely empty
+LINE_PENALTY = 10.0      # every extra line
+OVERFULL_PENALTY = 1000.0  # a single word that only fits shrunk
+SHRINK_PENALTY = 40.0    # per point below the base size, per line
+
+
+_WORD_UNITS = {}
+_WORD_UNITS_MAX = 4096
+SCALAR_WORDS = 32  # up to this many words are measured without the vectorized lookup
+_WORD_UNITS_LOCK = threading.Lock()  # the server's executor, the prerender worker and the GUI share it
+
+
+def prime_word_units(texts, fontname):
+    # Measure every paragraph not seen yet in one glyph-table lookup -> {text: units} for all of texts
+    texts = list(dict.fromkeys(texts))
+    with _WORD_UNITS_LOCK:
+        found = {t: _WORD_UNITS[(t, fontname)] for t in texts if (t, fontname) in _WORD_UNITS}
+    missing = [t for t in texts if t not in found]
+    if not missing:
+        return found
+    try:
+        gw = glyph_widths(fontname)
+    except ValueError:
+        gw = None  # not a Type1 font: break_paragraph measures with stringWidth
+    pieces = [t.split() + [" "] for t in missing]
+    if gw is None:
+        measured = dict.fromkeys(missing)
+    elif sum(map(len, pieces)) <= SCALAR_WORDS:
+        # Typing: one new paragraph of a few words; a NumPy call costs more than the lookups
+        measured = {t: tuple(gw.text_units(w) for w in words) for t, words in zip(missing, pieces)}
+    else:
+        flat = gw.units([w for words in pieces for w in words]).tolist()
+        measured = {}
+        start = 0
+        for t, words in zip(missing, pieces):
+            measured[t] = tuple(flat[start:start + len(words)])
+            start += len(words)
+    with _WORD_UNITS_LOCK:
+        if len(_WORD_UNITS) + len(measured) > _WORD_UNITS_MAX:
+            _WORD_UNITS.clear()
+        for t, units in measured.items():
+            _WORD_UNITS[(t, fontname)] = units
+    found.update(measured)
+    return found
+
+
+def word_units(text, fontname):
+    # (width of each word..., width of a space) in 1/1000 em; None for a font without a Type1 table
+    return prime_word_units((text,), fontname)[text]
+
+
+def _scaled(units, size):
+    # Same expression as reportlab's stringWidth, so the floats match bit for bit
+    return units * 0.001 * size
+
+
+@lru_cache(maxsize=8192)
+def break_paragraph(text, fontname, size, max_width, min_size=6, min_lines=1):
+    # -> (cost, ((line, font_size), ...)). min_lines forces a break (medicine name over potency).
+    words = text.split()
+    if not words:
+        return 0.0, (("", size),)
+    n = len(words)
+    units = word_units(text, fontname)
+    if units is not None:
+        space = _scaled(units[-1], size)
+        widths = [_scaled(u, size) for u in units[:-1]]
+    else:
+        space = stringWidth(" ", fontname, size)
+        widths = [stringWidth(w, fontname, size) for w in words]
+    inf = float("inf")
+    # Line counts past min_lines are folded into one state: c = min(lines, min_lines).
+    # best[c][j] is (cost, lines) of the cheapest setting of words[:j]; comparing the pair picks
+    # the fewest lines among equal costs, as choosing the cheapest exact line count did.
+    # prev[c][j]: (start of the last line, state before it). O(n^2 * min_lines) instead of O(n^3).
+    m = max(1, min_lines)
+    best = [[(inf, 0)] * (n + 1) for _ in range(m + 1)]
+    prev = [[None] * (n + 1) for _ in range(m + 1)]
+    best[0][0] = (0.0, 0)
+    for j in range(1, n + 1):
+        width = -space
+        for i in range(j - 1, -1, -1):
+            width += widths[i] + space
+            if width > max_width and i < j - 1:
+                break  # every earlier start only makes the line wider
+            if width > max_width:
+                badness = OVERFULL_PENALTY
+            elif j == n:
+                badness = 0.0  # the last line may be short
+            else:
+                badness = SLACK_WEIGHT * ((max_width - width) / max_width) ** 2
+            for c in range(m + 1):
+                cost, count = best[c][i]
+                if cost == inf:
+                    continue
+                cand = (cost + badness + LINE_PENALTY, count + 1)
+                to = min(c + 1, m)
+                if cand < best[to][j]:
+                    best[to][j] = cand
+                    prev[to][j] = (i, c)
+    c = m if best[m][n][0] < inf else min(range(m), key=lambda state: best[state][n])
+    cost = best[c][n][0]
+    bounds = []
+    j = n
+    while j:
+        i, before = prev[c][j]
+        bounds.append((i, j))
+        j, c = i, before
+    lines = []
+    for i, j in reversed(bounds):
+        line = " ".join(words[i:j])
+        if units is not None:
+            line_units = sum(units[i:j]) + units[-1] * (j - i - 1)
+            measure = lambda line_size: _scaled(line_units, line_size)
+        else:
+            measure = lambda line_size: stringWidth(line, fontname, line_size)
+        line_size = size
+        while line_size > min_size and measure(line_size) > max_width:
+            line_size -= 1
+        lines.append((line, line_size))
+    return cost, tuple(lines)
+
+
+def layout_height(lines, line_gap=LINE_GAP):
+    # First baseline to the bottom of the last line's descenders, in points
+    if not lines:
+        return 0.0
+    return sum(size * line_gap for _, size in lines[:-1]) + lines[-1][1] * DESCENT
+
+
+@lru_cache(maxsize=4096)
+def solve_layout(block, others, fontname, base_size, max_width, max_height, min_size=6, block_min_lines=1,
+                 max_lines=None, line_gap=LINE_GAP):
+    # block: the medicine name + potency paragraph; others: tuple of the remaining paragraphs.
+    # Returns ((line, font_size), ...) for the whole label. max_lines: the most lines the stock takes.
+    prime_word_units((block,) + tuple(others), fontname)
+    sizes = range(int(base_size), min_size - 1, -1)
+    # The other paragraphs only depend on their own size: broken once per size, not per block size
+    other_parts = []
+    for other_size in sizes:
+        parts = [break_paragraph(text, fontname, other_size, max_width, min_size) for text in others]
+        terms = [part_cost + SHRINK_PENALTY * (base_size - other_size) * len(part_lines)
+                 for part_cost, part_lines in parts]
+        other_parts.append((terms, [line for _, part_lines in parts for line in part_lines]))
+    # Lower bound of a block's own cost at a size: each of its lines costs LINE_PENALTY and is shrunk
+    words = len(block.split())
+    least_lines = min(max(1, block_min_lines), words) if words else 1
+    least_other = min(sum(terms) for terms, _ in other_parts) if other_parts else 0.0
+    best = None
+    for block_size in sizes:
+        if best is not None:
+            bound = ((LINE_PENALTY * least_lines if words else 0.0)
+                     + SHRINK_PENALTY * (base_size - block_size) * least_lines + least_other)
+            if bound > best[0] + 1e-6:
+                break  # smaller sizes only shrink more: none of them can be cheaper
+        block_cost, block_lines = break_paragraph(block, fontname, block_size, max_width, min_size,
+                                                  block_min_lines)
+        for terms, other_lines in other_parts:
+            cost = block_cost + SHRINK_PENALTY * (base_size - block_size) * len(block_lines)
+            for term in terms:
+                cost += term
+            # Only a cheaper setting can win, so the height is measured for those alone
+            if best is not None and not cost < best[0]:
+                continue
+            if max_lines and len(block_lines) + len(other_lines) > max_lines:
+                continue
+            lines = list(block_lines) + other_lines
+            if layout_height(lines, line_gap) > max_height:
+                continue
+            best = (cost, lines)
+    if best is None:
+        # Nothing fits at all: the smallest sizes tried
+        return tuple(list(block_lines) + other_parts[-1][1])
+    return tuple(best[1])
+
+
+# ---------------- benchmark ----------------
+def _sample_fields():
+    from homeolabel.batch import sample_jobs
+    names = ["Nux vomica", "Calcarea carbonica ostrearum", "Mercurius solubilis hahnemanni",
+             "Wiesbaden Mammillaria WWW", "Lycopodium clavatum", "Kali bichromicum", "Thuja occidentalis"]
+    base = list(sample_jobs(1))[0]
+    return [(name,) + tuple(base[1:]) for name in names]
+
+
+def _cold():
+    # Forget every measured word and layout: each typed prefix is new text while a name is typed.
+    # Through the import, as render uses it (under -m this file also runs as __main__)
+    from homeolabel import linebreak
+    with linebreak._WORD_UNITS_LOCK:
+        linebreak._WORD_UNITS.clear()
+    linebreak.break_paragraph.cache_clear()
+    linebreak.solve_layout.cache_clear()
+
+
+def benchmark(rounds=20):
+    # Preview loop: the name is typed one key at a time, then the other fields change. Caches are
+    # cleared before every round, so each prefix is laid out cold as it is while typing
+    from reportlab.pdfgen import canvas
+    from homeolabel.render import (build_label_lines, fit_lines_to_box, fit_label, PRINT_FONT, BASE_PRINT_FONT,
+                                   MAX_TEXT_WIDTH_MM)
+    events = []
+    for fields in _sample_fields():
+        name = fields[0]
+        for end in range(1, len(name) + 1):
+            events.append((name[:end],) + fields[1:])
+        for dose in ("2 pills", "4 pills", "6 pills"):
+            events.append(fields[:2] + (dose,) + fields[3:])
+    glyph_widths(PRINT_FONT)  # built once per process, not per label
+    dummy = canvas.Canvas("dummy.pdf")
+    timings = {}
+    for label, run in (
+            ("old_split_fit", lambda f: fit_lines_to_box(build_label_lines(*f), dummy, PRINT_FONT,
+                                                         BASE_PRINT_FONT, max_width_mm=MAX_TEXT_WIDTH_MM)),
+            ("width_aware_dp", lambda f: fit_label(f, BASE_PRINT_FONT))):
+        best = None
+        for _ in range(rounds):
+            _cold()
+            start = time.perf_counter()
+            for fields in events:
+                run(fields)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings[label + "_cold_us"] = round(best / len(events) * 1e6, 1)
+    # Repeats of a layout already seen (the preview redrawn, a label printed again) hit the cache
+    start = time.perf_counter()
+    for fields in events:
+        fit_label(fields, BASE_PRINT_FONT)
+    timings["width_aware_dp_cached_us"] = round((time.perf_counter() - start) / len(events) * 1e6, 1)
+    sizes = {}
+    for fields in _sample_fields():
+        old = fit_lines_to_box(build_label_lines(*fields), dummy, PRINT_FONT, BASE_PRINT_FONT,
+                               max_width_mm=MAX_TEXT_WIDTH_MM)
+        sizes[fields[0]] = {'old': old, 'new': fit_label(fields, BASE_PRINT_FONT)}
+    return {'events': len(events), **timings, 'layouts': sizes}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Label line breaking")
+    parser.add_argument("--bench", action="store_true", help="old split+fit vs DP on a cold typing loop")
+    parser.add_argument("fields", nargs="*", metavar="FIELD", help="medicine potency dose time shop branch")
+    args = parser.parse_args(argv)
+    if args.bench:
+        print(json.dumps(benchmark(), indent=2))
+        return 0
+    from homeolabel.render import fit_label
+    fields = (list(args.fields) + [""] * 6)[:6]
+    for line, size in fit_label(fields):
+        print(f"{size:>3}pt  {line}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+# loadtest.py
+"""
+Headless counter-traffic load harness for HomeoLabelApp
+- Runs the real window offscreen (QT_QPA_PLATFORM=offscreen, SKIP_WIN32=1) in a
+  scratch working directory; jobs go through the real spooler to
+  spooler.FakePrinter, printer status comes from FakeStatusBackend
+- One session is one prescription typed the way the counter does it: a burst of
+  keystrokes into the medicine search, a click on the suggestion, then picks in
+  the potency / dose / time / shop / branch boxes. The branch pick completes the
+  label and is the auto-print trigger
+- Reports p50/p95/p99 for keystroke -> suggestions shown and for trigger -> job
+  at the printer (includes the 150ms auto-print delay), labels per minute, and
+  jobs beyond one per session (duplicate prints)
+- --soak: thousands of sessions under memwatch.MemoryWatch; after a warm-up the
+  traced Python heap and the live Qt wrappers may only grow by a bounded amount
+  (exit status 1 otherwise); growth sites go to the memory report. Tracing
+  inflates the RSS, so RSS growth is only checked with --trace-frames 0
+
+Run:  python -m homeolabel.loadtest --sessions 200 --catalog-rows 5000
+      python -m homeolabel.loadtest --sessions 50 --keystroke-ms 120 --think-ms 400 --printer-delay 0.5
+Soak: python -m homeolabel.loadtest --soak --sessions 3000 --report memory_report.txt
+      python -m homeolabel.loadtest --soak --sessions 3000 --trace-frames 0
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+
+from PyQt5 import QtCore, QtWidgets
+from PyQt5.QtTest import QTest
+
+from homeolabel.spooler import FakePrinter
+from homeolabel.printerhealth import FakeStatusBackend
+from homeolabel.memwatch import MemoryWatch
+from homeolabel.timing import summarize_latencies
+
+FAKE_PRINTER = "FakePrinter"
+JOB_TIMEOUT = 10.0
+# --soak limits: growth after the warm-up sessions
+SOAK_MAX_GROWTH_MB = 16.0
+SOAK_MAX_QT_GROWTH = 200
+
+# Picks used when the scratch records/autocomplete.json has none
+DEFAULT_PICKS = {
+    'potency': ["6C", "30C", "200C", "1M", "Q"],
+    'dose': ["4 pills", "2 drops", "5 drops in water", "1 dose"],
+    'time': ["TDS", "BD", "OD", "Once a week", "Before sleep"],
+    'shop': ["Homeo Mahanagar"],
+    'branch': ["Branch 1 - 98300 00000", "Branch 2 - 98300 00001"],
+}
+
+_SYLLABLES = ["ar", "ni", "ca", "bry", "o", "ni", "bel", "la", "don", "nux", "vo", "mi", "pul", "sa", "til",
+              "rhus", "tox", "cal", "ca", "re", "sep", "ia", "lyc", "po", "di", "um", "sul", "phur", "ig", "na"]
+_EPITHETS = ["montana", "alba", "vomica", "nigricans", "officinalis", "carbonica", "toxicodendron",
+             "clavatum", "pratensis", "marina", "sylvestris", "aurea"]
+
+
+class TimedPrinter(FakePrinter):
+    # FakePrinter that notes when each job reached it
+    def __init__(self, name=FAKE_PRINTER, delay=0.0):
+        super().__init__(name, delay)
+        self.arrivals = []
+        self.count = 0
+        self._arrived = threading.Condition()
+
+    def print_job(self, job):
+        result = super().print_job(job)
+        with self._arrived:
+            self.arrivals.append((time.perf_counter(), job))
+            self.count += 1
+            self._arrived.notify_all()
+        return result
+
+    def forget(self):
+        # Drop the recorded jobs but the last one (soak runs: the harness' records are not the app's memory)
+        with self._lock:
+            del self.jobs[:]
+        with self._arrived:
+            del self.arrivals[:-1]
+
+
+def synthetic_catalog(path, rows, seed=1):
+    # remedies.xlsx with `rows` distinct made-up remedies (latin + common name)
+    import pandas as pd
+    rng = random.Random(seed)
+    seen = set()
+    latin, common = [], []
+    while len(latin) < rows:
+        stem = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+        name = f"{stem} {rng.choice(_EPITHETS)}"
+        if name in seen:
+            continue
+        seen.add(name)
+        latin.append(name)
+        common.append(stem if stem not in seen else name)
+        seen.add(stem)
+    pd.DataFrame({'latin_col': latin, 'common_col': common}).to_excel(path, index=False, engine="openpyxl")
+
+
+def _pump(app, seconds):
+    # Keep the event loop running (timers, spooler callbacks, repaints) for `seconds`
+    deadline = time.perf_counter() + seconds
+    while True:
+        app.processEvents()
+        if time.perf_counter() >= deadline:
+            return
+        time.sleep(0.001)
+
+
+def _wait_for_job(app, printer, count, timeout):
+    # Event loop runs until the printer has more than `count` jobs; arrival time or None
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        app.processEvents()
+        with printer._arrived:
+            if len(printer.arrivals) > count:
+                return printer.arrivals[count][0]
+            printer._arrived.wait(0.001)
+    return None
+
+
+def _pick_suggestion(window, medicine):
+    # Row showing `medicine`, else the first row; None when the table is empty
+    table = window.suggestion_table
+    for row in range(table.rowCount()):
+        if table.item(row, 0).data(QtCore.Qt.UserRole) == medicine:
+            return row
+    return 0 if table.rowCount() else None
+
+
+def run_session(app, window, printer, rng, medicine, picks, keystroke_ms=40.0, think_ms=0.0,
+                job_timeout=JOB_TIMEOUT):
+    # One prescription; returns (keystroke latencies ms, trigger -> printer ms or None, suggestion found)
+    combos = (window.potency_input, window.dose_input, window.time_input, window.shop_input,
+              window.branch_phone_input)
+    # New prescription: the counter clears the boxes first (incomplete label, nothing prints)
+    for combo in combos:
+        combo.setEditText("")
+    window.medicine_search.clear()
+    app.processEvents()
+
+    keystrokes = []
+    prefix = medicine[:rng.randint(min(3, len(medicine)), min(len(medicine), 8))]
+    for ch in prefix:
+        start = time.perf_counter()
+        QTest.keyClick(window.medicine_search, ch)
+        app.processEvents()  # suggestions are filled in on textChanged; this lets the table repaint
+        keystrokes.append((time.perf_counter() - start) * 1000.0)
+        if keystroke_ms:
+            _pump(app, rng.uniform(0.5, 1.5) * keystroke_ms / 1000.0)
+
+    row = _pick_suggestion(window, medicine)
+    if row is None:
+        window.medicine_search.setText(medicine)
+    else:
+        table = window.suggestion_table
+        rect = table.visualItemRect(table.item(row, 0))
+        if rect.isValid() and not rect.isEmpty():
+            QTest.mouseClick(table.viewport(), QtCore.Qt.LeftButton, QtCore.Qt.NoModifier, rect.center())
+        else:
+            table.cellClicked.emit(row, 0)  # row scrolled out of view
+    app.processEvents()
+
+    for combo, key in zip(combos[:-1], ('potency', 'dose', 'time', 'shop')):
+        if think_ms:
+            _pump(app, rng.uniform(0.5, 1.5) * think_ms / 1000.0)
+        combo.setEditText(rng.choice(picks[key]))
+        app.processEvents()
+    if think_ms:
+        _pump(app, rng.uniform(0.5, 1.5) * think_ms / 1000.0)
+
+    before = len(printer.arrivals)
+    trigger = time.perf_counter()
+    window.branch_phone_input.setEditText(rng.choice(picks['branch']))
+    arrived = _wait_for_job(app, printer, before, job_timeout)
+    spool_ms = (arrived - trigger) * 1000.0 if arrived is not None else None
+    return keystrokes, spool_ms, row is not None
+
+
+def run_load_test(sessions=100, catalog_rows=2000, remedies=None, keystroke_ms=40.0, think_ms=0.0,
+                  printer_delay=0.0, seed=1, workdir=None, keep=False, memwatch=None, warmup=0, sample_every=0):
+    # Drives one HomeoLabelApp through `sessions` prescriptions; returns the summary dict.
+    # memwatch: a started MemoryWatch, re-baselined after `warmup` sessions, sampled every `sample_every`
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    os.environ.setdefault("SKIP_WIN32", "1")
+    scratch = workdir or tempfile.mkdtemp(prefix="homeolabel_load_")
+    os.makedirs(scratch, exist_ok=True)
+    if remedies:
+        shutil.copyfile(remedies, os.path.join(scratch, "remedies.xlsx"))
+    elif not os.path.exists(os.path.join(scratch, "remedies.xlsx")):
+        synthetic_catalog(os.path.join(scratch, "remedies.xlsx"), catalog_rows, seed)
+    cwd = os.getcwd()
+    os.chdir(scratch)  # the app keeps records/ and remedies.xlsx relative to the working directory
+    try:
+        # Imported here: app.py sets up records/ and logging in the working directory on import
+        from homeolabel.app import HomeoLabelApp
+        from homeolabel.catalog import load_remedies_frame
+        from homeolabel.logsetup import stop_logging
+
+        app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
+        printer = TimedPrinter(delay=printer_delay)
+        start = time.perf_counter()
+        window = HomeoLabelApp(print_backend=printer, status_backend=FakeStatusBackend())
+        startup_ms = (time.perf_counter() - start) * 1000.0
+        window.printer_combo.clear()
+        window.printer_combo.addItem(FAKE_PRINTER)
+        window.printer_health.watch([FAKE_PRINTER])
+        window.show()
+        _pump(app, 0.2)
+
+        medicines = [m for m in load_remedies_frame("remedies.xlsx")['common_col'].astype(str) if m.strip()]
+        picks = {key: window.autocomplete_data.get(key) or values for key, values in DEFAULT_PICKS.items()}
+        rng = random.Random(seed)
+        keystrokes, spool, lost, misses = [], [], 0, 0
+        start = time.perf_counter()
+        for n in range(1, sessions + 1):
+            typed, spool_ms, found = run_session(app, window, printer, rng, rng.choice(medicines), picks,
+                                                 keystroke_ms, think_ms)
+            keystrokes.extend(typed)
+            misses += not found
+            if spool_ms is None:
+                lost += 1
+            else:
+                spool.append(spool_ms)
+            if memwatch is not None:
+                printer.forget()
+                if n == warmup:
+                    memwatch.reset_baseline()
+                    memwatch.sample(f"after {n} warm-up sessions")
+                elif n > warmup and sample_every and n % sample_every == 0:
+                    memwatch.sample(f"session {n}")
+        elapsed = time.perf_counter() - start
+        _pump(app, 0.5)  # late duplicates from the last session
+        if memwatch is not None:
+            final = memwatch.sample(f"end, {sessions} sessions")
+        labels = printer.count
+        window.close()
+        app.processEvents()
+        stop_logging()
+    finally:
+        os.chdir(cwd)
+        if not keep and not workdir:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    summary = {
+        'sessions': sessions,
+        'catalog_rows': len(medicines),
+        'startup_ms': round(startup_ms, 1),
+        'keystroke_to_suggestion': summarize_latencies(keystrokes),
+        'trigger_to_spool': summarize_latencies(spool),
+        'labels': labels,
+        'extra_jobs': max(0, labels - len(spool)),
+        'lost_sessions': lost,
+        'suggestion_misses': misses,
+        'seconds': round(elapsed, 2),
+        'labels_per_min': round(len(spool) * 60.0 / elapsed, 1) if elapsed else 0.0,
+        'workdir': scratch if keep or workdir else None,
+    }
+    if memwatch is not None:
+        summary['memory'] = {'first': memwatch.first.to_dict(), 'end': final.to_dict(),
+                             'growth': memwatch.growth(final),
+                             'qt_grown': [list(g) for g in memwatch.qt_growth(final)[:10]]}
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless counter-traffic load test for the label app")
+    parser.add_argument("--sessions", type=int, help="prescriptions to type (default 100, --soak 2000)")
+    parser.add_argument("--catalog-rows", type=int, default=2000, help="size of the synthetic remedies.xlsx")
+    parser.add_argument("--remedies", help="use this remedies.xlsx instead of a synthetic one")
+    parser.add_argument("--keystroke-ms", type=float, help="mean gap between keystrokes (default 40, --soak 0)")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="mean pause before each field pick")
+    parser.add_argument("--printer-delay", type=float, default=0.0, help="seconds the fake printer takes per job")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workdir", help="run here instead of a temporary directory (kept)")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary directory (logs, spool)")
+    parser.add_argument("--soak", action="store_true", help="long run with memory checks (memwatch.py)")
+    parser.add_argument("--report", default="memory_report.txt", help="--soak: memory growth report")
+    parser.add_argument("--warmup", type=int, default=200, help="--soak: sessions before the baseline")
+    parser.add_argument("--sample-every", type=int, default=250, help="--soak: sessions between samples")
+    parser.add_argument("--trace-frames", type=int, default=1,
+                        help="--soak: tracemalloc frames per allocation (more = slower, deeper report; 0 = RSS only)")
+    parser.add_argument("--max-growth-mb", type=float, default=SOAK_MAX_GROWTH_MB,
+                        help="--soak: allowed traced (or untraced: RSS) growth after the warm-up")
+    parser.add_argument("--max-qt-growth", type=int, default=SOAK_MAX_QT_GROWTH,
+                        help="--soak: allowed growth in live Qt wrappers after the warm-up")
+    args = parser.parse_args(argv)
+    sessions = args.sessions or (2000 if args.soak else 100)
+    keystroke_ms = args.keystroke_ms if args.keystroke_ms is not None else (0.0 if args.soak else 40.0)
+    memwatch = None
+    if args.soak:
+        memwatch = MemoryWatch(os.path.abspath(args.report), frames=args.trace_frames).start()
+    summary = run_load_test(sessions, args.catalog_rows, args.remedies, keystroke_ms, args.think_ms,
+                            args.printer_delay, args.seed, args.workdir, args.keep, memwatch,
+                            warmup=min(args.warmup, sessions // 2), sample_every=args.sample_every)
+    ok = summary['lost_sessions'] == 0
+    if memwatch is not None:
+        memwatch.stop()
+        growth = summary['memory']['growth']
+        bounded = (growth['traced_mb'] <= args.max_growth_mb and growth['qt_objects'] <= args.max_qt_growth
+                   and (args.trace_frames > 0 or growth['rss_mb'] <= args.max_growth_mb))
+        summary['memory']['bounded'] = bounded
+        summary['memory']['report'] = memwatch.report_path
+        ok = ok and bounded
+    print(json.dumps(summary, indent=2))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+# logsetup.py
+"""
+Logging for the GUI: the caller never touches the disk
+- setup_logging puts a QueueHandler on the root logger; a QueueListener thread
+  does the formatting and file writes
+- SizeAndDayRotatingFileHandler starts a new file at midnight and whenever the
+  current one passes max_bytes; old files are error_log.txt.<day>.<n>, only the
+  newest backup_count are kept
+- RepeatFilter: an identical warning / error within `interval` seconds is
+  dropped and counted; the next one that gets through says how many were dropped
+- Very long messages (full Sumatra stdout / stderr) are cut to max_chars
+- json_lines=True also writes error_log.jsonl (one JSON object per record, same
+  rotation) for later analysis; HOMEOLABEL_LOG_JSON=1 turns it on for the app
+"""
+import os
+import json
+import glob
+import time
+import queue
+import atexit
+import logging
+import datetime
+import threading
+import logging.handlers
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 30
+REPEAT_INTERVAL = 60.0
+MAX_CHARS = 4000
+
+_listener = None
+_queue_handler = None
+_setup_lock = threading.Lock()
+
+
+class SizeAndDayRotatingFileHandler(logging.handlers.BaseRotatingHandler):
+    def __init__(self, filename, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT, encoding="utf-8"):
+        super().__init__(filename, "a", encoding=encoding, delay=True)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        try:
+            # A file left over from yesterday is rotated on the first write today
+            self._day = self._day_of(os.path.getmtime(self.baseFilename))
+        except OSError:
+            self._day = self._day_of(time.time())
+
+    @staticmethod
+    def _day_of(timestamp):
+        return datetime.date.fromtimestamp(timestamp).isoformat()
+
+    def shouldRollover(self, record):
+        if self._day_of(time.time()) != self._day:
+            return True
+        if self.max_bytes > 0:
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.seek(0, 2)
+            if self.stream.tell() + len(self.format(record)) + 1 >= self.max_bytes:
+                return True
+        return False
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        if os.path.exists(self.baseFilename):
+            prefix = f"{self.baseFilename}.{self._day}."
+            used = [int(p[len(prefix):]) for p in glob.glob(glob.escape(prefix) + "*") if p[len(prefix):].isdigit()]
+            n = max(used, default=0) + 1
+            try:
+                os.replace(self.baseFilename, f"{self.baseFilename}.{self._day}.{n}")
+            except OSError as e:
+                # Open in another process (Windows): keep appending, try again next record
+                logging.getLogger(__name__).debug(f"log rotation skipped: {e}")
+        old = sorted(glob.glob(glob.escape(self.baseFilename) + ".*"), key=os.path.getmtime, reverse=True)
+        for path in old[self.backup_count:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._day = self._day_of(time.time())
+
+
+class RepeatFilter(logging.Filter):
+    # Drops a WARNING+ message identical to one let through less than `interval` seconds ago
+    def __init__(self, interval=REPEAT_INTERVAL, level=logging.WARNING, max_keys=1000):
+        super().__init__()
+        self.interval = interval
+        self.level = level
+        self.max_keys = max_keys
+        self._seen = {}  # (level, message) -> [last time let through, dropped since]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < self.level:
+            return True
+        key = (record.levelno, record.getMessage())
+        now = time.monotonic()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is not None and now - entry[0] < self.interval:
+                entry[1] += 1
+                return False
+            dropped = entry[1] if entry is not None else 0
+            if len(self._seen) >= self.max_keys:
+                self._seen = {k: v for k, v in self._seen.items() if now - v[0] < self.interval}
+            self._seen[key] = [now, 0]
+        if dropped:
+            record.msg = f"{key[1]} [{dropped} identical messages suppressed]"
+            record.args = None
+        return True
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {'ts': datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+                 'level': record.levelname, 'logger': record.name, 'msg': record.getMessage(),
+                 'thread': record.threadName, 'module': record.module, 'line': record.lineno}
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _TruncatingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, q, max_chars=MAX_CHARS):
+        super().__init__(q)
+        self.max_chars = max_chars
+
+    def prepare(self, record):
+        record = super().prepare(record)
+        if self.max_chars and len(record.msg) > self.max_chars:
+            cut = len(record.msg) - self.max_chars
+            record.msg = f"{record.msg[:self.max_chars]} ... [{cut} more characters]"
+            record.message = record.msg
+        return record
+
+
+def setup_logging(path="records/error_log.txt", level=logging.INFO, max_bytes=MAX_BYTES,
+                  backup_count=BACKUP_COUNT, json_lines=None, repeat_interval=REPEAT_INTERVAL,
+                  max_chars=MAX_CHARS):
+    # Root logger -> queue -> listener thread -> rotating file(s). Calling it again is a no-op.
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+        if json_lines is None:
+            json_lines = os.environ.get("HOMEOLABEL_LOG_JSON", "") not in ("", "0")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        handlers = []
+        text = SizeAndDayRotatingFileHandler(path, max_bytes, backup_count)
+        text.setFormatter(logging.Formatter(LOG_FORMAT))
+        handlers.append(text)
+        if json_lines:
+            structured = SizeAndDayRotatingFileHandler(os.path.splitext(path)[0] + ".jsonl", max_bytes,
+                                                       backup_count)
+            structured.setFormatter(JsonLinesFormatter())
+            handlers.append(structured)
+        q = queue.SimpleQueue()
+        queue_handler = _TruncatingQueueHandler(q, max_chars)
+        if repeat_interval:
+            queue_handler.addFilter(RepeatFilter(repeat_interval))
+        root = logging.getLogger()
+        root.setLevel(level)
+        root.addHandler(queue_handler)
+        _queue_handler = queue_handler
+        _listener = logging.handlers.QueueListener(q, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        return _listener
+
+
+def stop_logging():
+    # Flushes what is still queued; safe to call more than once
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is None:
+            return
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -0,0 +1,160 @@
+# memwatch.py
+"""
+Long-session memory diagnostics
+- MemoryWatch keeps a tracemalloc baseline and, on every sample(), records RSS,
+  traced Python memory and the number of live Qt wrappers per class
+  (QTableWidgetItem, QFont, ...: everything PyQt still holds a Python object for)
+- Each sample appends a block to the report: the allocation sites that grew the
+  most since the baseline and the Qt classes whose live count grew
+- The app turns it on with HOMEOLABEL_MEMWATCH=1 (a sample every
+  HOMEOLABEL_MEMWATCH_INTERVAL seconds, default 300, and one at close);
+  loadtest.py --soak uses it to check that memory stays bounded
+
+tracemalloc costs memory and some speed (every allocation is traced), so it is
+off unless asked for.
+"""
+import gc
+import time
+import logging
+import datetime
+import threading
+import tracemalloc
+from collections import Counter
+
+from homeolabel.timing import current_rss_bytes
+
+TOP_SITES = 15
+TRACE_FRAMES = 6
+_MB = 1024.0 * 1024.0
+
+
+def live_qt_objects():
+    # Counter of class name -> live PyQt wrappers (gc-tracked sip objects)
+    try:
+        from PyQt5 import sip
+    except ImportError:
+        return Counter()
+    counts = Counter()
+    for obj in gc.get_objects():
+        if isinstance(obj, sip.simplewrapper):
+            counts[type(obj).__name__] += 1
+    return counts
+
+
+class MemorySample:
+    __slots__ = ('when', 'rss', 'traced', 'traced_peak', 'overhead', 'qt_objects', 'top_growth')
+
+    def __init__(self, rss, traced, traced_peak, overhead, qt_objects, top_growth):
+        self.when = time.time()
+        self.rss = rss
+        self.traced = traced
+        self.traced_peak = traced_peak
+        self.overhead = overhead  # what tracemalloc itself holds (its traces), part of the RSS
+        self.qt_objects = qt_objects
+        self.top_growth = top_growth
+
+    @property
+    def qt_total(self):
+        return sum(self.qt_objects.values())
+
+    def to_dict(self):
+        return {'rss_mb': round(self.rss / _MB, 2) if self.rss is not None else None,
+                'traced_mb': round(self.traced / _MB, 2), 'traced_peak_mb': round(self.traced_peak / _MB, 2),
+                'tracemalloc_mb': round(self.overhead / _MB, 2), 'qt_objects': self.qt_total}
+
+
+class MemoryWatch:
+    def __init__(self, report_path=None, top=TOP_SITES, frames=TRACE_FRAMES):
+        self.report_path = report_path
+        self.top = top
+        self.frames = frames
+        self.baseline = None
+        self.first = None
+        self.samples = []
+        self._baseline_qt = Counter()
+        self._started_tracing = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        # frames=0: RSS and Qt counts only, no allocation tracing
+        if self.frames and not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        self.reset_baseline()
+        return self
+
+    def reset_baseline(self):
+        # Growth is reported against this point (the soak test calls it after its warm-up)
+        gc.collect()
+        with self._lock:
+            self.baseline = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+            self._baseline_qt = live_qt_objects()
+            self.first = None
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def sample(self, note=""):
+        gc.collect()
+        with self._lock:
+            traced, traced_peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+            overhead = tracemalloc.get_tracemalloc_memory() if tracemalloc.is_tracing() else 0
+            top_growth = []
+            if self.baseline is not None and tracemalloc.is_tracing():
+                snapshot = tracemalloc.take_snapshot().filter_traces((
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+                    # walking gc.get_objects() leaves allocations behind; they are ours, not the app's
+                    tracemalloc.Filter(False, __file__, all_frames=True),
+                ))
+                stats = snapshot.compare_to(self.baseline, 'traceback')
+                top_growth = [s for s in stats if s.size_diff > 0][:self.top]
+            sample = MemorySample(current_rss_bytes(), traced, traced_peak, overhead, live_qt_objects(), top_growth)
+            if self.first is None:
+                self.first = sample
+            self.samples.append(sample)
+            del self.samples[:-1000]
+        if self.report_path:
+            self._write(sample, note)
+        return sample
+
+    def growth(self, sample=None):
+        # {'rss_mb', 'traced_mb', 'qt_objects'} growth of `sample` (default: the last) over the first sample;
+        # the RSS growth leaves out tracemalloc's own bookkeeping
+        sample = sample or (self.samples[-1] if self.samples else None)
+        if sample is None or self.first is None:
+            return {'rss_mb': 0.0, 'traced_mb': 0.0, 'qt_objects': 0}
+        rss = 0.0
+        if sample.rss is not None and self.first.rss is not None:
+            rss = (sample.rss - self.first.rss - (sample.overhead - self.first.overhead)) / _MB
+        return {'rss_mb': round(rss, 2), 'traced_mb': round((sample.traced - self.first.traced) / _MB, 2),
+                'qt_objects': sample.qt_total - self.first.qt_total}
+
+    def qt_growth(self, sample):
+        # [(class, live now, growth since the baseline)] for classes that grew, biggest first
+        grown = [(name, count, count - self._baseline_qt.get(name, 0)) for name, count in sample.qt_objects.items()]
+        return sorted((g for g in grown if g[2] > 0), key=lambda g: -g[2])
+
+    def _write(self, sample, note):
+        stamp = datetime.datetime.fromtimestamp(sample.when).isoformat(timespec="seconds")
+        info = sample.to_dict()
+        lines = [f"=== {stamp} {note}".rstrip(),
+                 f"rss {info['rss_mb']} MB, traced {info['traced_mb']} MB (peak {info['traced_peak_mb']} MB, "
+                 f"tracemalloc itself {info['tracemalloc_mb']} MB), "
+                 f"live Qt wrappers {sample.qt_total}, growth since first sample {self.growth(sample)}"]
+        grown = self.qt_growth(sample)
+        if grown:
+            lines.append("Qt classes grown since baseline:")
+            lines.extend(f"  {name}: {count} (+{diff})" for name, count, diff in grown[:self.top])
+        if sample.top_growth:
+            lines.append("Top allocation growth since baseline:")
+            for stat in sample.top_growth:
+                lines.append(f"  +{stat.size_diff / 1024.0:.1f} KiB, +{stat.count_diff} blocks")
+                lines.extend(f"      {frame.filename}:{frame.lineno}" for frame in reversed(stat.traceback))
+        try:
+            with open(self.report_path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n\n")
+        except OSError as e:
+            logging.warning(f"Memory report write failed: {e}")
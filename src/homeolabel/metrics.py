@@ -0,0 +1,217 @@
+# metrics.py
+"""
+Vectorized string widths from the PDF font metrics
+- GlyphWidths(fontname): the font's advance widths (1/1000 em) as a NumPy array
+  indexed by code point, built once per font from the Type1 width table + its
+  encoding (characters the encoding lacks get the substitute / .notdef widths
+  reportlab would use)
+- units(strings): the widths of many strings in one go: every character of every
+  string is looked up at once, then a cumulative sum is differenced at the string
+  boundaries (a segmented sum); widths(strings, size) scales them to points
+- text_units(text): one short string in plain Python (no NumPy call overhead) for
+  the per-keystroke path, where only a word or two is new
+- Same numbers as reportlab's stringWidth: Type1 widths are integers, so the sums
+  are exact and the scaling is the same units * 0.001 * size
+- linebreak.break_paragraph / solve_layout (fit_label) take their word widths
+  from units(), one call per label
+- fit_many_lines_to_box: render.fit_lines_to_box for many labels, with every word
+  of every label measured in one call; the greedy packing and shrinking then only
+  adds integers (the older character-count layout, for comparisons)
+
+Only Type1 fonts (the standard PDF fonts every label profile uses, as in
+batch._StreamingPdf); anything else raises ValueError.
+
+Bench: python -m homeolabel.metrics --bench --strings 20000 --labels 2000
+"""
+import sys
+import json
+import time
+import argparse
+from functools import lru_cache
+
+import numpy as np
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+
+TABLE_SIZE = 0x2200  # Latin, Greek, Cyrillic, punctuation up to the WinAnsi symbols (U+2122)
+
+
+class GlyphWidths:
+    def __init__(self, fontname):
+        font = pdfmetrics.getFont(fontname)
+        if not hasattr(font, 'widths') or not hasattr(font, 'encName'):
+            raise ValueError(f"{fontname}: not a Type1 font, no glyph width table")
+        self.fontname = fontname
+        self._font = font
+        self._fonts = [font] + list(getattr(font, 'substitutionFonts', []))
+        self._extra = {}
+        self.table = np.fromiter((self._char_units(cp) for cp in range(TABLE_SIZE)), dtype=np.int64,
+                                 count=TABLE_SIZE)
+        self._table_list = self.table.tolist()
+
+    def _char_units(self, cp):
+        # Width of one character the way reportlab measures it: encoded, else substituted, else .notdef
+        return sum(sum(f.widths[b] for b in s) for f, s in pdfmetrics.unicode2T1(chr(cp), self._fonts))
+
+    def _lookup(self, cps):
+        inside = cps < TABLE_SIZE
+        w = self.table[np.where(inside, cps, 0)]
+        if not inside.all():
+            for cp in np.unique(cps[~inside]).tolist():
+                units = self._extra.get(cp)
+                if units is None:
+                    units = self._extra[cp] = self._char_units(cp)
+                w[cps == cp] = units
+        return w
+
+    def text_units(self, text):
+        # Width of one string in 1/1000 em, the same integer units() gives
+        table = self._table_list
+        total = 0
+        for char in str(text):
+            cp = ord(char)
+            if cp < TABLE_SIZE:
+                total += table[cp]
+            else:
+                units = self._extra.get(cp)
+                if units is None:
+                    units = self._extra[cp] = self._char_units(cp)
+                total += units
+        return total
+
+    def units(self, strings):
+        # int64 array: width of each string in 1/1000 em
+        strings = [str(s) for s in strings]
+        lengths = np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+        cps = np.frombuffer("".join(strings).encode("utf-32-le"), dtype=np.uint32)
+        totals = np.zeros(len(cps) + 1, dtype=np.int64)
+        np.cumsum(self._lookup(cps), out=totals[1:])
+        ends = np.cumsum(lengths)
+        return totals[ends] - totals[ends - lengths]
+
+    def widths(self, strings, size):
+        # float64 array of widths in points at `size`
+        return self.units(strings).astype(np.float64) * 0.001 * size
+
+    def width(self, text, size):
+        return float(self.widths([text], size)[0])
+
+
+@lru_cache(maxsize=None)
+def glyph_widths(fontname):
+    return GlyphWidths(fontname)
+
+
+def string_widths(strings, fontname, size):
+    return glyph_widths(fontname).widths(strings, size)
+
+
+def _fitted_size(units, size, min_size, max_width):
+    # fit_lines_to_box's shrink loop on an already measured line
+    while size > min_size and units * 0.001 * size > max_width:
+        size -= 1
+    return size
+
+
+def fit_many_lines_to_box(labels, fontname, base_fontsize, max_width_mm, min_fontsize=6):
+    # labels: [[line, ...], ...] -> [[(text, font_size), ...], ...], each as render.fit_lines_to_box
+    gw = glyph_widths(fontname)
+    max_width = max_width_mm * mm
+    split = [[str(text).split() for text in lines] for lines in labels]
+    words = [word for lines in split for line_words in lines for word in line_words]
+    units = gw.units(words + [" "]).tolist()
+    space = units.pop()
+    out = []
+    k = 0
+    for lines in split:
+        fitted = []
+        for line_words in lines:
+            if not line_words:
+                fitted.append(("", base_fontsize))
+                continue
+            running, running_units = [line_words[0]], units[k]
+            k += 1
+            for word in line_words[1:]:
+                test_units = running_units + space + units[k]
+                if test_units * 0.001 * base_fontsize <= max_width:
+                    running.append(word)
+                    running_units = test_units
+                else:
+                    fitted.append((" ".join(running),
+                                   _fitted_size(running_units, base_fontsize, min_fontsize, max_width)))
+                    running, running_units = [word], units[k]
+                k += 1
+            fitted.append((" ".join(running), _fitted_size(running_units, base_fontsize, min_fontsize, max_width)))
+        out.append(fitted)
+    return out
+
+
+def fit_lines_to_box_batched(lines, fontname, base_fontsize, max_width_mm, min_fontsize=6):
+    # One label; same signature as render.fit_lines_to_box minus the canvas
+    return fit_many_lines_to_box([lines], fontname, base_fontsize, max_width_mm, min_fontsize)[0]
+
+
+# ---------------- benchmark ----------------
+def _sample_strings(count, seed=7):
+    import random
+    rng = random.Random(seed)
+    syllables = ["ar", "ni", "ca", "mon", "ta", "na", "bel", "la", "don", "nux", "vo", "mi", "cal", "ca", "rea",
+                 "Ä", "é", "ß", "ø"]
+    return ["".join(rng.choice(syllables) for _ in range(rng.randint(1, 8))).capitalize()
+            + (" " + rng.choice(["30C", "200C", "1M", "6X"]) if rng.random() < 0.3 else "")
+            for _ in range(count)]
+
+
+def benchmark(strings=20000, labels=2000, rounds=5, fontname="Helvetica", size=9):
+    from reportlab.pdfgen import canvas
+    from homeolabel.render import build_label_lines, fit_lines_to_box, MAX_TEXT_WIDTH_MM, BASE_PRINT_FONT
+    from homeolabel.batch import sample_jobs
+    texts = _sample_strings(strings)
+    glyph_widths(fontname)  # table build is a one-off per font; timed separately below
+    start = time.perf_counter()
+    GlyphWidths(fontname)
+    table_ms = (time.perf_counter() - start) * 1000.0
+
+    def best_of(fn):
+        best = None
+        for _ in range(rounds):
+            start = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    scalar_s, scalar = best_of(lambda: [pdfmetrics.stringWidth(t, fontname, size) for t in texts])
+    vector_s, vector = best_of(lambda: string_widths(texts, fontname, size))
+    mismatches = sum(a != b for a, b in zip(scalar, vector.tolist()))
+
+    raw = [build_label_lines(*job) for job in sample_jobs(labels)]
+    c = canvas.Canvas("dummy.pdf")
+    old_s, old = best_of(lambda: [fit_lines_to_box(lines, c, fontname, BASE_PRINT_FONT, MAX_TEXT_WIDTH_MM)
+                                  for lines in raw])
+    new_s, new = best_of(lambda: fit_many_lines_to_box(raw, fontname, BASE_PRINT_FONT, MAX_TEXT_WIDTH_MM))
+    return {'font': fontname, 'table_build_ms': round(table_ms, 2),
+            'strings': strings, 'stringWidth_ms': round(scalar_s * 1000.0, 2),
+            'vectorized_ms': round(vector_s * 1000.0, 2), 'speedup': round(scalar_s / vector_s, 1),
+            'width_mismatches': mismatches,
+            'labels': labels, 'fit_lines_to_box_ms': round(old_s * 1000.0, 2),
+            'fit_many_lines_to_box_ms': round(new_s * 1000.0, 2), 'fit_speedup': round(old_s / new_s, 1),
+            'fit_mismatches': sum(a != b for a, b in zip(old, new))}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vectorized string widths")
+    parser.add_argument("--bench", action="store_true", help="stringWidth per call vs one vectorized call")
+    parser.add_argument("--strings", type=int, default=20000)
+    parser.add_argument("--labels", type=int, default=2000)
+    parser.add_argument("--font", default="Helvetica")
+    args = parser.parse_args(argv)
+    if not args.bench:
+        parser.print_help()
+        return 0
+    print(json.dumps(benchmark(args.strings, args.labels, fontname=args.font), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
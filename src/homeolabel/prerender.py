@@ -0,0 +1,159 @@
+# prerender.py
+"""
+Speculative rendering of the label the counter is about to print
+- request(layout): render that label (fit + reportlab PDF through the render cache)
+  on one background thread while the pharmacist is still looking at the preview
+- Latest wins: a new request or invalidate() cancels a render that has not
+  started yet; a finished render for an older label is just never used
+- take(job, copies) at print time: the finished render when it is for exactly
+  that label (fields, font size, geometry, copies), waiting for it when it is
+  still running; None otherwise and the caller renders as before
+- stats(): requested / rendered / used / superseded / wasted / waited
+
+The GUI asks from update_preview() once all fields are filled, so by the time
+auto-print fires the PDF is usually already there.
+
+Bench: python -m homeolabel.prerender --bench --labels 200
+"""
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+import concurrent.futures
+
+from homeolabel.labelcache import render_label_cached
+
+TAKE_WAIT = 2.0
+
+
+class _Speculation:
+    __slots__ = ('key', 'future', 'used')
+
+    def __init__(self, key, future):
+        self.key = key
+        self.future = future
+        self.used = False
+
+
+class Prerenderer:
+    def __init__(self, cache=None):
+        self.cache = cache
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="prerender")
+        self._lock = threading.Lock()
+        self._latest = None
+        self._closed = False
+        self.counters = {'requested': 0, 'rendered': 0, 'used': 0, 'superseded': 0, 'wasted': 0,
+                         'waited': 0, 'missed': 0}
+
+    def _render(self, layout, copies):
+        job = layout.job
+        result = render_label_cached(self.cache, job.fields, base_font_size=job.base_font_size, copies=copies,
+                                     fitlines=layout.lines, geometry=job.geometry)
+        with self._lock:
+            self.counters['rendered'] += 1
+        return result
+
+    def _drop(self, spec):
+        # Called with the lock held; spec is the speculation being replaced
+        if spec is None or spec.used:
+            return
+        if spec.future.cancel():
+            self.counters['superseded'] += 1
+        else:
+            self.counters['wasted'] += 1
+
+    def request(self, layout, copies=1):
+        # layout: labeljob.LabelLayout of the label on screen
+        key = (layout.job, copies)
+        with self._lock:
+            if self._closed:
+                return
+            if self._latest is not None and self._latest.key == key and not self._latest.used:
+                return
+            self._drop(self._latest)
+            self.counters['requested'] += 1
+            self._latest = _Speculation(key, self._executor.submit(self._render, layout, copies))
+
+    def invalidate(self, *args):
+        # Slot-friendly: connected straight to textChanged signals
+        with self._lock:
+            self._drop(self._latest)
+            self._latest = None
+
+    def take(self, job, copies=1, wait=TAKE_WAIT):
+        # (fitlines, pdf_bytes) rendered ahead of time for this label, or None
+        with self._lock:
+            spec = self._latest
+            if spec is None or spec.key != (job, copies) or spec.used:
+                self.counters['missed'] += 1
+                return None
+            spec.used = True
+            if not spec.future.done():
+                self.counters['waited'] += 1
+        try:
+            result = spec.future.result(timeout=wait)
+        except Exception as e:
+            logging.warning(f"Pre-rendered label not usable, rendering again: {e!r}")
+            return None
+        with self._lock:
+            self.counters['used'] += 1
+        return result
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._drop(self._latest)
+            self._latest = None
+        self._executor.shutdown(wait=False)
+
+
+def bench(labels=200, seed=7):
+    # Print-time render cost with and without a finished speculative render (no disk cache)
+    import random
+    from homeolabel.labeljob import LabelJob
+    from homeolabel.labelcache import RenderCache
+    rng = random.Random(seed)
+    jobs = [LabelJob((f"Remedy {rng.randint(1, 10 ** 6)} {'montana ' * rng.randint(0, 3)}".strip(),
+                      rng.choice(["6C", "30C", "200C", "1M"]), "4 pills", rng.choice(["TDS", "BD", "OD"]),
+                      "Shop", "Branch 1")) for _ in range(labels)]
+    inline = []
+    cache = RenderCache(max_items=labels * 2)
+    for job in jobs:
+        start = time.perf_counter()
+        render_label_cached(cache, job.fields, base_font_size=job.base_font_size, geometry=job.geometry)
+        inline.append((time.perf_counter() - start) * 1000.0)
+    speculative = []
+    pre = Prerenderer(RenderCache(max_items=labels * 2))
+    for job in jobs:
+        pre.request(job.layout())
+        time.sleep(0.05)  # the pharmacist checks the preview
+        start = time.perf_counter()
+        if pre.take(job) is None:
+            raise RuntimeError("speculative render missed")
+        speculative.append((time.perf_counter() - start) * 1000.0)
+    pre.close()
+    from homeolabel.timing import summarize_latencies
+    return {'inline_render': summarize_latencies(inline), 'prerendered_take': summarize_latencies(speculative),
+            'prerender_stats': pre.stats()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Speculative label pre-rendering")
+    parser.add_argument("--bench", action="store_true", help="print-time render cost, inline vs pre-rendered")
+    parser.add_argument("--labels", type=int, default=200)
+    args = parser.parse_args(argv)
+    if not args.bench:
+        parser.print_help()
+        return 0
+    print(json.dumps(bench(args.labels), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
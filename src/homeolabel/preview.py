@@ -0,0 +1,105 @@
+# preview.py
+"""
+On-screen label preview
+- LabelPreview paints the fitted lines and the border with QPainter at the real
+  label proportions (same geometry as render.draw_label), so what is shown is
+  what the PDF prints: same breaks, same sizes, same baselines
+- QFonts are cached per (font size, pixels per point); a resize only rebuilds
+  the fonts for the new scale
+- set_geometry() switches the label stock (geometry.py profile)
+- set_lines() repaints only when the layout actually changed; typing that does
+  not move a break or a size costs one tuple compare
+"""
+from PyQt5 import QtWidgets, QtCore, QtGui
+
+from homeolabel.geometry import DEFAULT_GEOMETRY
+
+
+class LabelPreview(QtWidgets.QWidget):
+    def __init__(self, parent=None, geometry=None):
+        super().__init__(parent)
+        self.label_geometry = geometry or DEFAULT_GEOMETRY
+        self._lines = ()
+        self._fonts = {}
+        self.paints = 0
+        policy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Preferred)
+        policy.setHeightForWidth(True)
+        self.setSizePolicy(policy)
+        self.setMinimumHeight(60)
+
+    def set_lines(self, lines):
+        # lines: [(text, font_size_pt), ...] as returned by render.fit_label
+        lines = tuple((str(text), size) for text, size in lines)
+        if lines == self._lines:
+            return False
+        self._lines = lines
+        self.update()
+        return True
+
+    def lines(self):
+        return self._lines
+
+    def set_geometry(self, geometry):
+        if geometry == self.label_geometry:
+            return
+        self.label_geometry = geometry
+        self._fonts.clear()
+        self.updateGeometry()
+        self.update()
+
+    def hasHeightForWidth(self):
+        return True
+
+    def heightForWidth(self, width):
+        return int(round(width * self.label_geometry.height_mm / self.label_geometry.width_mm))
+
+    def sizeHint(self):
+        width = max(self.minimumWidth(), 260)
+        return QtCore.QSize(width, self.heightForWidth(width))
+
+    def _font(self, size, px_per_pt):
+        key = (size, round(px_per_pt, 3))
+        font = self._fonts.get(key)
+        if font is None:
+            if len(self._fonts) > 64:
+                self._fonts.clear()  # scale changed many times (window resizes)
+            font = QtGui.QFont(self.label_geometry.screen_font)
+            font.setStyleHint(QtGui.QFont.Helvetica)
+            # pixel size in float: points on the label * pixels per label point, in device points
+            font.setPointSizeF(size * px_per_pt * 72.0 / max(1, self.logicalDpiY()))
+            self._fonts[key] = font
+        return font
+
+    def label_rect(self):
+        # The label, centred in the widget at its true aspect ratio
+        w_pt, h_pt = self.label_geometry.page_size
+        px_per_pt = min((self.width() - 2) / w_pt, (self.height() - 2) / h_pt)
+        w = w_pt * px_per_pt
+        h = h_pt * px_per_pt
+        return QtCore.QRectF((self.width() - w) / 2.0, (self.height() - h) / 2.0, w, h), px_per_pt
+
+    def paintEvent(self, event):
+        self.paints += 1
+        painter = QtGui.QPainter(self)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        painter.setRenderHint(QtGui.QPainter.TextAntialiasing)
+        painter.fillRect(self.rect(), QtGui.QColor("#f8f8f8"))
+        rect, px_per_pt = self.label_rect()
+        if px_per_pt <= 0:
+            return
+        painter.fillRect(rect, QtCore.Qt.white)
+        painter.setPen(QtGui.QPen(QtGui.QColor("#888"), 1))
+        painter.drawRect(rect)
+        g = self.label_geometry
+        inset = g.border_rect[0] * px_per_pt
+        painter.setPen(QtGui.QPen(QtCore.Qt.black, max(1.0, px_per_pt)))
+        painter.drawRect(rect.adjusted(inset, inset, -inset, -inset))
+        x_center = rect.center().x()
+        y = rect.top() + (g.height_pt - g.baseline_y) * px_per_pt
+        for text, size in self._lines:
+            font = self._font(size, px_per_pt)
+            painter.setFont(font)
+            width = QtGui.QFontMetricsF(font).horizontalAdvance(text)
+            painter.drawText(QtCore.QPointF(x_center - width / 2.0, y), text)
+            y += size * g.line_gap * px_per_pt
+        painter.end()
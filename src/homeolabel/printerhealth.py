@@ -0,0 +1,234 @@
+# printerhealth.py
+"""
+Background printer health monitor
+- PrinterHealthMonitor polls the status of the watched printers on a daemon
+  thread and keeps the last answer per printer with a TTL; each caller of
+  watch() (printer list, pool) owns its printers and the union is polled
+- cached(printer) never blocks (GUI thread); status(printer) re-queries when the
+  cached answer is older than the TTL (spooler threads)
+- HealthCheckedBackend wraps a spooler backend: a printer known to be offline /
+  in error fails the attempt at once instead of going through ShellExecute, a
+  40-second Sumatra run and the GDI fallback first; the spooler's retries with
+  backoff pick it up again when the printer comes back
+- Status backends: Win32StatusBackend (GetPrinter level 2 status + attributes),
+  FakeStatusBackend for Linux tests
+- on_change(printer, status) is called from the monitor thread; the GUI hands it
+  to the Qt thread with a signal
+
+A failed status query is UNKNOWN, not OFFLINE: printing is only refused on a
+definite answer from the spooler.
+"""
+import time
+import logging
+import threading
+
+try:
+    import win32print
+except ImportError:
+    win32print = None
+
+READY = "ready"
+BUSY = "busy"          # printing / warming up; jobs still queue fine
+OFFLINE = "offline"
+ERROR = "error"        # paper out, jam, door open, needs attention
+UNKNOWN = "unknown"
+UNAVAILABLE = (OFFLINE, ERROR)
+
+# Win32 PRINTER_STATUS_* bits (winspool.h)
+_STATUS_BITS = (
+    (0x00000080, OFFLINE, "offline"),
+    (0x00001000, OFFLINE, "not available"),
+    (0x00800000, OFFLINE, "print server unknown"),
+    (0x00000004, OFFLINE, "pending deletion"),
+    (0x00000001, ERROR, "paused"),
+    (0x00000002, ERROR, "error"),
+    (0x00000008, ERROR, "paper jam"),
+    (0x00000010, ERROR, "paper out"),
+    (0x00000040, ERROR, "paper problem"),
+    (0x00000800, ERROR, "output bin full"),
+    (0x00040000, ERROR, "toner / ink out"),
+    (0x00100000, ERROR, "needs user intervention"),
+    (0x00200000, ERROR, "out of memory"),
+    (0x00400000, ERROR, "door open"),
+    (0x00000400, BUSY, "printing"),
+    (0x00000200, BUSY, "busy"),
+    (0x00004000, BUSY, "processing"),
+    (0x00008000, BUSY, "initializing"),
+    (0x00010000, BUSY, "warming up"),
+)
+_ATTRIBUTE_WORK_OFFLINE = 0x00000400
+
+
+class PrinterStatus:
+    __slots__ = ('state', 'detail', 'checked')
+
+    def __init__(self, state, detail="", checked=None):
+        self.state = state
+        self.detail = detail
+        self.checked = time.monotonic() if checked is None else checked
+
+    @property
+    def ready(self):
+        return self.state not in UNAVAILABLE
+
+    def age(self):
+        return time.monotonic() - self.checked
+
+    def __eq__(self, other):
+        return isinstance(other, PrinterStatus) and (self.state, self.detail) == (other.state, other.detail)
+
+    def __repr__(self):
+        return f"PrinterStatus({self.state!r}, {self.detail!r})"
+
+
+def decode_win32_status(status, attributes=0):
+    # (state, detail) from GetPrinter level 2 Status / Attributes
+    if attributes & _ATTRIBUTE_WORK_OFFLINE:
+        return OFFLINE, "set to use printer offline"
+    # Most severe first: the table lists OFFLINE, then ERROR, then BUSY bits
+    for bit, state, detail in _STATUS_BITS:
+        if status & bit:
+            return state, detail
+    return READY, ""
+
+
+class Win32StatusBackend:
+    def query(self, printer):
+        if win32print is None:
+            return UNKNOWN, "win32print not available"
+        handle = win32print.OpenPrinter(printer)
+        try:
+            info = win32print.GetPrinter(handle, 2)
+        finally:
+            win32print.ClosePrinter(handle)
+        return decode_win32_status(info.get('Status', 0), info.get('Attributes', 0))
+
+
+class FakeStatusBackend:
+    # Status per printer set by the test; queries are counted
+    def __init__(self, states=None, default=READY, delay=0.0):
+        self.states = dict(states or {})
+        self.default = default
+        self.delay = delay
+        self.queries = 0
+        self._lock = threading.Lock()
+
+    def set(self, printer, state, detail=""):
+        with self._lock:
+            self.states[printer] = (state, detail)
+
+    def query(self, printer):
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            self.queries += 1
+            value = self.states.get(printer, self.default)
+        return value if isinstance(value, tuple) else (value, "")
+
+
+class PrinterHealthMonitor:
+    def __init__(self, backend=None, interval=5.0, ttl=15.0, on_change=None):
+        self.backend = backend or Win32StatusBackend()
+        self.interval = interval
+        self.ttl = ttl
+        self.on_change = on_change
+        self._printers = []
+        self._watched = {}  # owner -> its printers; the union is polled
+        self._status = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def watch(self, printers, owner="printers"):
+        # Replaces `owner`'s printers (the printer combo's list, the pool's members) and polls them soon.
+        # Every owner's printers are watched: one list changing leaves the others polled
+        with self._lock:
+            self._watched[owner] = [p for p in printers if p]
+            self._printers = list(dict.fromkeys(p for listed in self._watched.values() for p in listed))
+        self._wake.set()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="printer-health", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                printers = list(self._printers)
+            for printer in printers:
+                if self._stop.is_set():
+                    return
+                self.check(printer)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def check(self, printer):
+        # Query now and update the cache
+        try:
+            state, detail = self.backend.query(printer)
+        except Exception as e:
+            state, detail = UNKNOWN, f"status query failed: {e}"
+        status = PrinterStatus(state, detail)
+        with self._lock:
+            previous = self._status.get(printer)
+            self._status[printer] = status
+        if previous != status:
+            level = logging.WARNING if not status.ready else logging.INFO
+            logging.log(level, f"Printer '{printer}' is {state}{': ' + detail if detail else ''}")
+            if self.on_change is not None:
+                try:
+                    self.on_change(printer, status)
+                except Exception as e:
+                    logging.error(f"Printer status callback failed: {e}")
+        return status
+
+    def cached(self, printer):
+        # Last answer if it is within the TTL, else UNKNOWN; never queries
+        with self._lock:
+            status = self._status.get(printer)
+        if status is None or status.age() > self.ttl:
+            return PrinterStatus(UNKNOWN, "not checked recently")
+        return status
+
+    def status(self, printer):
+        # Last answer if it is within the TTL, else a fresh query
+        status = self.cached(printer)
+        if status.state == UNKNOWN:
+            status = self.check(printer)
+        return status
+
+    def ready_printers(self):
+        with self._lock:
+            printers = list(self._printers)
+        return [p for p in printers if self.cached(p).state == READY]
+
+
+class PrinterUnavailable(RuntimeError):
+    pass
+
+
+class HealthCheckedBackend:
+    # Spooler backend wrapper: refuse at once when the printer is known to be offline / in error
+    def __init__(self, backend, monitor):
+        self.backend = backend
+        self.monitor = monitor
+
+    def print_job(self, job):
+        status = self.monitor.status(job.printer)
+        if not status.ready:
+            raise PrinterUnavailable(f"printer '{job.printer}' is {status.state}: {status.detail}")
+        return self.backend.print_job(job)
+
+    def close(self):
+        if hasattr(self.backend, 'close'):
+            self.backend.close()
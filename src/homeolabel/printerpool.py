@@ -0,0 +1,201 @@
+# printerpool.py
+"""
+Printer pool: several identical label printers at one counter used as one
+- A job submitted to the pool's name goes to the healthy member with the lowest
+  (jobs queued + in flight + 1) x recent seconds per job, so a slow or busy
+  printer gets fewer labels and an idle one gets the next
+- Seconds per job is an exponential moving average of successful attempts; a
+  member with no history yet is costed at the pool average
+- Healthy: not failed in the last `cooldown` seconds, and (with a
+  PrinterHealthMonitor) not known to be offline / in error
+- When an attempt fails for sure (the backend raised), the spooler moves that
+  job and the pool jobs queued behind it to the other members
+  (PrintSpooler.add_pool); the failed printer is skipped until its cooldown
+  runs out or it prints successfully again. A timed-out attempt that may still
+  print is left alone (spooler.PrintUncertain), so no label prints twice
+- stats(): per member queue depth, latency, jobs, failures, failovers
+- The app keeps the members and the on/off switch in records/printer_pool.json
+
+All methods run on the spooler's event loop thread, so there is no locking.
+
+Bench: python -m homeolabel.printerpool --bench --jobs 300 --speeds 0.02,0.05,0.15 --interval 0.015 --fail-at 100
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+
+LATENCY_ALPHA = 0.3
+COOLDOWN = 30.0
+DEFAULT_LATENCY = 1.0
+POOL_NAME = "Printer pool"
+
+
+def load_pool_config(path):
+    # (enabled, [printer, ...]); off with no members when the file is missing or unreadable
+    if not path or not os.path.exists(path):
+        return False, []
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return bool(data.get('enabled')), [str(p) for p in data.get('printers') or []]
+    except Exception as e:
+        logging.error(f"Could not read printer pool from {path}: {e}")
+        return False, []
+
+
+def save_pool_config(path, enabled, printers):
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({'enabled': bool(enabled), 'printers': list(printers)}, f, indent=2)
+        os.replace(tmp, path)
+    except Exception as e:
+        logging.error(f"Could not save printer pool to {path}: {e}")
+
+
+class PrinterPool:
+    def __init__(self, name, printers, health=None, alpha=LATENCY_ALPHA, cooldown=COOLDOWN):
+        self.name = name
+        self.printers = list(dict.fromkeys(printers))
+        self.health = health
+        self.alpha = alpha
+        self.cooldown = cooldown
+        self.latency = {p: None for p in self.printers}
+        self.down_until = {}
+        self.member_stats = {p: {'jobs': 0, 'completed': 0, 'failures': 0, 'moved_away': 0}
+                             for p in self.printers}
+        self.failovers = 0
+
+    def __contains__(self, printer):
+        return printer in self.latency
+
+    def healthy(self, printer, now=None):
+        now = time.monotonic() if now is None else now
+        if self.down_until.get(printer, 0) > now:
+            return False
+        return self.health is None or self.health.cached(printer).ready
+
+    def expected_latency(self, printer):
+        latency = self.latency.get(printer)
+        if latency is not None:
+            return latency
+        known = [v for v in self.latency.values() if v is not None]
+        return sum(known) / len(known) if known else DEFAULT_LATENCY
+
+    def pick(self, depth, exclude=()):
+        # Member for the next job; depth(printer) -> jobs queued + in flight. None when every
+        # member is excluded. Unhealthy members are used only when no healthy one is left.
+        now = time.monotonic()
+        members = [p for p in self.printers if p not in exclude]
+        if not members:
+            return None
+        healthy = [p for p in members if self.healthy(p, now)]
+        if not healthy and exclude:
+            return None  # failing over to another broken printer helps nobody; retry in place
+        candidates = healthy or members
+        return min(candidates, key=lambda p: ((depth(p) + 1) * self.expected_latency(p),
+                                              self.member_stats[p]['jobs']))
+
+    def assigned(self, printer):
+        self.member_stats[printer]['jobs'] += 1
+
+    def record_success(self, printer, seconds):
+        previous = self.latency.get(printer)
+        self.latency[printer] = seconds if previous is None else previous + self.alpha * (seconds - previous)
+        self.down_until.pop(printer, None)
+        self.member_stats[printer]['completed'] += 1
+
+    def record_failure(self, printer):
+        self.down_until[printer] = time.monotonic() + self.cooldown
+        self.member_stats[printer]['failures'] += 1
+
+    def moved(self, from_printer, count=1):
+        self.member_stats[from_printer]['moved_away'] += count
+        self.failovers += count
+
+    def stats(self, depth):
+        now = time.monotonic()
+        members = {}
+        for p in self.printers:
+            latency = self.latency[p]
+            members[p] = dict(self.member_stats[p], queue_depth=depth(p), healthy=self.healthy(p, now),
+                              latency_ms=round(latency * 1000.0, 1) if latency is not None else None)
+        return {'printers': members, 'failovers': self.failovers}
+
+
+# ---------------- benchmark ----------------
+async def _bench_run(printers, jobs, interval, fail_at, pooled):
+    from homeolabel.spooler import PrintSpooler, PrintJob
+    spooler = PrintSpooler(lambda name: printers[name], timeout=10.0, max_retries=3, backoff_base=0.05,
+                           jitter=0.0)
+    names = list(printers)
+    if pooled:
+        spooler.add_pool(PrinterPool("pool", names, cooldown=60.0))
+    futures = []
+    start = time.perf_counter()
+    for i in range(jobs):
+        if i == fail_at:
+            printers[names[0]].fail_next(10 ** 9)  # the fastest (busiest) printer goes down for good
+        job = PrintJob("pool" if pooled else names[0], label=f"label {i}")
+        job.submitted_at = time.perf_counter()
+        futures.append((job, await spooler.submit(job)))
+        await asyncio.sleep(interval)
+    done = await asyncio.gather(*(f for _, f in futures), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    latencies = [(job.finished_at - job.submitted_at) * 1000.0 for (job, _), r in zip(futures, done)
+                 if not isinstance(r, BaseException)]
+    per_printer = {}
+    for (job, _), r in zip(futures, done):
+        if not isinstance(r, BaseException):
+            per_printer[job.printer] = per_printer.get(job.printer, 0) + 1
+    summary = {'seconds': round(elapsed, 3), 'jobs_per_sec': round(jobs / elapsed, 1),
+               'failed': sum(isinstance(r, BaseException) for r in done), 'printed_by': per_printer}
+    from homeolabel.timing import summarize_latencies
+    summary['submit_to_printed'] = summarize_latencies(latencies)
+    if pooled:
+        summary['pool'] = spooler.pool_metrics()['pool']
+    await spooler.close()
+    return summary
+
+
+def bench(jobs=300, speeds=(0.02, 0.05, 0.15), interval=0.015, fail_at=None):
+    # Same arrivals (one job every `interval` s) into one fake printer, then into a pool of all of them
+    from homeolabel.spooler import FakePrinter
+
+    class _Printer(FakePrinter):
+        def print_job(self, job):
+            result = super().print_job(job)
+            job.finished_at = time.perf_counter()
+            return result
+
+    out = {}
+    for pooled in (False, True):
+        printers = {f"fake-{i + 1} ({s * 1000:.0f}ms)": _Printer(f"fake-{i + 1}", s) for i, s in enumerate(speeds)}
+        out['pool' if pooled else 'single'] = asyncio.run(
+            _bench_run(printers, jobs, interval, fail_at if pooled else None, pooled))
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Printer pool load balancing")
+    parser.add_argument("--bench", action="store_true", help="one fake printer vs a pool of fake printers")
+    parser.add_argument("--jobs", type=int, default=300)
+    parser.add_argument("--speeds", default="0.02,0.05,0.15", help="seconds per job of each fake printer")
+    parser.add_argument("--interval", type=float, default=0.015, help="seconds between job arrivals")
+    parser.add_argument("--fail-at", type=int, help="the first (fastest) printer fails from this job on")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
+    if not args.bench:
+        parser.print_help()
+        return 0
+    speeds = [float(s) for s in args.speeds.split(",") if s.strip()]
+    print(json.dumps(bench(args.jobs, speeds, args.interval, args.fail_at), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
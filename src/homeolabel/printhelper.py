@@ -0,0 +1,324 @@
+# printhelper.py
+"""
+Long-lived print helper process
+- Started once, then fed jobs as JSON lines on stdin; one JSON reply per line on stdout
+- Requests:  {"id": 1, "op": "ping"}
+             {"id": 2, "op": "print", "printer": "...", "pdf_path": "...", "fitlines": [[text, size], ...],
+              "geometry": {...LabelGeometry.to_dict()...}}
+             {"id": 3, "op": "quit"}
+- Replies:   {"id": 2, "ok": true, "route": "raster"}  /  {"id": 2, "ok": false, "error": "..."}
+             {"id": 2, "ok": false, "uncertain": true, "error": "..."}: a route failed after
+             part of the job reached the spooler (printing.PrintStartedError)
+
+The helper keeps PyMuPDF + the printer DC code loaded and prints the PDF itself
+(raster via GDI, then GDI text, then ShellExecute/Sumatra as the last resort),
+so a label no longer pays a Sumatra process start and the fixed 2-second sleep.
+The next route is tried only when the previous one failed before submitting
+anything; otherwise the reply is "uncertain" and the parent raises PrintUncertain.
+
+PrintHelper is the parent side: starts the helper, health-checks it with ping,
+restarts it when it crashes or stops answering. HelperPrinterBackend plugs it
+into the spooler with one helper per printer, so a printer stuck in its driver
+only holds up its own jobs; a job for a helper still busy with an earlier one
+is not queued behind it but raises spooler.PrintTimeout (never sent, retried).
+Once a print request has been written to the helper it may print, so losing
+the helper after that raises spooler.PrintUncertain (no in-process fallback,
+no retry); the fallback is only for a helper that could not start or take the
+request.
+
+`python -m homeolabel.printhelper --record jobs.jsonl` is a stand-in helper that
+only records the jobs it receives (Linux tests / dry runs).
+"""
+import os
+import sys
+import json
+import time
+import queue
+import logging
+import argparse
+import threading
+import subprocess
+
+from homeolabel.printing import print_pdf_to_printer, print_label_direct, print_pdf_raster, PrintStartedError
+from homeolabel.render import BASE_PRINT_FONT
+from homeolabel.geometry import LabelGeometry
+from homeolabel.spooler import PrintUncertain, PrintTimeout
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HELPER_FLAG = "--print-helper"
+
+
+class PrintHelperError(RuntimeError):
+    pass
+
+
+class PrintHelperNoReply(PrintHelperError):
+    # The request was written; the helper then died or stopped answering
+    pass
+
+
+# ---------------- helper side ----------------
+def _print_in_helper(request, base_font_size):
+    printer = request.get('printer')
+    pdf_path = request.get('pdf_path')
+    fitlines = [tuple(line) for line in request.get('fitlines') or []]
+    copies = int(request.get('copies', 1) or 1)
+    geometry = LabelGeometry.from_dict(request['geometry']) if request.get('geometry') else None
+    routes = [("raster", lambda: print_pdf_raster(pdf_path, printer))]
+    if fitlines:
+        routes.append(("gdi", lambda: print_label_direct(printer, fitlines, base_font_size=base_font_size,
+                                                         geometry=geometry, copies=copies)))
+    # No settle sleep: the spooled PDF stays on disk for the viewer to read
+    routes.append(("pdf", lambda: print_pdf_to_printer(pdf_path, printer, wait_seconds=0)))
+    errors = []
+    for route, run in routes:
+        try:
+            run()
+            return route
+        except PrintStartedError as e:
+            # Part of the job is in the spooler: another route could print the label twice
+            errors.append(f"{route}: {e}")
+            raise PrintStartedError("; ".join(errors)) from e
+        except Exception as e:
+            errors.append(f"{route}: {e}")
+    raise PrintHelperError("; ".join(errors))
+
+
+def serve(stdin=None, stdout=None, record_path=None, base_font_size=BASE_PRINT_FONT):
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError:
+            stdout.write(json.dumps({'ok': False, 'error': 'bad json'}) + "\n")
+            stdout.flush()
+            continue
+        reply = {'id': request.get('id'), 'ok': True}
+        op = request.get('op')
+        try:
+            if op == "ping":
+                reply['pid'] = os.getpid()
+            elif op == "quit":
+                stdout.write(json.dumps(reply) + "\n")
+                stdout.flush()
+                return 0
+            elif op == "print":
+                if record_path:
+                    with open(record_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(request) + "\n")
+                    reply['route'] = "record"
+                else:
+                    reply['route'] = _print_in_helper(request, base_font_size)
+            else:
+                raise PrintHelperError(f"unknown op {op!r}")
+        except Exception as e:
+            reply = {'id': request.get('id'), 'ok': False, 'error': str(e)}
+            if isinstance(e, PrintStartedError):
+                reply['uncertain'] = True
+        stdout.write(json.dumps(reply) + "\n")
+        stdout.flush()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Persistent label print helper (stdin/stdout JSON lines)")
+    parser.add_argument("--record", help="record jobs to this JSON-lines file instead of printing")
+    parser.add_argument(HELPER_FLAG, action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    return serve(record_path=args.record)
+
+
+# ---------------- parent side ----------------
+def default_helper_command(record_path=None):
+    if getattr(sys, 'frozen', False):
+        # PyInstaller build: the app executable runs the helper when given HELPER_FLAG
+        cmd = [sys.executable, HELPER_FLAG]
+    else:
+        cmd = [sys.executable, "-m", "homeolabel.printhelper"]
+    if record_path:
+        cmd += ["--record", record_path]
+    return cmd
+
+
+class PrintHelper:
+    def __init__(self, command=None, timeout=45.0, ping_timeout=5.0, ping_after_idle=30.0):
+        self.command = command or default_helper_command()
+        self.timeout = timeout
+        self.ping_timeout = ping_timeout
+        self.ping_after_idle = ping_after_idle
+        self.restarts = 0
+        self.jobs_sent = 0
+        self._started = False
+        self._proc = None
+        self._replies = None
+        self._next_id = 0
+        self._last_ok = 0.0
+        self._lock = threading.Lock()
+
+    def _spawn(self):
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(p for p in (SRC_DIR, env.get('PYTHONPATH')) if p)
+        env['PYTHONUNBUFFERED'] = "1"
+        creationflags = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+        self._proc = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      stderr=subprocess.DEVNULL, text=True, encoding="utf-8",
+                                      bufsize=1, env=env, creationflags=creationflags)
+        self._replies = queue.Queue()
+        threading.Thread(target=self._pump, args=(self._proc, self._replies),
+                         name="print-helper-reader", daemon=True).start()
+        logging.info(f"Print helper started (pid {self._proc.pid}): {' '.join(self.command)}")
+
+    @staticmethod
+    def _pump(proc, replies):
+        for line in proc.stdout:
+            try:
+                replies.put(json.loads(line))
+            except ValueError:
+                logging.warning(f"print helper sent junk: {line.rstrip()}")
+        replies.put(None)  # EOF: the helper exited
+
+    def _kill(self):
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.kill()
+            proc.wait(timeout=5)
+        except Exception:
+            pass
+
+    def alive(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    def _request(self, payload, timeout):
+        self._next_id += 1
+        payload = dict(payload, id=self._next_id)
+        try:
+            self._proc.stdin.write(json.dumps(payload) + "\n")
+            self._proc.stdin.flush()
+        except (OSError, ValueError) as e:
+            self._kill()
+            raise PrintHelperError(f"print helper pipe broken: {e}")
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                reply = self._replies.get(timeout=max(0.0, remaining))
+            except queue.Empty:
+                self._kill()
+                raise PrintHelperNoReply(f"print helper did not answer within {timeout}s")
+            if reply is None:
+                self._kill()
+                raise PrintHelperNoReply("print helper exited")
+            if reply.get('id') == payload['id']:
+                self._last_ok = time.monotonic()
+                return reply
+
+    def _ensure_running(self):
+        if not self.alive():
+            if self._started:
+                self.restarts += 1
+                logging.warning("Print helper not running; restarting")
+            self._kill()
+            self._spawn()
+            self._started = True
+            self._request({'op': "ping"}, self.ping_timeout)
+        elif time.monotonic() - self._last_ok > self.ping_after_idle:
+            try:
+                self._request({'op': "ping"}, self.ping_timeout)
+            except PrintHelperError:
+                self.restarts += 1
+                self._spawn()
+                self._request({'op': "ping"}, self.ping_timeout)
+
+    def start(self):
+        with self._lock:
+            self._ensure_running()
+        return self
+
+    def ping(self):
+        with self._lock:
+            self._ensure_running()
+            return self._request({'op': "ping"}, self.ping_timeout)
+
+    def print_job(self, printer, pdf_path, fitlines=None, copies=1, geometry=None):
+        request = {'op': "print", 'printer': printer, 'pdf_path': os.path.abspath(pdf_path),
+                   'fitlines': list(fitlines or []), 'copies': copies}
+        if geometry is not None:
+            request['geometry'] = geometry.to_dict()
+        # Waiting here would count against the spooler's timeout for a job not even sent yet
+        if not self._lock.acquire(blocking=False):
+            raise PrintTimeout(f"print helper for '{printer}' is still busy with an earlier job")
+        try:
+            self._ensure_running()
+            self.jobs_sent += 1
+            try:
+                reply = self._request(request, self.timeout)
+            except PrintHelperNoReply as e:
+                raise PrintUncertain(f"print helper lost after taking the job: {e}") from e
+        finally:
+            self._lock.release()
+        if not reply.get('ok') and reply.get('uncertain'):
+            raise PrintUncertain(f"print helper: {reply.get('error', 'print failed')}")
+        if not reply.get('ok'):
+            # The helper is fine, the printer is not: let the spooler retry
+            raise RuntimeError(reply.get('error', 'print failed'))
+        return reply.get('route')
+
+    def stop(self):
+        with self._lock:
+            if self.alive():
+                try:
+                    self._request({'op': "quit"}, self.ping_timeout)
+                    self._proc.wait(timeout=5)
+                except Exception:
+                    pass
+            self._kill()
+
+
+class HelperPrinterBackend:
+    # Spooler backend: send jobs to a persistent helper, one per printer; fall back in-process only if
+    # it cannot start or take the job (PrintUncertain from a helper lost mid-job goes to the spooler as is).
+    # helper: one helper for every printer (tests); helper_factory() makes the per-printer ones.
+    def __init__(self, helper=None, fallback=None, helper_factory=None):
+        self.helper = helper
+        self.helper_factory = helper_factory or PrintHelper
+        self.fallback = fallback
+        self._helpers = {}
+        self._helpers_lock = threading.Lock()
+
+    def helper_for(self, printer):
+        if self.helper is not None:
+            return self.helper
+        with self._helpers_lock:
+            helper = self._helpers.get(printer)
+            if helper is None:
+                helper = self._helpers[printer] = self.helper_factory()
+            return helper
+
+    def print_job(self, job):
+        try:
+            return self.helper_for(job.printer).print_job(job.printer, job.pdf_path, job.fitlines,
+                                                          copies=job.copies, geometry=job.geometry)
+        except (OSError, PrintHelperError) as e:
+            if self.fallback is None:
+                raise
+            logging.warning(f"Print helper failed ({e}); printing in-process")
+            return self.fallback.print_job(job)
+
+    def close(self):
+        with self._helpers_lock:
+            helpers = list(self._helpers.values())
+            self._helpers.clear()
+        if self.helper is not None:
+            helpers.append(self.helper)
+        for helper in helpers:
+            helper.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
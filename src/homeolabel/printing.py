@@ -0,0 +1,189 @@
+# printing.py
+"""
+Printer backends used by the app and the spooler
+- find_sumatra_exe / print_pdf_to_printer: PDF -> printer via ShellExecute(printto), then SumatraPDF
+- print_label_direct: GDI fallback that draws the fitted lines straight to the printer DC
+- PrintStartedError: a route failed after part of the job reached the spooler, so
+  it may still print and must not be sent again by another route
+
+The pywin32 modules are optional so the rest of the package imports on Linux
+(SKIP_WIN32 runners); the Windows-only calls fail at call time instead.
+"""
+import os
+import sys
+import time
+import shutil
+import logging
+import subprocess
+
+from homeolabel.geometry import DEFAULT_GEOMETRY
+
+try:
+    import win32print
+    import win32ui
+    import win32api
+    import win32con
+except ImportError:
+    win32print = win32ui = win32api = win32con = None
+
+
+class PrintStartedError(RuntimeError):
+    # Failed after a page (or the whole PDF) was handed to the spooler; the label may still print
+    pass
+
+
+# --- Sumatra detection + PDF->printer helper ---
+def find_sumatra_exe():
+    path_exe = shutil.which("SumatraPDF.exe") or shutil.which("sumatrapdf.exe") or shutil.which("SumatraPDF")
+    if path_exe:
+        return path_exe
+    program_files = [os.environ.get("ProgramFiles"), os.environ.get("ProgramFiles(x86)")]
+    for base in program_files:
+        if not base:
+            continue
+        candidate = os.path.join(base, "SumatraPDF", "SumatraPDF.exe")
+        if os.path.exists(candidate):
+            return candidate
+    script_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
+    for name in ("SumatraPDF.exe", "sumatrapdf.exe"):
+        c = os.path.join(script_dir, name)
+        if os.path.exists(c):
+            return c
+    return None
+
+
+def print_pdf_to_printer(pdf_path, printer_name, wait_seconds=2, log=logging):
+    if not os.path.exists(pdf_path):
+        raise FileNotFoundError(pdf_path)
+    if not printer_name:
+        raise ValueError("Printer name required")
+
+    args = f'"{printer_name}"'
+    try:
+        rc = win32api.ShellExecute(0, "printto", pdf_path, args, ".", 0)
+        rc_int = int(rc)
+        if rc_int > 32:
+            log.info(f"ShellExecute printto succeeded (code {rc_int}) for '{printer_name}'")
+            time.sleep(wait_seconds)
+            return True
+        else:
+            log.warning(f"ShellExecute returned code {rc_int}; falling back to Sumatra.")
+    except Exception as e:
+        log.warning(f"ShellExecute printto failed: {e}. Trying Sumatra fallback.")
+
+    sumatra = find_sumatra_exe()
+    if sumatra:
+        try:
+            cmd = [sumatra, "-print-to", printer_name, pdf_path]
+            log.info(f"Running Sumatra: {' '.join(cmd)}")
+            proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=40)
+            if proc.returncode == 0:
+                log.info("Sumatra printed successfully.")
+                time.sleep(wait_seconds)
+                return True
+            else:
+                stdout = proc.stdout.decode(errors="ignore")
+                stderr = proc.stderr.decode(errors="ignore")
+                log.error(f"Sumatra returned {proc.returncode}. stdout:{stdout} stderr:{stderr}")
+        except subprocess.TimeoutExpired as e:
+            raise PrintStartedError(f"Sumatra did not finish printing: {e}") from e
+        except Exception as e:
+            log.error(f"Sumatra printing failed: {e}")
+
+    raise RuntimeError(
+        "Printing failed: ShellExecute(printto) failed and SumatraPDF fallback unavailable/failed. "
+        "Install SumatraPDF (portable) and place SumatraPDF.exe in Program Files or the application folder, "
+        "or configure a PDF viewer that supports the 'printto' verb. Alternatively open the PDF manually and print."
+    )
+
+
+# --- PDF raster via GDI (used by the persistent print helper) ---
+def print_pdf_raster(pdf_path, printer_name):
+    # Renders each PDF page at the printer's DPI with PyMuPDF and blits it to the printer DC
+    if not os.path.exists(pdf_path):
+        raise FileNotFoundError(pdf_path)
+    if not printer_name:
+        raise ValueError("Printer name required")
+    import pymupdf
+    from PIL import Image, ImageWin
+    hDC = win32ui.CreateDC()
+    hDC.CreatePrinterDC(printer_name)
+    started = False
+    try:
+        dpi_x = hDC.GetDeviceCaps(win32con.LOGPIXELSX)
+        dpi_y = hDC.GetDeviceCaps(win32con.LOGPIXELSY)
+        with pymupdf.open(pdf_path) as doc:
+            hDC.StartDoc("Homeopathy Label")
+            for page in doc:
+                pix = page.get_pixmap(matrix=pymupdf.Matrix(dpi_x / 72.0, dpi_y / 72.0), alpha=False)
+                img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+                hDC.StartPage()
+                started = True
+                ImageWin.Dib(img).draw(hDC.GetHandleOutput(), (0, 0, pix.width, pix.height))
+                hDC.EndPage()
+            hDC.EndDoc()
+    except Exception as e:
+        if started:
+            raise PrintStartedError(f"raster print failed after spooling a page: {e}") from e
+        raise
+    finally:
+        hDC.DeleteDC()
+    return True
+
+
+# --- GDI direct printing (safe CreateFont usage) ---
+def print_label_direct(printer_name, fit_lines, base_font_size=9, geometry=None, copies=1):
+    # geometry: the label stock (geometry.LabelGeometry); its pixel values are cached per printer DPI
+    g = geometry or DEFAULT_GEOMETRY
+    if not printer_name:
+        raise ValueError("Printer name required")
+    hprinter = None
+    started = False
+    try:
+        hprinter = win32print.OpenPrinter(printer_name)
+        hDC = win32ui.CreateDC()
+        hDC.CreatePrinterDC(printer_name)
+        hDC.StartDoc("Homeopathy Label")
+
+        dpi_x = hDC.GetDeviceCaps(win32con.LOGPIXELSX)
+        dpi_y = hDC.GetDeviceCaps(win32con.LOGPIXELSY)
+
+        px = g.pixels(dpi_x, dpi_y)
+
+        # Copies are extra pages of the same document: one spool job, fonts created once
+        fonts = {}
+        for _ in range(max(1, int(copies))):
+            hDC.StartPage()
+            started = True
+            # Draw rectangle border
+            hDC.Rectangle((px.margin_x, px.margin_y, px.page_w - px.margin_x, px.page_h - px.margin_y))
+            y = px.text_top
+
+            for text, fontsize in fit_lines:
+                font = fonts.get(fontsize)
+                if font is None:
+                    font_height = -int(fontsize * px.px_per_pt_y)
+                    font_spec = {"name": g.screen_font, "height": font_height, "weight": 400}
+                    try:
+                        font = win32ui.CreateFont(font_spec)
+                    except Exception:
+                        font = win32ui.CreateFont({"name": g.screen_font, "height": font_height})
+                    fonts[fontsize] = font
+                hDC.SelectObject(font)
+                text_width = hDC.GetTextExtent(text)[0]
+                hDC.TextOut(int(px.x_center - text_width // 2), int(y), text)
+                y += int(fontsize * px.px_per_pt_y * g.line_gap)
+
+            hDC.EndPage()
+        hDC.EndDoc()
+        hDC.DeleteDC()
+    except Exception as e:
+        if started:
+            raise PrintStartedError(f"GDI print failed after spooling a page: {e}") from e
+        raise
+    finally:
+        if hprinter:
+            try:
+                win32print.ClosePrinter(hprinter)
+            except Exception:
+                pass
@@ -0,0 +1,321 @@
+# raster.py
+"""
+1-bit label bitmaps at the printer's DPI (thermal printers: 203 / 300 dpi)
+- render_label_bitmap: draws the fit_label layout straight into a NumPy
+  bool array (True = black dot) at the target DPI, same border / baselines /
+  centring as render.draw_label, so the driver no longer rasterizes a PDF per label
+- GlyphCache: each glyph is rasterized once per (font, size, dpi, char) with
+  Pillow and then only pasted; stats() gives hits / misses
+- pack_rows: np.packbits over the rows (MSB first, 1 bit per dot)
+- Output: PNG (golden-image tests on Linux), TSPL BITMAP or ZPL ^GFA for RAW jobs
+- RawBitmapBackend: spooler backend that sends the bitmap as a RAW job through
+  the Windows spooler (print_raw), falling back to the PDF chain only when
+  nothing was written; an error after WritePrinter is spooler.PrintUncertain
+- RawRoutingBackend: what the app uses; printers set to RAW in
+  records/label_profiles.json (geometry.ProfileStore.raw_settings) get
+  RawBitmapBackend, every other printer the PDF chain
+
+Advances come from the PDF font metrics (reportlab stringWidth), so line widths
+and centring match the PDF; only the glyph shapes come from the TrueType font.
+
+CLI: python -m homeolabel.raster "Nux Vomica" 30C "4 pills" "Twice daily" Shop Branch --dpi 203 --png nux.png
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+import threading
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from homeolabel.render import fit_label
+from homeolabel.geometry import DEFAULT_GEOMETRY, DEFAULT_PROFILE, PROFILES
+from homeolabel.spooler import PrintUncertain
+
+try:
+    import win32print
+except ImportError:
+    win32print = None
+
+DEFAULT_DPI = 203
+
+
+def find_raster_font():
+    # Arial on Windows (same face as the GDI path); reportlab's bundled Vera elsewhere,
+    # which is always installed and keeps golden images stable across Linux boxes
+    windir = os.environ.get("WINDIR") or os.environ.get("SystemRoot")
+    candidates = []
+    if windir:
+        candidates.append(os.path.join(windir, "Fonts", "arial.ttf"))
+    candidates += ["/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf"]
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    import reportlab
+    return os.path.join(os.path.dirname(reportlab.__file__), "fonts", "Vera.ttf")
+
+
+class GlyphCache:
+    # (font_path, size_pt, dpi, char) -> (bool bitmap, left px, top px relative to the baseline)
+    def __init__(self, font_path=None, max_items=4096):
+        self.font_path = font_path or find_raster_font()
+        self.max_items = max_items
+        self._glyphs = {}
+        self._fonts = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _font(self, size_px):
+        font = self._fonts.get(size_px)
+        if font is None:
+            font = ImageFont.truetype(self.font_path, size_px)
+            self._fonts[size_px] = font
+        return font
+
+    def glyph(self, char, size_pt, dpi):
+        key = (self.font_path, size_pt, dpi, char)
+        with self._lock:
+            hit = self._glyphs.get(key)
+            if hit is not None:
+                self.hits += 1
+                return hit
+            self.misses += 1
+            font = self._font(max(1, int(round(size_pt * dpi / 72.0))))
+            left, top, right, bottom = font.getbbox(char, anchor="ls")
+            if right <= left or bottom <= top:
+                bitmap = np.zeros((0, 0), dtype=bool)
+            else:
+                img = Image.new("L", (right - left, bottom - top), 0)
+                ImageDraw.Draw(img).text((-left, -top), char, font=font, fill=255, anchor="ls")
+                bitmap = np.asarray(img) >= 128
+            entry = (bitmap, left, top)
+            if len(self._glyphs) >= self.max_items:
+                self._glyphs.clear()
+            self._glyphs[key] = entry
+            return entry
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'glyphs': len(self._glyphs),
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0}
+
+
+_default_cache = None
+
+
+def default_glyph_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = GlyphCache()
+    return _default_cache
+
+
+def _blit(canvas_bits, bitmap, x, y):
+    # OR a glyph into the label, clipped to the label edges
+    h, w = bitmap.shape
+    if not h or not w:
+        return
+    H, W = canvas_bits.shape
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + w, W), min(y + h, H)
+    if x1 <= x0 or y1 <= y0:
+        return
+    canvas_bits[y0:y1, x0:x1] |= bitmap[y0 - y:y1 - y, x0 - x:x1 - x]
+
+
+def render_label_bitmap(fitlines, dpi=DEFAULT_DPI, geometry=None, glyphs=None):
+    g = geometry or DEFAULT_GEOMETRY
+    glyphs = glyphs or default_glyph_cache()
+    px = g.pixels(dpi)
+    px_per_pt = px.px_per_pt_x
+    W, H = px.page_w, px.page_h
+    bits = np.zeros((H, W), dtype=bool)
+
+    # Border: 1pt line on the inset rectangle, like draw_label
+    line = px.line_px
+    x0, y0 = px.margin_x, px.margin_y
+    x1 = W - x0
+    y1 = H - y0
+    bits[y0:y0 + line, x0:x1] = True
+    bits[y1 - line:y1, x0:x1] = True
+    bits[y0:y1, x0:x0 + line] = True
+    bits[y0:y1, x1 - line:x1] = True
+
+    y_pt = g.baseline_y  # baseline, measured from the bottom as in the PDF
+    for text, fsize in fitlines:
+        baseline = int(round((g.height_pt - y_pt) * px_per_pt))
+        x_pt = g.center_x - stringWidth(text, g.font, fsize) / 2.0
+        for char in text:
+            bitmap, left, top = glyphs.glyph(char, fsize, dpi)
+            _blit(bits, bitmap, int(round(x_pt * px_per_pt)) + left, baseline + top)
+            x_pt += stringWidth(char, g.font, fsize)
+        y_pt -= fsize * g.line_gap
+    return bits
+
+
+def label_bitmap(fields, dpi=DEFAULT_DPI, base_font_size=None, glyphs=None, geometry=None):
+    # label fields -> (fitlines, bitmap) using the same layout as the PDF path
+    fitlines = fit_label(fields, base_font_size, geometry)
+    return fitlines, render_label_bitmap(fitlines, dpi=dpi, geometry=geometry, glyphs=glyphs)
+
+
+def pack_rows(bits):
+    # (H, W) bool -> (H, ceil(W/8)) uint8, MSB = leftmost dot, 1 = black
+    return np.packbits(bits, axis=1)
+
+
+def bitmap_to_image(bits):
+    # PIL mode "1" stores 1 = white, so the packed rows are inverted
+    H, W = bits.shape
+    return Image.frombytes("1", (W, H), np.invert(pack_rows(bits)).tobytes())
+
+
+def save_png(bits, path, dpi=DEFAULT_DPI):
+    bitmap_to_image(bits).save(path, format="PNG", dpi=(dpi, dpi))
+
+
+def tspl_job(bits, copies=1, geometry=None):
+    # TSC / TSPL: BITMAP x,y,width_bytes,height,mode,data ; a 0 bit prints a dot
+    g = geometry or DEFAULT_GEOMETRY
+    packed = np.invert(pack_rows(bits))
+    height, width_bytes = packed.shape
+    head = (f"SIZE {g.width_mm} mm,{g.height_mm} mm\r\nGAP {g.gap_mm} mm,0 mm\r\nCLS\r\n"
+            f"BITMAP 0,0,{width_bytes},{height},0,").encode("ascii")
+    tail = f"\r\nPRINT 1,{max(1, int(copies))}\r\n".encode("ascii")
+    return head + packed.tobytes() + tail
+
+
+def zpl_job(bits, copies=1, geometry=None):
+    # Zebra ZPL: ^GFA graphic field as hex, 1 bit prints a dot
+    packed = pack_rows(bits)
+    height, width_bytes = packed.shape
+    total = height * width_bytes
+    data = packed.tobytes().hex().upper()
+    return (f"^XA^PW{bits.shape[1]}^LL{height}^FO0,0^GFA,{total},{total},{width_bytes},{data}^FS"
+            f"^PQ{max(1, int(copies))}^XZ").encode("ascii")
+
+
+RAW_FORMATS = {'tspl': tspl_job, 'zpl': zpl_job}
+
+
+def print_raw(printer_name, data, doc_name="Homeopathy Label"):
+    # Errors before WritePrinter leave nothing in the spooler; after it the label may print -> PrintUncertain
+    if not printer_name:
+        raise ValueError("Printer name required")
+    if win32print is None:
+        raise OSError("win32print is not available on this platform")
+    hprinter = win32print.OpenPrinter(printer_name)
+    written = False
+    try:
+        win32print.StartDocPrinter(hprinter, 1, (doc_name, None, "RAW"))
+        try:
+            win32print.StartPagePrinter(hprinter)
+            written = True
+            win32print.WritePrinter(hprinter, data)
+            win32print.EndPagePrinter(hprinter)
+        finally:
+            win32print.EndDocPrinter(hprinter)
+    except Exception as e:
+        if written:
+            raise PrintUncertain(f"RAW job to '{printer_name}' failed after the data was sent: {e}") from e
+        raise
+    finally:
+        try:
+            win32print.ClosePrinter(hprinter)
+        except Exception as e:
+            logging.warning(f"ClosePrinter failed for '{printer_name}': {e}")
+    return True
+
+
+class RawBitmapBackend:
+    # Spooler backend: job.fitlines -> 1-bit bitmap at the printer DPI -> RAW job.
+    # Jobs without fitlines, or a RAW job that failed before any data was written, go to the
+    # fallback (PDF chain); PrintUncertain from print_raw goes to the spooler as is.
+    def __init__(self, dpi=DEFAULT_DPI, raw_format="tspl", fallback=None, glyphs=None):
+        if raw_format not in RAW_FORMATS:
+            raise ValueError(f"unknown RAW format {raw_format!r}")
+        self.dpi = dpi
+        self.raw_format = raw_format
+        self.fallback = fallback
+        self.glyphs = glyphs or default_glyph_cache()
+
+    def build_job(self, fitlines, copies=1, geometry=None):
+        bits = render_label_bitmap(fitlines, dpi=self.dpi, geometry=geometry, glyphs=self.glyphs)
+        return RAW_FORMATS[self.raw_format](bits, copies=copies, geometry=geometry)
+
+    def print_job(self, job):
+        try:
+            if not job.fitlines:
+                raise ValueError("RAW bitmap printing needs the fitted lines")
+            print_raw(job.printer, self.build_job(job.fitlines, copies=job.copies, geometry=job.geometry))
+            return "raw"
+        except PrintUncertain:
+            raise
+        except Exception as e:
+            if self.fallback is None:
+                raise
+            logging.warning(f"RAW bitmap print failed ({e}); using fallback backend")
+            return self.fallback.print_job(job)
+
+
+class RawRoutingBackend:
+    # Spooler backend: RAW bitmaps for the printers whose settings(printer) say so, `fallback` for the rest
+    def __init__(self, settings, fallback, glyphs=None):
+        self.settings = settings
+        self.fallback = fallback
+        self.glyphs = glyphs
+        self._backends = {}
+
+    def backend_for(self, printer):
+        raw = self.settings(printer) if printer else None
+        if not raw:
+            return self.fallback
+        key = (raw.get('format') or "tspl", int(raw.get('dpi') or DEFAULT_DPI))
+        backend = self._backends.get(key)
+        if backend is None:
+            backend = RawBitmapBackend(dpi=key[1], raw_format=key[0], fallback=self.fallback, glyphs=self.glyphs)
+            self._backends[key] = backend
+        return backend
+
+    def print_job(self, job):
+        try:
+            backend = self.backend_for(job.printer)
+        except Exception as e:
+            logging.error(f"Bad RAW settings for printer '{job.printer}' ({e}); using the PDF chain")
+            backend = self.fallback
+        return backend.print_job(job)
+
+    def close(self):
+        if hasattr(self.fallback, 'close'):
+            self.fallback.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render a label as a 1-bit bitmap at printer DPI")
+    parser.add_argument("fields", nargs=6, metavar="FIELD", help="medicine potency dose time shop branch")
+    parser.add_argument("--dpi", type=int, default=DEFAULT_DPI)
+    parser.add_argument("--png", help="write the bitmap as PNG")
+    parser.add_argument("--raw", help="write a RAW printer job to this file")
+    parser.add_argument("--format", choices=sorted(RAW_FORMATS), default="tspl")
+    parser.add_argument("--font", help="TrueType font for the glyphs (default: Arial / Vera)")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, choices=sorted(PROFILES), help="label stock")
+    args = parser.parse_args(argv)
+    glyphs = GlyphCache(args.font) if args.font else None
+    geometry = PROFILES[args.profile]
+    fitlines, bits = label_bitmap(args.fields, dpi=args.dpi, glyphs=glyphs, geometry=geometry)
+    if args.png:
+        save_png(bits, args.png, dpi=args.dpi)
+    if args.raw:
+        with open(args.raw, "wb") as f:
+            f.write(RAW_FORMATS[args.format](bits, geometry=geometry))
+    print(json.dumps({'fitlines': fitlines, 'width_px': bits.shape[1], 'height_px': bits.shape[0],
+                      'black_dots': int(bits.sum())}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
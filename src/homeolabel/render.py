@@ -0,0 +1,150 @@
+# render.py
+"""
+Label layout + PDF rendering shared by the GUI and the label service
+- fit_label: the layout of every label - width-aware breaks and sizes for the
+  form fields (linebreak.py), memoized
+- split_medicine_name / fit_lines_to_box / build_label_lines: the older
+  character-count split + greedy shrink, kept for comparisons and old callers
+- render_label_pdf: draws one label (optionally N copies as N pages) into a file or returns the bytes
+- render_labels_pdf: many already fitted labels (fit_label outputs), one page
+  each, in a single PDF (bulk runs)
+- Label size, border, text width, fonts and spacing come from a geometry profile
+  (geometry.py); without one the 50x30 stock is used
+
+Nothing in here touches Qt or win32 so it can run headless (server, batch jobs).
+"""
+import io
+
+from reportlab.pdfgen import canvas
+from reportlab.lib.units import mm
+
+from homeolabel.linebreak import solve_layout
+from homeolabel.geometry import DEFAULT_GEOMETRY
+
+# The default profile's values, for callers that only know the 50x30 stock
+PRINT_FONT = DEFAULT_GEOMETRY.font
+BASE_PRINT_FONT = DEFAULT_GEOMETRY.base_font_size
+LABEL_W_MM, LABEL_H_MM = DEFAULT_GEOMETRY.width_mm, DEFAULT_GEOMETRY.height_mm
+MAX_TEXT_WIDTH_MM = DEFAULT_GEOMETRY.text_width_mm
+
+
+def fit_lines_to_box(lines, c, fontname, base_fontsize, max_width_mm, min_fontsize=6):
+    out_lines = []
+    max_width = max_width_mm * mm
+    for text in lines:
+        words = str(text).split()
+        if not words:
+            out_lines.append(("", base_fontsize))
+            continue
+        running = words[0]
+        font_size = base_fontsize
+        for word in words[1:]:
+            test_str = running + " " + word
+            c.setFont(fontname, font_size)
+            str_width = c.stringWidth(test_str, fontname, font_size)
+            if str_width <= max_width:
+                running = test_str
+            else:
+                actual_size = font_size
+                while actual_size > min_fontsize and c.stringWidth(running, fontname, actual_size) > max_width:
+                    actual_size -= 1
+                out_lines.append((running, actual_size))
+                running = word
+        actual_size = font_size
+        while actual_size > min_fontsize and c.stringWidth(running, fontname, actual_size) > max_width:
+            actual_size -= 1
+        out_lines.append((running, actual_size))
+    return out_lines
+
+
+def split_medicine_name(name, potency, max_chars=18):
+    words = name.strip().split()
+    line1 = ""
+    line2 = ""
+    for word in words:
+        if len((line1 + " " + word).strip()) <= max_chars or not line1:
+            if line1:
+                line1 += " "
+            line1 += word
+        else:
+            if line2:
+                line2 += " "
+            line2 += word
+    if line2:
+        line2 = f"{line2} {potency}".strip()
+    else:
+        line2 = potency
+    return line1, line2
+
+
+def build_label_lines(med_name, potency, dose, time_val, shop, branch):
+    line1, line2 = split_medicine_name(str(med_name).strip().upper(), str(potency).upper(), max_chars=18)
+    line3 = f"{dose}   {time_val}"
+    line4 = f"{shop}"
+    line5 = f"{branch}"
+    return [line1, line2, line3, line4, line5]
+
+
+def fit_label(fields, base_font_size=None, geometry=None):
+    # fields: (medicine, potency, dose, time, shop, branch) -> [(text, font_size), ...]
+    g = geometry or DEFAULT_GEOMETRY
+    med_name, potency, dose, time_val, shop, branch = (str(f) for f in fields)
+    name = med_name.strip().upper()
+    potency = potency.strip().upper()
+    block = f"{name} {potency}".strip()
+    lines = solve_layout(block, (f"{dose}   {time_val}", shop, branch), g.font, base_font_size or g.base_font_size,
+                         g.max_text_width, g.max_text_height, g.min_font_size, 2 if name and potency else 1,
+                         g.max_lines, g.line_gap)
+    return list(lines)
+
+
+def draw_label(c, fitlines, geometry=None):
+    g = geometry or DEFAULT_GEOMETRY
+    c.setLineWidth(1)
+    c.rect(*g.border_rect)
+    y = g.baseline_y
+    for text, fsize in fitlines:
+        c.setFont(g.font, fsize)
+        c.drawCentredString(g.center_x, y, text)
+        y -= (fsize * g.line_gap)
+
+
+def render_label_pdf(raw_lines, out=None, base_font_size=BASE_PRINT_FONT, copies=1, fitlines=None, geometry=None):
+    # `out` may be a path or a file-like object; with None the PDF bytes are returned.
+    # Returns (fitlines, pdf_bytes_or_None) so callers can reuse the fitted lines (GDI fallback).
+    # copies > 1: the label is drawn once as a form XObject and placed on `copies` pages of one PDF.
+    # fitlines (from fit_label) skips fitting raw_lines here.
+    g = geometry or DEFAULT_GEOMETRY
+    target = io.BytesIO() if out is None else out
+    c = canvas.Canvas(target, pagesize=g.page_size)
+    if fitlines is None:
+        fitlines = fit_lines_to_box(raw_lines, c, g.font, base_font_size, max_width_mm=g.text_width_mm)
+    if copies > 1:
+        c.beginForm("label")
+        draw_label(c, fitlines, g)
+        c.endForm()
+        for _ in range(copies):
+            c.doForm("label")
+            c.showPage()
+    else:
+        draw_label(c, fitlines, g)
+    c.save()
+    if out is None:
+        return fitlines, target.getvalue()
+    return fitlines, None
+
+
+def render_labels_pdf(labels, out=None, geometry=None):
+    # labels: iterable of fit_label outputs. Returns (page_count, pdf_bytes_or_None).
+    g = geometry or DEFAULT_GEOMETRY
+    target = io.BytesIO() if out is None else out
+    c = canvas.Canvas(target, pagesize=g.page_size)
+    pages = 0
+    for fitlines in labels:
+        draw_label(c, fitlines, g)
+        c.showPage()
+        pages += 1
+    c.save()
+    if out is None:
+        return pages, target.getvalue()
+    return pages, None
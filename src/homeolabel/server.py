@@ -0,0 +1,368 @@
+# server.py
+"""
+Local label service for multi-counter setups
+- One process holds the remedy catalog index + label renderer for every counter
+- Minimal asyncio HTTP/1.1 server with keep-alive (no extra dependencies)
+- Endpoints:
+    GET  /health                  -> {"ok": true, "remedies": N, "render_cache": {...hit/miss stats}}
+    GET  /suggest?q=arn&limit=20  -> {"results": [{"common": ..., "latin": ..., "alias": ...}, ...]}
+                                     (limit 1..MAX_SUGGEST_LIMIT, larger ones are capped)
+    POST /render  (JSON job)      -> application/pdf bytes ("copies": N gives N pages), or with "format":
+                                     "lines" the fitted (text, size) lines as JSON for the GDI path,
+                                     "tspl" / "zpl" a RAW bitmap job ("dpi", default 203)
+                                     The stock is "profile" (a name) or the one assigned to "printer"
+                                     in records/label_profiles.json, else the default profile
+- Malformed input (non-numeric copies / limit / dpi / Content-Length, limit < 1, an
+  unknown format or profile, a body that is not a JSON object) gets a 400, never a 500
+- LoopbackClient reuses one connection per client; run_load_test drives N of them
+
+Run:  python -m homeolabel.server --port 8765 --remedies remedies.xlsx
+Load: python -m homeolabel.server --bench --clients 8 --requests 200
+"""
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+from homeolabel.catalog import CatalogIndex, load_remedies_frame
+from homeolabel.geometry import ProfileStore
+from homeolabel.labeljob import LabelJob, FIELD_NAMES
+from homeolabel.labelcache import RenderCache, render_label_cached
+from homeolabel.timing import summarize_latencies
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 1024 * 1024
+MAX_SUGGEST_LIMIT = 200
+RENDER_FORMATS = ("pdf", "lines", "tspl", "zpl")
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class LabelService:
+    # Shared state: one catalog index + renderer settings for all connected counters.
+    # base_font_size None: each profile's own base size
+    def __init__(self, catalog, base_font_size=None, render_cache=None, profiles=None):
+        self.catalog = catalog
+        self.base_font_size = base_font_size
+        self.render_cache = render_cache if render_cache is not None else RenderCache()
+        self.profiles = profiles if profiles is not None else ProfileStore()
+        self._glyphs = None
+
+    @classmethod
+    def from_remedies_file(cls, remedies_file, **kwargs):
+        return cls(CatalogIndex.from_dataframe(load_remedies_frame(remedies_file)), **kwargs)
+
+    def suggest(self, text, limit=50):
+        limit = min(limit, MAX_SUGGEST_LIMIT)
+        return [{'common': common, 'latin': latin, 'alias': alias}
+                for (common, latin), alias in self.catalog.search_matches(text, limit=limit)]
+
+    def geometry(self, job):
+        # "profile" by name, else the stock assigned to "printer", else the default profile
+        name = job.get('profile')
+        if name:
+            if name not in self.profiles.profiles:
+                raise ValueError(f"unknown profile {name!r}")
+            return self.profiles.get(name)
+        return self.profiles.for_printer(job.get('printer'))
+
+    def render(self, job):
+        label = LabelJob([job.get(name, '') for name in FIELD_NAMES], self.base_font_size, self.geometry(job))
+        copies = max(1, min(int(job.get('copies', 1) or 1), 99))
+        output = job.get('format', 'pdf')
+        if output in ("tspl", "zpl"):
+            # Pillow is only needed for RAW bitmaps
+            from homeolabel.raster import RawBitmapBackend, default_glyph_cache, DEFAULT_DPI
+            if self._glyphs is None:
+                self._glyphs = default_glyph_cache()
+            dpi = job.get('dpi') or (self.profiles.raw_settings(job.get('printer')) or {}).get('dpi') or DEFAULT_DPI
+            raw = RawBitmapBackend(dpi=int(dpi), raw_format=output, glyphs=self._glyphs)
+            return "application/octet-stream", raw.build_job(label.layout().lines, copies=copies,
+                                                             geometry=label.geometry)
+        fitlines, pdf_bytes = render_label_cached(self.render_cache, label.fields, base_font_size=label.base_font_size,
+                                                  copies=copies, geometry=label.geometry)
+        if output == 'lines':
+            return "application/json", json.dumps({'lines': fitlines}).encode("utf-8")
+        return "application/pdf", pdf_bytes
+
+
+class _HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _json_bytes(obj):
+    return json.dumps(obj).encode("utf-8")
+
+
+def _int_param(value, name):
+    # Client-supplied integer; anything else is the client's mistake (400), not ours (500)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise _HttpError(400, f"{name} must be an integer, got {value!r}")
+
+
+async def _read_request(reader):
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, target, _version = request_line.decode("latin-1").split()
+    except ValueError:
+        raise _HttpError(400, "malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = _int_param(headers.get('content-length', 0) or 0, "Content-Length")
+    if length < 0:
+        raise _HttpError(400, "Content-Length must not be negative")
+    if length > MAX_BODY_BYTES:
+        raise _HttpError(413, "body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, headers, body
+
+
+def _write_response(writer, status, content_type, payload, keep_alive):
+    head = (f"HTTP/1.1 {status} {_REASONS.get(status, 'OK')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode("latin-1") + payload)
+
+
+class LabelServer:
+    def __init__(self, service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.service = service
+        self.host = host
+        self.port = port
+        self._server = None
+        self.requests_served = 0
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        # port=0 picks a free port; report the real one
+        self.port = self._server.sockets[0].getsockname()[1]
+        logging.info(f"Label service listening on {self.host}:{self.port}")
+        return self
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def serve_forever(self):
+        if not self._server:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _dispatch(self, method, target, body):
+        parts = urlsplit(target)
+        if parts.path == "/health":
+            return 200, "application/json", _json_bytes({'ok': True, 'remedies': len(self.service.catalog),
+                                                         'render_cache': self.service.render_cache.stats()})
+        if parts.path == "/suggest":
+            if method != "GET":
+                raise _HttpError(405, "use GET")
+            query = parse_qs(parts.query)
+            text = query.get('q', [''])[0]
+            limit = _int_param(query.get('limit', ['50'])[0] or 0, "limit")
+            if limit < 1:
+                raise _HttpError(400, f"limit must be at least 1, got {limit}")
+            return 200, "application/json", _json_bytes({'results': self.service.suggest(text, limit=limit)})
+        if parts.path == "/render":
+            if method != "POST":
+                raise _HttpError(405, "use POST")
+            try:
+                job = json.loads(body.decode("utf-8") or "{}")
+            except ValueError:
+                raise _HttpError(400, "body must be JSON")
+            if not isinstance(job, dict):
+                raise _HttpError(400, "body must be a JSON object")
+            job['copies'] = _int_param(job.get('copies', 1) or 1, "copies")
+            if job.get('format', 'pdf') not in RENDER_FORMATS:
+                raise _HttpError(400, f"format must be one of {', '.join(RENDER_FORMATS)}, got {job['format']!r}")
+            if 'dpi' in job:
+                job['dpi'] = _int_param(job['dpi'], "dpi")
+                if not 100 <= job['dpi'] <= 600:
+                    raise _HttpError(400, f"dpi must be between 100 and 600, got {job['dpi']}")
+            try:
+                self.service.geometry(job)
+            except ValueError as e:
+                raise _HttpError(400, str(e))
+            # reportlab is CPU bound; keep the event loop free for other counters
+            loop = asyncio.get_running_loop()
+            content_type, payload = await loop.run_in_executor(None, self.service.render, job)
+            return 200, content_type, payload
+        raise _HttpError(404, f"unknown path {parts.path}")
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except _HttpError as e:
+                    _write_response(writer, e.status, "application/json", _json_bytes({'error': str(e)}), False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != "close"
+                try:
+                    status, content_type, payload = await self._dispatch(method, target, body)
+                except _HttpError as e:
+                    status, content_type, payload = e.status, "application/json", _json_bytes({'error': str(e)})
+                except Exception as e:
+                    logging.exception("label service request failed")
+                    status, content_type, payload = 500, "application/json", _json_bytes({'error': str(e)})
+                _write_response(writer, status, content_type, payload, keep_alive)
+                await writer.drain()
+                self.requests_served += 1
+                if not keep_alive:
+                    break
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+
+class LoopbackClient:
+    # Keeps a single connection open and reuses it for every request
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+
+    async def connect(self):
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        return self
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except Exception:
+                pass
+            self._reader = self._writer = None
+
+    async def request(self, method, target, body=b""):
+        await self.connect()
+        head = (f"{method} {target} HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n")
+        self._writer.write(head.encode("latin-1") + body)
+        await self._writer.drain()
+        status_line = await self._reader.readline()
+        if not status_line:
+            await self.close()
+            raise ConnectionError("label service closed the connection")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        payload = await self._reader.readexactly(int(headers.get('content-length', 0) or 0))
+        if headers.get('connection', '').lower() == "close":
+            await self.close()
+        if status != 200:
+            raise RuntimeError(f"label service returned {status}: {payload.decode('utf-8', 'ignore')}")
+        return headers.get('content-type', ''), payload
+
+    async def suggest(self, text, limit=50):
+        _, payload = await self.request("GET", "/suggest?" + urlencode({'q': text, 'limit': limit}))
+        return json.loads(payload)['results']
+
+    async def render(self, job):
+        _, payload = await self.request("POST", "/render", _json_bytes(job))
+        return payload
+
+
+SAMPLE_JOB = {'medicine': 'Arnica montana', 'potency': '30C', 'dose': '4 pills',
+              'time': 'Twice daily', 'shop': 'Homeo Mahanagar', 'branch': 'Main Branch 98300 00000'}
+
+
+async def run_load_test(host, port, clients=8, requests_per_client=100, render_every=5):
+    # Every client sends suggestion queries and, every `render_every` requests, a full render
+    queries = ["a", "ar", "arn", "bry", "bell", "mont", "alba"]
+    latencies = []
+
+    async def one_client(n):
+        client = await LoopbackClient(host, port).connect()
+        try:
+            for i in range(requests_per_client):
+                start = time.perf_counter()
+                if render_every and i % render_every == 0:
+                    await client.render(SAMPLE_JOB)
+                else:
+                    await client.suggest(queries[(n + i) % len(queries)], limit=20)
+                latencies.append((time.perf_counter() - start) * 1000.0)
+        finally:
+            await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_client(n) for n in range(clients)))
+    elapsed = time.perf_counter() - start
+    summary = summarize_latencies(latencies)
+    summary['requests_per_sec'] = round(len(latencies) / elapsed, 1) if elapsed else 0.0
+    return summary
+
+
+async def _bench(args):
+    service = LabelService.from_remedies_file(args.remedies, render_cache=RenderCache(args.cache_dir),
+                                              profiles=ProfileStore(args.profiles))
+    server = await LabelServer(service, args.host, 0).start()
+    try:
+        summary = await run_load_test(args.host, server.port, clients=args.clients,
+                                      requests_per_client=args.requests)
+    finally:
+        await server.stop()
+    print(json.dumps(summary, indent=2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared label rendering / suggestion service")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--remedies", default="remedies.xlsx")
+    parser.add_argument("--cache-dir", help="keep rendered labels on disk here (memory-only when omitted)")
+    parser.add_argument("--profiles", help="label_profiles.json with custom stock and printer assignments")
+    parser.add_argument("--bench", action="store_true", help="start on a free port and run a loopback load test")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100, help="requests per client in --bench mode")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.bench:
+        asyncio.run(_bench(args))
+        return 0
+    service = LabelService.from_remedies_file(args.remedies, render_cache=RenderCache(args.cache_dir),
+                                              profiles=ProfileStore(args.profiles))
+    try:
+        asyncio.run(LabelServer(service, args.host, args.port).serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+# snapshot.py
+"""
+Warm-start snapshot: everything a launch used to rebuild, in one versioned file
+- the prebuilt CatalogIndex (normalized keys, trigram postings, rows, aliases)
+- autocomplete lists, last printer list + selected printer, last window geometry
+- the (mtime, size) of remedies.xlsx / autocomplete.json it was built from
+
+Written on clean exit and on a timer by the GUI; loaded with one mmap, the NumPy
+arrays are views straight into the mapping (no parse, no copy). A part whose
+source file changed since the snapshot is rebuilt cold; the rest is used as is.
+
+File layout:  b"HLSNAP\\0\\0" | u32 version | u32 header length | JSON header | arrays
+Each array starts on a 64-byte boundary; the header lists dtype / shape / offset.
+Every save goes to a new warm_start-<ns>.snap (a mapped file can't be replaced on
+Windows), older ones are removed when they are no longer mapped. A failed save
+removes its .tmp file; remove_stale_temp_files() sweeps the ones a crash left.
+
+Bench: python -m homeolabel.snapshot --bench --rows 20000
+"""
+import os
+import sys
+import glob
+import json
+import mmap
+import time
+import struct
+import logging
+import argparse
+
+import numpy as np
+
+from homeolabel.catalog import CatalogIndex, load_remedies_frame
+
+SNAPSHOT_VERSION = 1
+_MAGIC = b"HLSNAP\0\0"
+_HEAD = struct.Struct("<8sII")
+_ALIGN = 64
+_PREFIX = "warm_start-"
+_SUFFIX = ".snap"
+_CATALOG = "catalog."
+_TMP = ".tmp"
+STALE_TMP_SECONDS = 600  # far longer than any save; a younger .tmp may be another instance's write
+
+
+def source_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+class Snapshot:
+    def __init__(self, path, header, arrays):
+        self.path = path
+        self.header = header
+        self.arrays = arrays
+        self.state = header.get('state', {})
+        self.sources = header.get('sources', {})
+
+    def fresh(self, name, path):
+        # True when `path` is unchanged since the snapshot recorded it as `name`
+        return name in self.sources and self.sources[name] == source_stamp(path)
+
+    def catalog_index(self):
+        arrays = {k[len(_CATALOG):]: v for k, v in self.arrays.items() if k.startswith(_CATALOG)}
+        if not arrays:
+            return None
+        return CatalogIndex.from_arrays(arrays)
+
+
+def _snapshot_files(directory):
+    return sorted(glob.glob(os.path.join(directory, _PREFIX + "*" + _SUFFIX)), reverse=True)
+
+
+def save_snapshot(directory, sources, state, index=None, keep=1):
+    # sources: {name: source_stamp(path) taken when that data was loaded}; state: JSON-able dict.
+    # Returns the new file's path.
+    os.makedirs(directory, exist_ok=True)
+    arrays = {}
+    if index is not None:
+        arrays = {_CATALOG + k: np.ascontiguousarray(v) for k, v in index.to_arrays().items()}
+    layout = {}
+    offset = 0
+    for name, arr in arrays.items():
+        layout[name] = {'dtype': arr.dtype.str, 'shape': list(arr.shape), 'offset': offset}
+        offset += -(-arr.nbytes // _ALIGN) * _ALIGN
+    header = {'version': SNAPSHOT_VERSION, 'created': time.time(), 'sources': dict(sources),
+              'state': state, 'arrays': layout}
+    blob = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    data_start = -(-(_HEAD.size + len(blob)) // _ALIGN) * _ALIGN
+    path = os.path.join(directory, f"{_PREFIX}{time.time_ns()}{_SUFFIX}")
+    tmp = path + _TMP
+    try:
+        with open(tmp, "wb") as f:
+            f.write(_HEAD.pack(_MAGIC, SNAPSHOT_VERSION, len(blob)))
+            f.write(blob)
+            for name, arr in arrays.items():
+                f.write(b"\0" * (data_start + layout[name]['offset'] - f.tell()))
+                f.write(arr.view(np.uint8).data if arr.size else b"")
+            f.write(b"\0" * (data_start + offset - f.tell()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        # Disk full, no permission...: don't leave a half-written file behind
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    for old in _snapshot_files(directory)[keep:]:
+        try:
+            os.remove(old)
+        except OSError:
+            pass  # still mapped by a running instance (Windows); next save retries
+    return path
+
+
+def remove_stale_temp_files(directory, max_age=STALE_TMP_SECONDS):
+    # Half-written snapshots left by a crash or power cut; returns how many were removed
+    removed = 0
+    now = time.time()
+    for path in glob.glob(os.path.join(directory, _PREFIX + "*" + _SUFFIX + _TMP)):
+        try:
+            if now - os.path.getmtime(path) >= max_age:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, header_len = _HEAD.unpack_from(mm, 0)
+    if magic != _MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError(f"not a version {SNAPSHOT_VERSION} snapshot")
+    header = json.loads(bytes(mm[_HEAD.size:_HEAD.size + header_len]).decode("utf-8"))
+    data_start = -(-(_HEAD.size + header_len) // _ALIGN) * _ALIGN
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        shape = tuple(spec['shape'])
+        count = int(np.prod(shape)) if shape else 1
+        if count == 0:
+            arrays[name] = np.empty(shape, dtype=dtype)
+        else:
+            # Read-only views into the mapping; the arrays keep the mapping alive
+            arrays[name] = np.frombuffer(mm, dtype=dtype, count=count,
+                                         offset=data_start + spec['offset']).reshape(shape)
+    return Snapshot(path, header, arrays)
+
+
+def load_snapshot(directory):
+    # Newest readable snapshot in `directory`, or None
+    for path in _snapshot_files(directory):
+        try:
+            return _read(path)
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable snapshot {path}: {e}")
+    return None
+
+
+# ---------------- cold vs warm benchmark ----------------
+def _write_sample_sources(work_dir, rows):
+    import pandas as pd
+    from homeolabel.batch import sample_jobs
+    names = [job[0] for job in sample_jobs(200)]
+    common = [f"{names[i % len(names)]} {i}" for i in range(rows)]
+    df = pd.DataFrame({'latin_col': [f"{c} latina" for c in common], 'common_col': common,
+                       'alias_col': [f"{c[:3]}-{i}; {c.split()[0]} {i}" if i % 4 == 0 else ""
+                                     for i, c in enumerate(common)]})
+    remedies = os.path.join(work_dir, "remedies.xlsx")
+    df.to_excel(remedies, index=False, engine="openpyxl")
+    autocomplete = os.path.join(work_dir, "autocomplete.json")
+    with open(autocomplete, "w") as f:
+        json.dump({'potency': ["6C", "30C", "200C", "1M"], 'dose': ["4 pills"], 'time': ["Twice daily"],
+                   'shop': ["Homeo Mahanagar"], 'branch': [f"Branch {i}" for i in range(1, 8)]}, f)
+    return remedies, autocomplete
+
+
+def benchmark(rows=20000, repeat=3, work_dir=None):
+    import shutil
+    import tempfile
+    work_dir = work_dir or tempfile.mkdtemp(prefix="label_snapshot_bench_")
+    try:
+        remedies, autocomplete = _write_sample_sources(work_dir, rows)
+        sources = {'remedies': source_stamp(remedies), 'autocomplete': source_stamp(autocomplete)}
+        snap_dir = os.path.join(work_dir, "warm_start")
+
+        cold = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            index = CatalogIndex.from_dataframe(load_remedies_frame(remedies, create=False))
+            with open(autocomplete) as f:
+                state = {'autocomplete': json.load(f), 'printers': ["Label Printer"], 'printer': "Label Printer"}
+            cold.append((time.perf_counter() - start) * 1000.0)
+        path = save_snapshot(snap_dir, sources, state, index)
+
+        warm = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            snap = load_snapshot(snap_dir)
+            assert snap.fresh('remedies', remedies) and snap.fresh('autocomplete', autocomplete)
+            warm_index = snap.catalog_index()
+            warm_state = snap.state
+            warm.append((time.perf_counter() - start) * 1000.0)
+        same = (warm_index.search_matches("nux 1") == index.search_matches("nux 1")
+                and warm_state['autocomplete'] == state['autocomplete'])
+        return {'rows': rows, 'cold_ms': round(min(cold), 1), 'warm_ms': round(min(warm), 1),
+                'speedup': round(min(cold) / min(warm), 1) if min(warm) else 0.0,
+                'snapshot_mb': round(os.path.getsize(path) / (1024 * 1024), 2), 'same_results': same}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm-start snapshot tools")
+    parser.add_argument("--bench", action="store_true", help="cold (xlsx) vs warm (snapshot) start")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--info", metavar="DIR", help="print the header of the newest snapshot in DIR")
+    args = parser.parse_args(argv)
+    if args.info:
+        snap = load_snapshot(args.info)
+        if snap is None:
+            print("no snapshot")
+            return 1
+        print(json.dumps({'path': snap.path, **{k: v for k, v in snap.header.items() if k != 'state'},
+                          'state_keys': sorted(snap.state)}, indent=2))
+        return 0
+    if args.bench:
+        print(json.dumps(benchmark(args.rows)))
+        return 0
+    parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
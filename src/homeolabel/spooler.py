@@ -0,0 +1,418 @@
+# spooler.py
+"""
+Asyncio print spooler
+- One queue per printer, bounded in-flight jobs per printer
+- Each attempt runs the blocking backend in that printer's own thread pool, so a
+  stuck printer only ties up its own queue
+- Per-attempt timeout, exponential backoff between retries, dead-letter list for
+  jobs that used up their retries
+- Only a confirmed failure is retried: the backend raised, or the attempt timed
+  out before its thread even started. A call that timed out while running may
+  still print, so that job is marked unconfirmed (PrintUncertain, kept in
+  `unconfirmed`) and never retried or moved; if the call returns later the job
+  is updated and counted as late
+- metrics(): queue depth / in-flight / completed / retried / dead per printer
+- Printer pools (add_pool, see printerpool.py): a job submitted to a pool's name
+  goes to the least-loaded healthy member; a confirmed failure moves the job, and
+  the pool jobs queued behind it, to the other members instead of retrying there
+
+Backends are plain objects with print_job(job) that block until the job is
+spooled and raise on failure. PdfPrinterBackend wraps the existing
+ShellExecute -> Sumatra -> GDI chain; FakePrinter is a stand-in for tests that
+can be told to stall or fail.
+
+BackgroundSpooler runs the spooler loop on a daemon thread for the Qt app.
+"""
+import time
+import random
+import asyncio
+import logging
+import itertools
+import threading
+import concurrent.futures
+
+from homeolabel.printing import print_pdf_to_printer, print_label_direct, PrintStartedError
+from homeolabel.render import BASE_PRINT_FONT
+
+_job_ids = itertools.count(1)
+
+
+class PrintJob:
+    def __init__(self, printer, pdf_path=None, fitlines=None, copies=1, label="", geometry=None):
+        self.job_id = next(_job_ids)
+        self.printer = printer
+        self.pdf_path = pdf_path
+        self.fitlines = fitlines
+        self.copies = copies
+        self.geometry = geometry  # label stock for the GDI / RAW routes (None: default profile)
+        self.label = label
+        self.attempts = 0
+        self.errors = []
+        self.route = None
+        self.state = "queued"  # -> printed / dead / unconfirmed (a late reply can still make it printed)
+        self.pool = None  # set when submitted to a printer pool; self.printer is then the member chosen
+        self.created = time.monotonic()
+        self.finished = None
+
+    def __repr__(self):
+        return f"PrintJob(#{self.job_id} -> {self.printer!r}, attempts={self.attempts})"
+
+
+class PrintTimeout(Exception):
+    # The attempt never reached the printer (its threads were all busy); safe to retry
+    pass
+
+
+class PrintUncertain(Exception):
+    # The job may or may not have printed (timed out mid-call, or the helper stopped answering
+    # after it got the job); retrying could print it twice, so a person has to check
+    pass
+
+
+class PdfPrinterBackend:
+    # Existing chain: ShellExecute(printto) / Sumatra, then GDI with the fitted lines
+    def __init__(self, base_font_size=BASE_PRINT_FONT, wait_seconds=2):
+        self.base_font_size = base_font_size
+        self.wait_seconds = wait_seconds
+
+    def print_job(self, job):
+        # A route that failed after reaching the spooler (PrintStartedError) is not followed by another
+        try:
+            print_pdf_to_printer(job.pdf_path, job.printer, wait_seconds=self.wait_seconds)
+            return "pdf"
+        except PrintStartedError as e:
+            raise PrintUncertain(str(e)) from e
+        except Exception as e_pdf:
+            logging.warning(f"PDF->printer failed: {e_pdf}")
+            if not job.fitlines:
+                raise
+            try:
+                print_label_direct(job.printer, job.fitlines, base_font_size=self.base_font_size,
+                                   geometry=job.geometry, copies=job.copies)
+                return "gdi"
+            except PrintStartedError as e:
+                raise PrintUncertain(f"PDF error: {e_pdf} GDI error: {e}") from e
+            except Exception as e_gdi:
+                raise RuntimeError(f"PDF error: {e_pdf} GDI error: {e_gdi}")
+
+
+class FakePrinter:
+    # Records jobs instead of printing; stall() blocks print_job until resume()
+    def __init__(self, name="fake", delay=0.0):
+        self.name = name
+        self.delay = delay
+        self.jobs = []
+        self._fail_next = 0
+        self._gate = threading.Event()
+        self._gate.set()
+        self._lock = threading.Lock()
+
+    def fail_next(self, count=1):
+        with self._lock:
+            self._fail_next += count
+
+    def stall(self):
+        self._gate.clear()
+
+    def resume(self):
+        self._gate.set()
+
+    def print_job(self, job):
+        self._gate.wait()
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            if self._fail_next > 0:
+                self._fail_next -= 1
+                raise RuntimeError(f"{self.name}: simulated failure")
+            self.jobs.append(job)
+        return "fake"
+
+
+class _PrinterQueue:
+    def __init__(self, name, backend, max_in_flight):
+        self.name = name
+        self.backend = backend
+        self.queue = asyncio.Queue()
+        # +1 thread so one timed-out (still blocked) call does not starve the next attempt
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_in_flight + 1,
+                                                              thread_name_prefix=f"spool-{name}")
+        self.workers = []
+        self.in_flight = 0
+        self.stats = {'submitted': 0, 'completed': 0, 'failed_attempts': 0,
+                      'retried': 0, 'timeouts': 0, 'dead': 0, 'unconfirmed': 0, 'late_printed': 0,
+                      'late_failed': 0}
+
+
+class PrintSpooler:
+    def __init__(self, backend_for_printer, max_in_flight=1, timeout=45.0, max_retries=3,
+                 backoff_base=0.5, backoff_max=8.0, jitter=0.1):
+        # backend_for_printer: a backend shared by all printers, or callable(printer_name) -> backend
+        if hasattr(backend_for_printer, 'print_job'):
+            shared = backend_for_printer
+            backend_for_printer = lambda _name: shared
+        self._backend_for_printer = backend_for_printer
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self.dead_letters = []
+        self.unconfirmed = []
+        self.pools = {}
+        self._printers = {}
+        self._futures = {}
+        self._closed = False
+
+    def _printer(self, name):
+        pq = self._printers.get(name)
+        if pq is None:
+            pq = _PrinterQueue(name, self._backend_for_printer(name), self.max_in_flight)
+            for _ in range(self.max_in_flight):
+                pq.workers.append(asyncio.get_running_loop().create_task(self._worker(pq)))
+            self._printers[name] = pq
+        return pq
+
+    def backoff_delay(self, attempt):
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        if self.jitter:
+            delay += random.uniform(0, delay * self.jitter)
+        return delay
+
+    def add_pool(self, pool):
+        # Jobs submitted with printer == pool.name are balanced over pool.printers (replaces a pool of that name)
+        self.pools[pool.name] = pool
+
+    def remove_pool(self, name):
+        self.pools.pop(name, None)
+
+    async def submit(self, job):
+        # Returns an asyncio future resolved with the job (or its final exception)
+        if self._closed:
+            raise RuntimeError("spooler is closed")
+        pool = self.pools.get(job.printer)
+        if pool is not None:
+            job.pool = pool.name
+            job.printer = pool.pick(self.queue_depth)
+            pool.assigned(job.printer)
+        pq = self._printer(job.printer)
+        future = asyncio.get_running_loop().create_future()
+        self._futures[job.job_id] = future
+        pq.stats['submitted'] += 1
+        await pq.queue.put(job)
+        return future
+
+    async def _attempt(self, pq, job):
+        call = pq.executor.submit(pq.backend.print_job, job)
+        try:
+            # shield: a timeout must not detach us from a call that is still running
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(call)), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            pq.stats['timeouts'] += 1
+            if call.cancel():
+                raise PrintTimeout(f"printer '{pq.name}' busy: attempt not started within {self.timeout}s")
+            self._watch_late(pq, job, call)
+            raise PrintUncertain(f"printer '{pq.name}' did not finish within {self.timeout}s; "
+                                 f"the label may still print")
+
+    def _watch_late(self, pq, job, call):
+        # The stalled call keeps its thread; record what it finally did
+        loop = asyncio.get_running_loop()
+
+        def _finished(f):
+            error = f.exception()
+            if error is None:
+                job.route, job.state = f.result(), "printed"
+                pq.stats['late_printed'] += 1
+                logging.warning(f"{job!r} printed late on '{pq.name}' (was unconfirmed)")
+            else:
+                pq.stats['late_failed'] += 1
+                logging.warning(f"{job!r} failed late on '{pq.name}': {error}")
+        call.add_done_callback(lambda f: loop.call_soon_threadsafe(_finished, f))
+
+    async def _worker(self, pq):
+        while True:
+            job = await pq.queue.get()
+            pq.in_flight += 1
+            try:
+                await self._run_job(pq, job)
+            finally:
+                pq.in_flight -= 1
+                pq.queue.task_done()
+
+    async def _run_job(self, pq, job):
+        future = self._futures.pop(job.job_id, None)
+        pool = self.pools.get(job.pool) if job.pool else None
+        while True:
+            job.attempts += 1
+            started = time.monotonic()
+            try:
+                job.route = await self._attempt(pq, job)
+            except asyncio.CancelledError:
+                raise
+            except PrintUncertain as e:
+                # Neither retried nor moved: that could print the label twice
+                job.errors.append(str(e))
+                job.finished = time.monotonic()
+                job.state = "unconfirmed"
+                pq.stats['unconfirmed'] += 1
+                self.unconfirmed.append(job)
+                del self.unconfirmed[:-1000]
+                logging.error(f"{job!r} unconfirmed: {e}")
+                if future and not future.done():
+                    future.set_exception(e)
+                return
+            except Exception as e:
+                pq.stats['failed_attempts'] += 1
+                job.errors.append(str(e))
+                logging.warning(f"{job!r} attempt {job.attempts} failed: {e}")
+                # A PrintTimeout never reached the printer: it is busy/slow, not broken
+                confirmed = not isinstance(e, PrintTimeout)
+                if pool is not None and confirmed:
+                    pool.record_failure(pq.name)
+                if job.attempts > self.max_retries:
+                    job.finished = time.monotonic()
+                    job.state = "dead"
+                    pq.stats['dead'] += 1
+                    self.dead_letters.append(job)
+                    logging.error(f"{job!r} moved to dead letters after {job.attempts} attempts")
+                    if future and not future.done():
+                        future.set_exception(e)
+                    return
+                pq.stats['retried'] += 1
+                if pool is not None and self._fail_over(pq, pool, job, future, move_waiting=confirmed):
+                    return
+                await asyncio.sleep(self.backoff_delay(job.attempts))
+                continue
+            job.finished = time.monotonic()
+            job.state = "printed"
+            pq.stats['completed'] += 1
+            if pool is not None:
+                pool.record_success(pq.name, job.finished - started)
+            if future and not future.done():
+                future.set_result(job)
+            return
+
+    def _move(self, pool, job, from_pq):
+        # Requeue a pool job on another member; False when no healthy member is left
+        other = pool.pick(self.queue_depth, exclude={from_pq.name})
+        if other is None:
+            return False
+        logging.info(f"{job!r} moved from '{from_pq.name}' to '{other}' (pool '{pool.name}')")
+        job.printer = other
+        pool.assigned(other)
+        pool.moved(from_pq.name)
+        target = self._printer(other)
+        target.stats['submitted'] += 1
+        target.queue.put_nowait(job)
+        return True
+
+    def _fail_over(self, pq, pool, job, future, move_waiting=True):
+        # Move the failed job to another member. Only called once its attempt has returned (or never
+        # started), so it cannot also print here; unconfirmed jobs never get this far.
+        # move_waiting: the printer really failed, so the pool jobs still waiting behind it go too
+        if future is not None:
+            self._futures[job.job_id] = future
+        if not self._move(pool, job, pq):
+            self._futures.pop(job.job_id, None)
+            return False
+        if not move_waiting:
+            return True
+        waiting = []
+        while not pq.queue.empty():
+            waiting.append(pq.queue.get_nowait())
+            pq.queue.task_done()
+        for queued in waiting:
+            if queued.pool != pool.name or not self._move(pool, queued, pq):
+                pq.queue.put_nowait(queued)
+        return True
+
+    async def join(self):
+        for pq in list(self._printers.values()):
+            await pq.queue.join()
+
+    def metrics(self):
+        out = {}
+        for name, pq in self._printers.items():
+            out[name] = dict(pq.stats, queued=pq.queue.qsize(), in_flight=pq.in_flight)
+        return out
+
+    def pool_metrics(self):
+        return {name: pool.stats(self.queue_depth) for name, pool in self.pools.items()}
+
+    def queue_depth(self, printer):
+        pq = self._printers.get(printer)
+        return (pq.queue.qsize() + pq.in_flight) if pq else 0
+
+    async def close(self):
+        self._closed = True
+        for pq in self._printers.values():
+            for task in pq.workers:
+                task.cancel()
+            await asyncio.gather(*pq.workers, return_exceptions=True)
+            pq.executor.shutdown(wait=False)
+        for future in self._futures.values():
+            if not future.done():
+                future.cancel()
+        self._futures.clear()
+
+
+class BackgroundSpooler:
+    # Owns an event loop on a daemon thread; submit() is safe to call from the Qt thread
+    def __init__(self, backend_for_printer, **spooler_kwargs):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="print-spooler", daemon=True)
+        self._thread.start()
+        self.spooler = self._call(self._make_spooler(backend_for_printer, spooler_kwargs))
+
+    async def _make_spooler(self, backend_for_printer, kwargs):
+        return PrintSpooler(backend_for_printer, **kwargs)
+
+    def _call(self, coro, timeout=None):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def submit(self, job):
+        # Returns a concurrent.futures.Future resolved when the job is spooled or dead-lettered
+        done = concurrent.futures.Future()
+
+        async def _submit():
+            inner = await self.spooler.submit(job)
+
+            def _relay(f):
+                if f.cancelled():
+                    done.cancel()
+                elif f.exception() is not None:
+                    done.set_exception(f.exception())
+                else:
+                    done.set_result(f.result())
+            inner.add_done_callback(_relay)
+
+        self._call(_submit(), timeout=5)
+        return done
+
+    def metrics(self):
+        return self._call(self._metrics(), timeout=5)
+
+    async def _metrics(self):
+        return self.spooler.metrics()
+
+    def add_pool(self, pool):
+        self._loop.call_soon_threadsafe(self.spooler.add_pool, pool)
+
+    def remove_pool(self, name):
+        self._loop.call_soon_threadsafe(self.spooler.remove_pool, name)
+
+    def pool_metrics(self):
+        return self._call(self._pool_metrics(), timeout=5)
+
+    async def _pool_metrics(self):
+        return self.spooler.pool_metrics()
+
+    def shutdown(self, timeout=5):
+        try:
+            self._call(self.spooler.close(), timeout=timeout)
+        except Exception:
+            logging.exception("spooler shutdown failed")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
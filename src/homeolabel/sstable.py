@@ -0,0 +1,385 @@
+# sstable.py
+"""
+Memory-mapped sorted string table for very large remedy catalogs (500k+ rows)
+- One key per word start of every name (common, latin, each alias), normalized with
+  catalog.normalize_key and stored as sorted UTF-8 bytes: "nux vomica" gives
+  "nux vomica" and "vomica", so "vom" finds Nux vomica
+- Each key points at a record (common / latin / aliases, UTF-8) in a record block
+- Lookup is a binary search for the query prefix straight over the mapped file;
+  only the pages a query touches become resident and opening the table parses
+  nothing, so a low-RAM counter PC never holds the catalog as Python objects
+- StringTable.search_matches / search answer like CatalogIndex, but match word
+  prefixes (not arbitrary substrings) and return hits in key order; has_name
+  checks an exact name with the same binary search (adding a medicine)
+
+File layout:  b"HLSST\\0\\0\\0" | u32 version | u32 header length | JSON header | sections
+Sections (64-byte aligned, listed in the header): key_offsets u64[n+1], key_blob,
+key_record u32[n], key_name u8[n] (0 common, 1 latin, 2+ alias), record_offsets
+u64[m+1], record_blob ("common\\x1flatin\\x1falias..."). The header also keeps the
+(mtime, size) of the remedies.xlsx it was built from.
+
+The GUI switches to a table in records/catalog_table/ once remedies.xlsx has
+LARGE_CATALOG_ROWS rows (HOMEOLABEL_LARGE_CATALOG_ROWS overrides the 200000
+default). The switch changes what the medicine search matches - word starts
+instead of any substring ("vom" still finds Nux vomica, "omica" no longer
+does) - so the search box says which mode is active (StringTable.match_mode).
+
+Build: python -m homeolabel.sstable build remedies.xlsx records/catalog_table/remedies-1.sst
+Query: python -m homeolabel.sstable query records/catalog_table/remedies-1.sst "nux v"
+Bench: python -m homeolabel.sstable bench --rows 500000
+"""
+import os
+import sys
+import glob
+import json
+import mmap
+import time
+import bisect
+import struct
+import logging
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from homeolabel.catalog import normalize_key, normalize_series, frame_rows, load_remedies_frame
+
+SSTABLE_VERSION = 1
+_MAGIC = b"HLSST\0\0\0"
+_HEAD = struct.Struct("<8sII")
+_ALIGN = 64
+_RECORD_SEP = "\x1f"
+# Larger catalogs are served from the string table instead of an in-memory index
+LARGE_CATALOG_ROWS = int(os.environ.get("HOMEOLABEL_LARGE_CATALOG_ROWS") or 200000)
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _word_starts(names, rids, kinds):
+    # "nux vomica" -> "nux vomica", "vomica" (each with the name's record id / kind)
+    keys, key_rids, key_kinds = [], [], []
+    for name, rid, kind in zip(names, rids, kinds):
+        if not name:
+            continue
+        start = 0
+        while True:
+            keys.append(name[start:])
+            key_rids.append(rid)
+            key_kinds.append(kind)
+            start = name.find(" ", start) + 1
+            if not start:
+                break
+    return keys, key_rids, key_kinds
+
+
+def build_string_table(records, path, source_path=None):
+    # records: (common, latin, aliases) tuples as from catalog.frame_rows. Written to a
+    # temp file and swapped in, so an open table keeps serving until it is reopened.
+    names, rids, kinds = [], [], []
+    record_parts = []
+    for rid, (common, latin, aliases) in enumerate(records):
+        fields = (common, latin) + tuple(aliases)
+        for kind, name in enumerate(fields[:255]):
+            names.append(name)
+            rids.append(rid)
+            kinds.append(kind)
+        record_parts.append(_RECORD_SEP.join(fields).encode("utf-8"))
+    normalized = normalize_series(pd.Series(names, dtype=object)).tolist() if names else []
+    keys, key_rids, key_kinds = _word_starts(normalized, rids, kinds)
+    key_bytes = np.array([k.encode("utf-8") for k in keys], dtype=bytes) if keys else np.empty(0, dtype="S1")
+    key_rids = np.array(key_rids, dtype=np.uint32)
+    key_kinds = np.array(key_kinds, dtype=np.uint8)
+    order = np.lexsort((key_kinds, key_rids, key_bytes))
+    key_bytes, key_rids, key_kinds = key_bytes[order], key_rids[order], key_kinds[order]
+    # Same key for the same record twice (e.g. common == latin): keep the first (lowest kind)
+    keep = np.ones(len(key_bytes), dtype=bool)
+    keep[1:] = (key_bytes[1:] != key_bytes[:-1]) | (key_rids[1:] != key_rids[:-1])
+    key_bytes, key_rids, key_kinds = key_bytes[keep], key_rids[keep], key_kinds[keep]
+
+    key_list = key_bytes.tolist()
+    key_offsets = np.zeros(len(key_list) + 1, dtype=np.uint64)
+    np.cumsum([len(k) for k in key_list], out=key_offsets[1:])
+    record_offsets = np.zeros(len(record_parts) + 1, dtype=np.uint64)
+    np.cumsum([len(r) for r in record_parts], out=record_offsets[1:])
+    sections = [("key_offsets", key_offsets), ("key_blob", b"".join(key_list)), ("key_record", key_rids),
+                ("key_name", key_kinds), ("record_offsets", record_offsets),
+                ("record_blob", b"".join(record_parts))]
+
+    layout = {}
+    offset = 0
+    for name, data in sections:
+        size = data.nbytes if isinstance(data, np.ndarray) else len(data)
+        layout[name] = {'offset': offset, 'size': size,
+                        'dtype': data.dtype.str if isinstance(data, np.ndarray) else None}
+        offset += -(-size // _ALIGN) * _ALIGN
+    header = {'version': SSTABLE_VERSION, 'keys': len(key_list), 'records': len(record_parts),
+              'source': _stamp(source_path) if source_path else None, 'sections': layout}
+    blob = json.dumps(header).encode("utf-8")
+    data_start = -(-(_HEAD.size + len(blob)) // _ALIGN) * _ALIGN
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEAD.pack(_MAGIC, SSTABLE_VERSION, len(blob)))
+        f.write(blob)
+        for name, data in sections:
+            f.write(b"\0" * (data_start + layout[name]['offset'] - f.tell()))
+            f.write(data.data if isinstance(data, np.ndarray) else data)
+        f.write(b"\0" * (data_start + offset - f.tell()))
+    os.replace(tmp, path)
+    return path
+
+
+class _SortedKeys:
+    # Sequence view of the mapped keys for bisect; items are UTF-8 bytes
+    def __init__(self, table):
+        self.mm = table.mm
+        self.offsets = table.key_offsets
+        self.base = table.key_blob_at
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.mm[self.base + int(self.offsets[i]):self.base + int(self.offsets[i + 1])]
+
+
+class StringTable:
+    match_mode = "word start"
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_len = _HEAD.unpack_from(self.mm, 0)
+        if magic != _MAGIC or version != SSTABLE_VERSION:
+            raise ValueError(f"{path}: not a version {SSTABLE_VERSION} string table")
+        self.header = json.loads(bytes(self.mm[_HEAD.size:_HEAD.size + header_len]).decode("utf-8"))
+        data_start = -(-(_HEAD.size + header_len) // _ALIGN) * _ALIGN
+        sections = self.header['sections']
+        at = {name: data_start + spec['offset'] for name, spec in sections.items()}
+        n_keys, n_records = self.header['keys'], self.header['records']
+        self.key_offsets = np.frombuffer(self.mm, dtype=np.uint64, count=n_keys + 1, offset=at['key_offsets'])
+        self.key_record = np.frombuffer(self.mm, dtype=np.uint32, count=n_keys, offset=at['key_record'])
+        self.key_name = np.frombuffer(self.mm, dtype=np.uint8, count=n_keys, offset=at['key_name'])
+        self.record_offsets = np.frombuffer(self.mm, dtype=np.uint64, count=n_records + 1,
+                                            offset=at['record_offsets'])
+        self.key_blob_at = at['key_blob']
+        self.record_blob_at = at['record_blob']
+        self._keys = _SortedKeys(self)
+
+    def fresh(self, source_path):
+        return self.header.get('source') is not None and self.header['source'] == _stamp(source_path)
+
+    def __len__(self):
+        return self.header['records']
+
+    def record(self, rid):
+        start = self.record_blob_at + int(self.record_offsets[rid])
+        end = self.record_blob_at + int(self.record_offsets[rid + 1])
+        return tuple(self.mm[start:end].decode("utf-8").split(_RECORD_SEP))
+
+    def records(self):
+        return [(r[0], r[1], r[2:]) for r in (self.record(i) for i in range(len(self)))]
+
+    def key_range(self, prefix):
+        # [lo, hi) of the keys starting with `prefix` (UTF-8 never contains 0xff)
+        lo = bisect.bisect_left(self._keys, prefix)
+        hi = bisect.bisect_left(self._keys, prefix + b"\xff", lo)
+        return lo, hi
+
+    def has_name(self, name):
+        # True if a remedy's common or latin name, or one of its aliases, normalizes to `name`
+        key = normalize_key(name)
+        if not key or not len(self):
+            return False
+        key_bytes = key.encode("utf-8")
+        lo, hi = self.key_range(key_bytes)
+        # Keys equal to the query sort first in its range; a word start inside a longer name
+        # can be equal too, so the record's names are compared in full
+        for i in range(lo, hi):
+            if self._keys[i] != key_bytes:
+                break
+            fields = self.record(int(self.key_record[i]))
+            if any(normalize_key(field) == key for field in fields):
+                return True
+        return False
+
+    def search_matches(self, text, limit=None):
+        # [(row, matched_alias_or_None)] for keys starting with the normalized query, in key
+        # order, one per remedy; a remedy whose own names match is reported without an alias
+        text = normalize_key(text)
+        if not text or not len(self) or (limit is not None and limit < 1):
+            return []
+        lo, hi = self.key_range(text.encode("utf-8"))
+        if lo >= hi:
+            return []
+        # A short prefix can cover most of the table: with a limit, only a window at the start
+        # of the range is looked at, doubled until it holds enough distinct remedies
+        end = min(hi, lo + max(256, 4 * limit)) if limit else hi
+        while True:
+            rids = self.key_record[lo:end]
+            kinds = self.key_name[lo:end]
+            picked = self._pick(rids, kinds)
+            if not limit or len(picked) >= limit or end >= hi:
+                break
+            end = min(hi, lo + 2 * (end - lo))
+        if limit:
+            picked = picked[:limit]
+        out = []
+        for pos in picked.tolist():
+            fields = self.record(int(rids[pos]))
+            kind = int(kinds[pos])
+            out.append(((fields[0], fields[1]), fields[kind] if kind >= 2 else None))
+        return out
+
+    @staticmethod
+    def _pick(rids, kinds):
+        # One key per record: its best (lowest) name kind, ordered by where its first key sorts
+        _, first_pos = np.unique(rids, return_index=True)
+        best = np.lexsort((kinds, rids))
+        is_first = np.ones(len(best), dtype=bool)
+        is_first[1:] = rids[best][1:] != rids[best][:-1]
+        return best[is_first][np.argsort(first_pos, kind="stable")]
+
+    def search(self, text, limit=None):
+        return [row for row, _ in self.search_matches(text, limit=limit)]
+
+    def close(self):
+        try:
+            self.mm.close()
+        except BufferError:
+            pass  # arrays handed out still reference the mapping; it goes with them
+
+
+def open_string_table(path, source_path):
+    # The table at `path` if it exists and was built from the current `source_path`, else None
+    if not os.path.exists(path):
+        return None
+    try:
+        table = StringTable(path)
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable string table {path}: {e}")
+        return None
+    if not table.fresh(source_path):
+        table.close()
+        return None
+    return table
+
+
+def _table_files(directory):
+    return sorted(glob.glob(os.path.join(directory, "remedies-*.sst")), reverse=True)
+
+
+def latest_string_table(directory, source_path):
+    # Newest table in `directory` if it was built from the current `source_path`
+    files = _table_files(directory)
+    return open_string_table(files[0], source_path) if files else None
+
+
+def write_string_table(directory, records, source_path):
+    # Every build gets a new file (a mapped file can't be replaced on Windows); older
+    # tables are removed once nothing maps them any more
+    os.makedirs(directory, exist_ok=True)
+    path = build_string_table(records, os.path.join(directory, f"remedies-{time.time_ns()}.sst"), source_path)
+    for old in _table_files(directory)[1:]:
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+    return StringTable(path)
+
+
+# ---------------- CLI / benchmark ----------------
+def _sample_records(rows):
+    from homeolabel.batch import sample_jobs
+    names = [job[0] for job in sample_jobs(200)]
+    return [(f"{names[i % len(names)]} {i}", f"{names[i % len(names)]} latina {i}",
+             (f"{names[i % len(names)][:3]}-{i}",) if i % 4 == 0 else ()) for i in range(rows)]
+
+
+def _resident_mb():
+    # (private, file-backed) resident MB. Pages of the mapped table are clean file pages the
+    # OS can drop at any time, so the private figure is what the table really costs.
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f if line.startswith("Rss"))
+        return (round(int(fields['RssAnon'].split()[0]) / 1024, 1),
+                round(int(fields['RssFile'].split()[0]) / 1024, 1))
+    except (OSError, KeyError, ValueError):
+        from homeolabel.timing import peak_rss_bytes
+        peak = peak_rss_bytes()
+        return (round(peak / (1024 * 1024), 1) if peak else None), None
+
+
+def _bench_open_and_query(path, queries):
+    from homeolabel.timing import summarize_latencies
+    before = _resident_mb()
+    start = time.perf_counter()
+    table = StringTable(path)
+    open_ms = (time.perf_counter() - start) * 1000.0
+    samples = []
+    for q in queries:
+        start = time.perf_counter()
+        table.search_matches(q, limit=50)
+        samples.append((time.perf_counter() - start) * 1000.0)
+    after = _resident_mb()
+    growth = [round(b - a, 1) if a is not None and b is not None else None for a, b in zip(before, after)]
+    return {'open_ms': round(open_ms, 3), 'query': summarize_latencies(samples),
+            'private_growth_mb': growth[0], 'mapped_file_growth_mb': growth[1]}
+
+
+def bench(rows=500000, out_dir=None):
+    import shutil
+    import tempfile
+    import multiprocessing
+    import concurrent.futures
+    out_dir = out_dir or tempfile.mkdtemp(prefix="label_sstable_bench_")
+    try:
+        path = os.path.join(out_dir, "remedies.sst")
+        start = time.perf_counter()
+        build_string_table(_sample_records(rows), path)
+        build_s = time.perf_counter() - start
+        queries = ["nux", "arn", "bell", "sulph 12", "calc", "puls", "a", "zz", "vom", "lat"] * 20
+        # Fresh process so the resident-set numbers belong to the table alone
+        ctx = multiprocessing.get_context("spawn")
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            stats = pool.submit(_bench_open_and_query, path, queries).result()
+        stats.update(rows=rows, build_s=round(build_s, 2),
+                     file_mb=round(os.path.getsize(path) / (1024 * 1024), 1))
+        return stats
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sorted string table for large remedy catalogs")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_build = sub.add_parser("build", help="build a table from remedies.xlsx")
+    p_build.add_argument("remedies")
+    p_build.add_argument("out")
+    p_query = sub.add_parser("query", help="prefix lookup")
+    p_query.add_argument("table")
+    p_query.add_argument("text")
+    p_query.add_argument("--limit", type=int, default=20)
+    p_bench = sub.add_parser("bench", help="build + open + query timings, resident set growth")
+    p_bench.add_argument("--rows", type=int, default=500000)
+    args = parser.parse_args(argv)
+    if args.cmd == "build":
+        build_string_table(frame_rows(load_remedies_frame(args.remedies, create=False)), args.out,
+                           source_path=args.remedies)
+        print(json.dumps(StringTable(args.out).header, indent=2))
+    elif args.cmd == "query":
+        for (common, latin), alias in StringTable(args.table).search_matches(args.text, limit=args.limit):
+            print(f"{common}\t{latin}" + (f"\t({alias})" if alias else ""))
+    else:
+        print(json.dumps(bench(args.rows)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
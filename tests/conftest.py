@@ -5,6 +5,11 @@ import shutil
 import subprocess
 import pytest
 
+# The package lives in src/ (no install step): make `import homeolabel` work from the repo root
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
 env = os.getenv("SKIP_WIN32")
 if env is None:
     skip_win32 = not sys.platform.startswith("win")
@@ -12,6 +17,10 @@ else:
     skip_win32 = str(env).lower() in ("1", "true", "yes")
 
 
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: long-running (soak) tests; deselect with -m \"not slow\"")
+
+
 def pytest_collection_modifyitems(config, items):
     if skip_win32:
         for item in list(items):
@@ -19,6 +28,14 @@ def pytest_collection_modifyitems(config, items):
                 item.add_marker(pytest.mark.skip(reason="win32 tests skipped on this runner"))
 
 
+@pytest.fixture
+def qapp():
+    # One QApplication per process, offscreen unless a display was set up
+    QtWidgets = pytest.importorskip("PyQt5.QtWidgets")
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
 _xvfb_proc = None
 
 
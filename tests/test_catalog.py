@@ -0,0 +1,85 @@
+# tests/test_catalog.py
+import random
+
+import pandas as pd
+
+from homeolabel.catalog import CatalogIndex, normalize_key, normalize_series
+
+ROWS = [("Nux vomica", "Strychnos nux-vomica"), ("Arnica", "Arnica montana"), ("Café", "Coffea cruda"),
+        ("Natrum mur.", "Natrum muriaticum"), ("Hepar sulph", "Hepar sulphuris calcareum"),
+        ("Kali bich", "Kalium bichromicum"), ("Cantharis", "Lytta vesicatoria")]
+ALIASES = [("Nux vom", "Nux-v"), (), ("Coffea",), ("Nat. mur", "Nat-m"), (), ("Kali-bi",), ("Spanish fly",)]
+TEXTS = ["Café", "CAFÉ", "café", "Naïve  Çédille", "Straße", "Nux-vomica", "Nat. mur.", "Hepar_sulph",
+         "  tabs\tand\nnewlines  ", "!!!", "", "Ærø", "ℌ𝔢𝔭𝔞𝔯", "हिन्दी", "Ä–B—C", "1M / 200C"]
+
+
+def _per_row(rows, aliases, text, limit=None):
+    # The matching before vectorization: every row checked in a Python loop, names before aliases
+    text = normalize_key(text)
+    if not text or (limit is not None and limit < 1):
+        return []
+    out = []
+    for row, names in zip(rows, aliases):
+        if text in normalize_key(row[0]) + "\n" + normalize_key(row[1]):
+            out.append((row, None))
+        else:
+            alias = next((name for name in names if text in normalize_key(name)), None)
+            if alias is None:
+                continue
+            out.append((row, alias))
+        if limit is not None and len(out) >= limit:
+            break
+    return out
+
+
+def test_normalize_series_matches_normalize_key():
+    assert normalize_series(pd.Series(TEXTS)).tolist() == [normalize_key(t) for t in TEXTS]
+    assert normalize_key("CAFÉ") == normalize_key("cafe") == "cafe"
+    assert normalize_key("Nat. mur.") == "nat mur" and normalize_key("Hepar_sulph") == "hepar sulph"
+    assert normalize_key("Straße") == "strasse" and normalize_key("!!!") == ""
+
+
+def test_accents_and_punctuation_match_either_way():
+    index = CatalogIndex(ROWS, aliases=ALIASES)
+    assert index.search("cafe") == index.search("CAFÉ") == [("Café", "Coffea cruda")]
+    assert index.search("nux-vomica") == [("Nux vomica", "Strychnos nux-vomica")]
+    assert index.search_matches("nat. mur") == [(("Natrum mur.", "Natrum muriaticum"), "Nat. mur")]
+    assert index.search_matches("SPANISH-FLY") == [(("Cantharis", "Lytta vesicatoria"), "Spanish fly")]
+    # The remedy's own names match too: no alias is reported
+    assert index.search_matches("kali-bi") == [(("Kali bich", "Kalium bichromicum"), None)]
+    # A query never spans the two names of a remedy
+    assert index.search("vomica strychnos") == []
+
+
+def test_empty_queries_and_limits():
+    index = CatalogIndex(ROWS, aliases=ALIASES)
+    for text in ("", "   ", "!!", "-.-"):
+        assert index.search_matches(text) == []
+    assert len(index.search("a")) == len(ROWS)
+    assert index.search("a", limit=2) == index.search("a")[:2]
+    assert index.search("a", limit=100) == index.search("a")
+    assert index.search("a", limit=0) == [] and index.search("arnica", limit=0) == []
+    assert index.search("a", limit=None) == index.search("a")
+    assert CatalogIndex([]).search("a") == []
+
+
+def test_vectorized_matches_per_row_matching():
+    rng = random.Random(31)
+    letters = "aeiounrstlcmhv" + "éèñüç" + " -.'"
+
+    def name():
+        return "".join(rng.choice(letters) for _ in range(rng.randint(1, 14))).strip() or "x"
+
+    rows = [(name().title(), name()) for _ in range(400)]
+    aliases = [tuple(name() for _ in range(rng.randint(0, 2))) for _ in rows]
+    index = CatalogIndex(rows, aliases=aliases)
+    queries = ["", " ", ".", "-", "a", "É", "ne", "n-", "e r", "an.", "ç"]
+    for _ in range(200):
+        row = rng.choice(rows + [a for names in aliases for a in names if names] or rows)
+        text = row if isinstance(row, str) else rng.choice(row)
+        start = rng.randrange(len(text))
+        queries.append(text[start:start + rng.randint(1, 6)])
+    queries += [name() for _ in range(50)]
+    for text in queries:
+        for limit in (None, 0, 1, 5):
+            assert index.search_matches(text, limit=limit) == _per_row(rows, aliases, text, limit), (text, limit)
@@ -0,0 +1,41 @@
+# tests/test_catalogimport.py
+import pandas as pd
+
+from homeolabel.catalogimport import count_rows, import_catalog
+
+SUPPLIER = ('Common Name;Latin Name;Synonyms\n'
+            'Arnica;Arnica montana;\n'
+            '"Nux\nvomica";Strychnos nux-vomica;Nux v\n'
+            '\n'
+            'Bryonia;"Bryonia alba; white bryony";\n'
+            'ARNICA;  arnica montana ;\n'
+            'Belladonna;Arnica montana;\n'
+            ';;\n')
+
+
+def _remedies(tmp_path):
+    path = tmp_path / "remedies.xlsx"
+    pd.DataFrame({'latin_col': ["Arnica montana"], 'common_col': ["Arnica"]}).to_excel(path, index=False)
+    return str(path)
+
+
+def test_count_rows_counts_records_not_lines(tmp_path):
+    supplier = tmp_path / "supplier.csv"
+    supplier.write_text(SUPPLIER, encoding="utf-8")
+    assert SUPPLIER.count("\n") - 1 == 8  # what a line count would report
+    assert count_rows(str(supplier)) == 6
+    seen = []
+    result, _ = import_catalog(str(supplier), _remedies(tmp_path), dry_run=True,
+                               progress=lambda done, total, rate: seen.append((done, total)))
+    assert result.read == 6 and seen[-1] == (6, 6)
+
+
+def test_import_classifies_and_writes_once(tmp_path):
+    supplier = tmp_path / "supplier.csv"
+    supplier.write_text(SUPPLIER, encoding="utf-8")
+    remedies = _remedies(tmp_path)
+    result, frame = import_catalog(str(supplier), remedies, report_path=str(tmp_path / "conflicts.csv"))
+    assert [common for common, _, _ in result.added] == ["Nux vomica", "Bryonia"]
+    assert result.duplicates == 2 and result.invalid == 1
+    assert [c['reason'] for c in result.conflicts] == ["latin name already used by another remedy"]
+    assert result.written and list(pd.read_excel(remedies)['common_col']) == list(frame['common_col'])
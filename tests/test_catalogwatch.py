@@ -0,0 +1,138 @@
+# tests/test_catalogwatch.py
+import pandas as pd
+
+from homeolabel.catalog import CatalogIndex
+from homeolabel.catalogwatch import CatalogWatcher
+
+ROWS = [("Arnica", "Arnica montana"), ("Bryonia", "Bryonia alba")]
+
+
+def _frame(rows):
+    return pd.DataFrame({'common_col': [r[0] for r in rows], 'latin_col': [r[1] for r in rows]})
+
+
+class _Source:
+    # remedies.xlsx stand-in: every write changes the file's size (and so its stamp);
+    # the loader returns the rows of the last write, or raises once if told to
+    def __init__(self, path, rows):
+        self.path = path
+        self.rows = list(rows)
+        self.loads = 0
+        self.fail_next = None
+        self.on_load = None
+        self.write(rows)
+
+    def write(self, rows):
+        self.rows = list(rows)
+        with open(self.path, "ab") as f:
+            f.write(b"x")
+
+    def load(self, path):
+        assert path == self.path
+        self.loads += 1
+        if self.fail_next is not None:
+            error, self.fail_next = self.fail_next, None
+            raise error
+        df = _frame(self.rows)
+        if self.on_load is not None:
+            self.on_load()
+        return df
+
+
+class _FakeTable:
+    # Like sstable.StringTable: records() but no apply_changes
+    def __init__(self, records):
+        self._records = list(records)
+
+    def records(self):
+        return list(self._records)
+
+
+def _watcher(tmp_path, index=None, rebuild=None):
+    source = _Source(str(tmp_path / "remedies.xlsx"), ROWS)
+    reloads = []
+    index = index if index is not None else CatalogIndex(ROWS)
+    watcher = CatalogWatcher(source.path, index, lambda *args: reloads.append(args), loader=source.load,
+                             rebuild=rebuild)
+    return source, watcher, reloads
+
+
+def test_change_is_read_once_two_polls_agree(tmp_path):
+    source, watcher, reloads = _watcher(tmp_path)
+    assert watcher.check() is False and source.loads == 0  # nothing changed
+    source.write(ROWS + [("Nux vomica", "Strychnos nux-vomica")])
+    assert watcher.check() is False and source.loads == 0  # first sight: may still be copying
+    assert watcher.check() is True and source.loads == 1
+    index, df, removed, added = reloads[0]
+    assert removed == [] and added == [("Nux vomica", "Strychnos nux-vomica", ())]
+    assert index is watcher.index and index.search("nux") == [("Nux vomica", "Strychnos nux-vomica")]
+    assert watcher.check() is False and watcher.reloads == 1
+
+
+def test_file_still_growing_is_not_read(tmp_path):
+    source, watcher, reloads = _watcher(tmp_path)
+    for _ in range(3):
+        source.write(ROWS[:1])
+        assert watcher.check() is False
+    assert source.loads == 0 and reloads == []
+
+
+def test_failed_read_is_retried(tmp_path):
+    source, watcher, reloads = _watcher(tmp_path)
+    source.write(ROWS[:1])
+    source.fail_next = ValueError("file is being copied")
+    watcher.check()
+    assert watcher.check() is False and source.loads == 1 and reloads == []
+    # The failure forgets the settled stamp: the change has to settle again before the next read
+    assert watcher.check() is False and source.loads == 1
+    assert watcher.check() is True and source.loads == 2
+    assert reloads[0][2] == [("Bryonia", "Bryonia alba", ())]
+
+
+def test_change_during_read_is_not_applied(tmp_path):
+    source, watcher, reloads = _watcher(tmp_path)
+    source.write(ROWS[:1])
+    source.on_load = lambda: (setattr(source, 'on_load', None), source.write(ROWS[1:]))
+    watcher.check()
+    before = watcher.stamp
+    assert watcher.check() is False and source.loads == 1 and reloads == []
+    assert watcher.stamp == before
+    # The second write settles and is applied as a whole
+    assert watcher.check() is False
+    assert watcher.check() is True and source.loads == 2
+    assert reloads[0][2:] == ([("Arnica", "Arnica montana", ())], [])
+
+
+def test_note_written_suppresses_the_reload(tmp_path):
+    source, watcher, reloads = _watcher(tmp_path)
+    added = ("Nux vomica", "Strychnos nux-vomica")
+    source.write(ROWS + [added])
+    index = watcher.index.apply_changes(added=[added])
+    watcher.note_written(index)
+    assert watcher.check() is False and watcher.check() is False
+    assert source.loads == 0 and reloads == [] and watcher.index is index
+
+
+def test_unchanged_rows_adopt_the_stamp_without_a_reload(tmp_path):
+    source, watcher, reloads = _watcher(tmp_path)
+    source.write(ROWS)  # saved again, same rows
+    watcher.check()
+    assert watcher.check() is False and source.loads == 1 and reloads == []
+    assert watcher.check() is False and source.loads == 1
+
+
+def test_string_table_is_rebuilt(tmp_path):
+    built = []
+
+    def rebuild(records):
+        built.append(records)
+        return _FakeTable(records)
+
+    table = _FakeTable([row + ((),) for row in ROWS])
+    source, watcher, reloads = _watcher(tmp_path, index=table, rebuild=rebuild)
+    source.write(ROWS[1:])
+    watcher.check()
+    assert watcher.check() is True
+    assert built == [[("Bryonia", "Bryonia alba", ())]]
+    assert isinstance(watcher.index, _FakeTable) and watcher.index is not table
+    assert reloads[0][0] is watcher.index and reloads[0][2:] == ([("Arnica", "Arnica montana", ())], [])
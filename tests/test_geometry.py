@@ -0,0 +1,100 @@
+# tests/test_geometry.py
+import json
+import pickle
+
+import pytest
+
+from homeolabel.geometry import (LabelGeometry, ProfileStore, PROFILES, DEFAULT_GEOMETRY, DEFAULT_PROFILE, MM_PT,
+                                 get_profile)
+
+CUSTOM = {'width_mm': 40, 'height_mm': 25, 'base_font_size': 8}
+
+
+def _store_file(tmp_path, data):
+    path = tmp_path / "label_profiles.json"
+    path.write_text(json.dumps(data), encoding="utf-8")
+    return str(path)
+
+
+def test_store_reads_profiles_printers_and_raw_settings(tmp_path):
+    path = _store_file(tmp_path, {'profiles': {'40x25': CUSTOM},
+                                  'printers': {'TSC TE244': '40x25', 'Old printer': 'gone'},
+                                  'raw': {'TSC TE244': {'format': 'tspl', 'dpi': 203}, 'Empty': {}}})
+    store = ProfileStore(path)
+    assert store.names() == list(PROFILES) + ["40x25"]
+    geometry = store.for_printer("TSC TE244")
+    assert geometry == LabelGeometry("40x25", 40, 25, base_font_size=8) and geometry.name == "40x25"
+    # An assignment to a profile that no longer exists falls back to the default
+    assert store.printers == {'TSC TE244': '40x25'} and store.for_printer("Old printer") is DEFAULT_GEOMETRY
+    assert store.raw_settings("TSC TE244") == {'format': 'tspl', 'dpi': 203}
+    assert store.raw_settings("Empty") is None and store.raw_settings("Laser") is None
+
+
+def test_store_round_trip(tmp_path):
+    path = _store_file(tmp_path, {'profiles': {'40x25': CUSTOM}})
+    store = ProfileStore(path)
+    store.assign("Counter 1", "38x25")
+    store.assign("Counter 2", "40x25")
+    store.assign("Counter 3", "no such stock")  # ignored
+    store.set_raw("Counter 2", "zpl", "300")
+    store.set_raw("Counter 1", "tspl")
+    store.set_raw("Counter 1", None)  # back to the PDF chain
+    saved = json.loads(open(path, encoding="utf-8").read())
+    # Built-in profiles are not written back, only the custom ones
+    assert set(saved['profiles']) == {"40x25"} and saved['profiles']['40x25']['base_font_size'] == 8
+    assert saved['printers'] == {'Counter 1': '38x25', 'Counter 2': '40x25'}
+    assert saved['raw'] == {'Counter 2': {'format': 'zpl', 'dpi': 300}}
+    again = ProfileStore(path)
+    assert again.profiles == store.profiles and again.printers == store.printers and again.raw == store.raw
+    assert again.for_printer("Counter 1") is PROFILES["38x25"]
+
+
+def test_overridden_built_in_profile_is_saved(tmp_path):
+    path = _store_file(tmp_path, {'profiles': {DEFAULT_PROFILE: {'width_mm': 50, 'height_mm': 30,
+                                                                 'text_width_mm': 40}}})
+    store = ProfileStore(path)
+    assert store.get(DEFAULT_PROFILE).max_text_width == pytest.approx(40 * MM_PT)
+    store.assign("Counter 1", DEFAULT_PROFILE)
+    assert set(json.loads(open(path, encoding="utf-8").read())['profiles']) == {DEFAULT_PROFILE}
+
+
+def test_unreadable_store_keeps_the_built_in_profiles(tmp_path):
+    path = tmp_path / "label_profiles.json"
+    path.write_text("{not json", encoding="utf-8")
+    store = ProfileStore(str(path))
+    assert store.profiles == PROFILES and store.printers == {} and store.raw == {}
+    assert ProfileStore(str(tmp_path / "missing.json")).names() == list(PROFILES)
+    assert get_profile(None) is DEFAULT_GEOMETRY and get_profile("no such stock") is DEFAULT_GEOMETRY
+
+
+def test_derived_constants():
+    g = PROFILES["50x30"]
+    assert g.page_size == (50 * MM_PT, 30 * MM_PT) and g.center_x == 25 * MM_PT
+    assert g.border_rect == (2 * MM_PT, 2 * MM_PT, 50 * MM_PT - 4 * MM_PT, 30 * MM_PT - 4 * MM_PT)
+    assert g.baseline_y == pytest.approx(30 * MM_PT * 0.88)
+    assert g.max_text_width == 44 * MM_PT
+    assert g.max_text_height == pytest.approx(g.baseline_y - 2.5 * MM_PT - 1)
+    # Text width defaults to the width inside the border less 1 mm a side
+    assert LabelGeometry("x", 60, 40, border_mm=3).text_width_mm == 52
+
+
+def test_geometry_compares_hashes_and_pickles_by_value():
+    g = LabelGeometry.from_dict(PROFILES["76x51"].to_dict())
+    assert g == PROFILES["76x51"] and hash(g) == hash(PROFILES["76x51"])
+    assert g != LabelGeometry.from_dict(dict(g.to_dict(), max_lines=9))
+    clone = pickle.loads(pickle.dumps(g))
+    assert clone == g and clone.max_text_height == g.max_text_height
+
+
+def test_pixels_are_cached_per_dpi():
+    g = LabelGeometry("50x30", 50, 30, text_width_mm=44)
+    px = g.pixels(203)
+    assert g.pixels(203, 203) is px and g.pixels(300) is not px and g.pixels(203, 300) is not px
+    assert (px.page_w, px.page_h, px.margin_x, px.margin_y) == (400, 240, 16, 16)
+    assert (px.x_center, px.text_top, px.line_px) == (200, 39, 3)
+    assert px.px_per_pt_x == 203 / 72.0 and px.px_per_mm_y == 203 / 25.4
+    hi = g.pixels(300)
+    assert (hi.page_w, hi.page_h, hi.margin_x, hi.text_top, hi.line_px) == (591, 354, 24, 59, 4)
+    # Unequal DPI (some GDI printer drivers): each axis uses its own
+    mixed = g.pixels(203, 300)
+    assert (mixed.page_w, mixed.page_h, mixed.margin_x, mixed.margin_y) == (400, 354, 16, 24)
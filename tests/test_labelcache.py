@@ -0,0 +1,90 @@
+# tests/test_labelcache.py
+import os
+import pickle
+
+from homeolabel.labelcache import RenderCache, label_cache_key, render_label_cached
+from homeolabel.labeljob import LabelJob
+from homeolabel.prerender import Prerenderer
+
+FIELDS = ("Nux Vomica", "30C", "4 pills", "Twice daily", "Homeo Mahanagar", "Branch 1")
+FITLINES = [("NUX VOMICA 30C", 9), ("4 pills", 8.5)]
+
+
+def _key(n):
+    return label_cache_key((f"Remedy {n}",) + FIELDS[1:])
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = RenderCache(max_items=2)
+    cache.put(_key(1), FITLINES, b"one")
+    cache.put(_key(2), FITLINES, b"two")
+    assert cache.get(_key(1)) is not None  # 1 is now the most recent
+    cache.put(_key(3), FITLINES, b"three")
+    assert cache.get(_key(2)) is None
+    assert cache.get(_key(1))[1] == b"one" and cache.get(_key(3))[1] == b"three"
+    assert cache.stats()['evicted_mem'] == 1
+
+
+def test_disk_hit_from_a_new_instance(tmp_path):
+    RenderCache(str(tmp_path)).put(_key(1), FITLINES, b"%PDF-1.4 label")
+    cache = RenderCache(str(tmp_path))
+    assert cache.get(_key(1)) == (tuple(FITLINES), b"%PDF-1.4 label")
+    assert cache.get(_key(1)) is not None  # now from memory
+    stats = cache.stats()
+    assert stats['disk_hits'] == 1 and stats['mem_hits'] == 1 and stats['misses'] == 0
+
+
+def test_disk_tier_evicts_oldest_over_budget(tmp_path):
+    cache = RenderCache(str(tmp_path), max_items=1, max_disk_bytes=2500)
+    for n in range(4):
+        cache.put(_key(n), FITLINES, bytes(1000))
+        path = os.path.join(str(tmp_path), _key(n) + ".lbl")
+        os.utime(path, (1000 + n, 1000 + n))  # distinct mtimes: eviction is oldest first
+    stats = cache.stats()
+    assert stats['evicted_disk'] >= 1 and stats['disk_bytes'] <= 2500
+    assert stats['disk_bytes'] == sum(os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path))
+    fresh = RenderCache(str(tmp_path), max_items=1)
+    assert fresh.get(_key(0)) is None and fresh.get(_key(3)) is not None
+
+
+def test_unreadable_entry_is_deleted_not_unpickled(tmp_path):
+    path = tmp_path / (_key(1) + ".lbl")
+    path.write_bytes(pickle.dumps((tuple(FITLINES), b"pdf")))
+    cache = RenderCache(str(tmp_path))
+    assert cache.get(_key(1)) is None
+    assert not path.exists() and cache.stats()['disk_bytes'] == 0
+
+
+def test_stats_counts_lookups():
+    cache = RenderCache()
+    assert cache.stats()['hit_rate'] == 0.0
+    cache.put(_key(1), FITLINES, b"pdf")
+    cache.get(_key(1))
+    cache.get(_key(2))
+    cache.get(_key(1))
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['lookups']) == (2, 1, 3)
+    assert stats['hit_rate'] == round(2 / 3, 4) and stats['mem_items'] == 1 and stats['disk_bytes'] == 0
+
+
+def test_copies_are_part_of_the_key():
+    assert label_cache_key(FIELDS) == label_cache_key(FIELDS, copies=1)
+    assert len({label_cache_key(FIELDS, copies=n) for n in (1, 2, 3)}) == 3
+    cache = RenderCache()
+    _, one = render_label_cached(cache, FIELDS)
+    _, three = render_label_cached(cache, FIELDS, copies=3)
+    assert b"/Count 1" in one and b"/Count 3" in three
+    assert render_label_cached(cache, FIELDS, copies=3)[1] == three
+    assert cache.stats()['misses'] == 2 and cache.stats()['hits'] == 1
+
+
+def test_prerendered_copies_are_not_taken_for_another_count():
+    pre = Prerenderer(RenderCache())
+    try:
+        job = LabelJob(FIELDS)
+        pre.request(job.layout(), copies=2)
+        assert pre.take(job) is None and pre.take(job, copies=3) is None
+        _, pdf = pre.take(job, copies=2)
+        assert b"/Count 2" in pdf
+    finally:
+        pre.close()
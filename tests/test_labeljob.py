@@ -0,0 +1,93 @@
+# tests/test_labeljob.py
+import pytest
+
+import homeolabel.labeljob as labeljob
+import homeolabel.render as render
+import homeolabel.spooler as spooler
+from homeolabel.geometry import PROFILES, DEFAULT_GEOMETRY
+from homeolabel.labeljob import LabelJob, LabelLayout
+from homeolabel.labelcache import render_label_cached
+from homeolabel.spooler import PdfPrinterBackend, PrintJob
+
+FIELDS = ("Nux Vomica", "30C", "4 pills", "Twice daily", "Homeo Mahanagar", "Branch 1")
+
+
+def test_jobs_compare_by_value():
+    job = LabelJob(FIELDS)
+    padded = LabelJob([f" {f} " for f in FIELDS], DEFAULT_GEOMETRY.base_font_size, DEFAULT_GEOMETRY)
+    assert job == padded and hash(job) == hash(padded) and len({job, padded}) == 1
+    assert job.fields == FIELDS and job.base_font_size == DEFAULT_GEOMETRY.base_font_size
+    assert job != LabelJob(FIELDS, DEFAULT_GEOMETRY.base_font_size + 1)
+    assert job != LabelJob(FIELDS, geometry=PROFILES["38x25"])
+    assert job != LabelJob(("Arnica",) + FIELDS[1:])
+    assert job != FIELDS
+    # A profile's own base size unless one is given
+    assert LabelJob(FIELDS, geometry=PROFILES["38x25"]).base_font_size == PROFILES["38x25"].base_font_size
+
+
+def test_complete_needs_every_field():
+    assert LabelJob(FIELDS).complete
+    assert not LabelJob(FIELDS[:5] + ("  ",)).complete
+    assert not LabelJob(FIELDS[:1] + (None,) + FIELDS[2:]).complete
+    with pytest.raises(ValueError):
+        LabelJob(FIELDS[:5])
+
+
+def test_job_and_layout_are_immutable():
+    job = LabelJob(FIELDS)
+    layout = job.layout()
+    with pytest.raises(AttributeError):
+        job.fields = FIELDS
+    with pytest.raises(AttributeError):
+        job.base_font_size = 12
+    with pytest.raises(AttributeError):
+        layout.lines = ()
+    assert isinstance(layout.lines, tuple) and all(isinstance(line, tuple) for line in layout.lines)
+    assert list(layout) == list(layout.lines) and len(layout) == len(layout.lines)
+    assert layout[0] == layout.lines[0]
+
+
+def test_one_layout_feeds_preview_pdf_and_gdi(monkeypatch, qapp, tmp_path):
+    from homeolabel.preview import LabelPreview
+    fits = []
+
+    def counted_fit_label(*args):
+        fits.append(args)
+        return render.fit_label(*args)
+
+    monkeypatch.setattr(labeljob, "fit_label", counted_fit_label)
+    job = LabelJob(FIELDS, geometry=PROFILES["38x25"])
+    layout = job.layout()
+    assert isinstance(layout, LabelLayout) and layout.job is job and len(fits) == 1
+
+    # Nothing downstream lays the label out again
+    def no_refit(*args, **kwargs):
+        raise AssertionError("the label was laid out again")
+
+    monkeypatch.setattr(render, "fit_label", no_refit)
+    monkeypatch.setattr(render, "fit_lines_to_box", no_refit)
+    monkeypatch.setattr("homeolabel.labelcache.fit_label", no_refit)
+
+    preview = LabelPreview(geometry=job.geometry)
+    assert preview.set_lines(layout) and preview.lines() == layout.lines
+
+    fitlines, pdf = render_label_cached(None, job.fields, base_font_size=job.base_font_size, fitlines=layout.lines,
+                                        geometry=job.geometry)
+    assert tuple(fitlines) == layout.lines and pdf.startswith(b"%PDF")
+
+    drawn = []
+
+    def pdf_route_fails(pdf_path, printer, wait_seconds=0):
+        raise OSError("no PDF handler")
+
+    def gdi(printer_name, fit_lines, base_font_size=9, geometry=None, copies=1):
+        drawn.append((tuple(fit_lines), geometry, copies))
+
+    monkeypatch.setattr(spooler, "print_pdf_to_printer", pdf_route_fails)
+    monkeypatch.setattr(spooler, "print_label_direct", gdi)
+    pdf_path = tmp_path / "label.pdf"
+    pdf_path.write_bytes(pdf)
+    route = PdfPrinterBackend(wait_seconds=0).print_job(
+        PrintJob("Label 1", str(pdf_path), fitlines, copies=2, geometry=job.geometry))
+    assert route == "gdi" and drawn == [(layout.lines, job.geometry, 2)]
+    assert len(fits) == 1
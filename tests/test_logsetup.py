@@ -0,0 +1,150 @@
+# tests/test_logsetup.py
+import os
+import json
+import queue
+import logging
+import datetime
+
+import pytest
+
+import homeolabel.logsetup as logsetup
+from homeolabel.logsetup import SizeAndDayRotatingFileHandler, RepeatFilter, setup_logging, stop_logging
+
+DAY = datetime.datetime(2024, 3, 1, 10, 0).timestamp()
+
+
+class _Clock:
+    # Stands in for the time module in logsetup: wall clock and monotonic move together
+    def __init__(self, now=DAY):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(logsetup, "time", clock)
+    return clock
+
+
+def _record(msg, level=logging.WARNING):
+    return logging.makeLogRecord({'msg': msg, 'levelno': level, 'levelname': logging.getLevelName(level)})
+
+
+def _handler(tmp_path, **kwargs):
+    handler = SizeAndDayRotatingFileHandler(str(tmp_path / "error_log.txt"), **kwargs)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    return handler
+
+
+def _emit(handler, clock, msg):
+    handler.emit(_record(msg))
+    # Backups are pruned oldest first by mtime: give every write the fake clock's time
+    os.utime(handler.baseFilename, (clock.now, clock.now))
+
+
+def _files(tmp_path):
+    return sorted(os.listdir(tmp_path))
+
+
+def test_size_rollover_numbers_the_day_backups(tmp_path, clock):
+    handler = _handler(tmp_path, max_bytes=100)
+    try:
+        for n in range(5):
+            _emit(handler, clock, f"{n}" * 40)
+            clock.now += 1
+    finally:
+        handler.close()
+    # Two 41-byte lines fit under 100 bytes, the third starts a new file
+    assert _files(tmp_path) == ["error_log.txt", "error_log.txt.2024-03-01.1", "error_log.txt.2024-03-01.2"]
+    assert (tmp_path / "error_log.txt.2024-03-01.1").read_text() == "0" * 40 + "\n" + "1" * 40 + "\n"
+    assert (tmp_path / "error_log.txt").read_text() == "4" * 40 + "\n"
+
+
+def test_day_rollover(tmp_path, clock):
+    handler = _handler(tmp_path)
+    try:
+        _emit(handler, clock, "before midnight")
+        clock.now += 24 * 3600
+        _emit(handler, clock, "next day")
+    finally:
+        handler.close()
+    assert _files(tmp_path) == ["error_log.txt", "error_log.txt.2024-03-01.1"]
+    assert (tmp_path / "error_log.txt.2024-03-01.1").read_text() == "before midnight\n"
+    assert (tmp_path / "error_log.txt").read_text() == "next day\n"
+
+
+def test_file_from_an_earlier_day_is_rotated_on_the_first_write(tmp_path, clock):
+    path = tmp_path / "error_log.txt"
+    path.write_text("yesterday\n")
+    os.utime(path, (DAY - 24 * 3600, DAY - 24 * 3600))
+    handler = _handler(tmp_path)
+    try:
+        _emit(handler, clock, "today")
+    finally:
+        handler.close()
+    assert (tmp_path / "error_log.txt.2024-02-29.1").read_text() == "yesterday\n"
+    assert path.read_text() == "today\n"
+
+
+def test_only_the_newest_backups_are_kept(tmp_path, clock):
+    handler = _handler(tmp_path, max_bytes=50, backup_count=2)
+    try:
+        for n in range(6):
+            _emit(handler, clock, f"{n}" * 40)  # one line per file
+            clock.now += 1
+    finally:
+        handler.close()
+    assert _files(tmp_path) == ["error_log.txt", "error_log.txt.2024-03-01.4", "error_log.txt.2024-03-01.5"]
+    assert (tmp_path / "error_log.txt.2024-03-01.5").read_text() == "4" * 40 + "\n"
+
+
+def test_repeat_filter_drops_repeats_and_reports_the_count(clock):
+    repeats = RepeatFilter(interval=60.0)
+    assert repeats.filter(_record("printer offline"))
+    assert not repeats.filter(_record("printer offline"))
+    assert not repeats.filter(_record("printer offline"))
+    # Below WARNING and other messages are never held back
+    assert repeats.filter(_record("printer offline", logging.INFO))
+    assert repeats.filter(_record("paper out"))
+    clock.now += 61
+    record = _record("printer offline")
+    assert repeats.filter(record)
+    assert record.getMessage() == "printer offline [2 identical messages suppressed]"
+    # The count starts over once reported
+    clock.now += 61
+    record = _record("printer offline")
+    assert repeats.filter(record) and record.getMessage() == "printer offline"
+
+
+def test_long_messages_are_truncated():
+    q = queue.SimpleQueue()
+    handler = logsetup._TruncatingQueueHandler(q, max_chars=10)
+    handler.emit(_record("Sumatra stdout " + "x" * 90))
+    handler.emit(_record("short"))
+    assert q.get_nowait().getMessage() == "Sumatra st ... [95 more characters]"
+    assert q.get_nowait().getMessage() == "short"
+
+
+def test_json_lines_next_to_the_text_log(tmp_path):
+    root = logging.getLogger()
+    level = root.level
+    path = tmp_path / "records" / "error_log.txt"
+    setup_logging(str(path), json_lines=True, repeat_interval=0)
+    try:
+        logging.getLogger("homeolabel.test").warning("Printer '%s' is offline", "Label 1")
+        logging.info("Refreshed printer list: %s", ["Label 1"])
+    finally:
+        stop_logging()
+        root.setLevel(level)
+    entries = [json.loads(line) for line in (tmp_path / "records" / "error_log.jsonl").read_text().splitlines()]
+    assert [(e['level'], e['logger'], e['msg']) for e in entries] == [
+        ("WARNING", "homeolabel.test", "Printer 'Label 1' is offline"),
+        ("INFO", "root", "Refreshed printer list: ['Label 1']")]
+    assert entries[0]['module'] == "test_logsetup" and datetime.datetime.fromisoformat(entries[0]['ts'])
+    assert "WARNING - Printer 'Label 1' is offline" in path.read_text()
@@ -0,0 +1,121 @@
+# tests/test_metrics.py
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+from itertools import combinations
+
+from homeolabel.metrics import string_widths, fit_many_lines_to_box, glyph_widths
+from homeolabel.linebreak import (break_paragraph, word_units, _WORD_UNITS, SLACK_WEIGHT, LINE_PENALTY,
+                                  OVERFULL_PENALTY)
+from homeolabel.render import fit_lines_to_box, build_label_lines, MAX_TEXT_WIDTH_MM
+from homeolabel.batch import sample_jobs
+
+TEXTS = ["", " ", "Nux vomica 30C", "Calcarea carbonica ostrearum", "Äpfel ß øre é", "€ – “quoted” …",
+         "日本 ✓", "tab\there", "WWW Mammillaria 1M"]
+
+
+def test_string_widths_match_stringwidth():
+    for font in ("Helvetica", "Helvetica-Bold", "Times-Roman", "Courier"):
+        for size in (6, 8.5, 9, 14):
+            assert string_widths(TEXTS, font, size).tolist() == [stringWidth(t, font, size) for t in TEXTS]
+
+
+def test_fit_many_lines_matches_fit_lines_to_box():
+    raw = [build_label_lines(*job) for job in sample_jobs(200)] + [TEXTS]
+    c = canvas.Canvas("dummy.pdf")
+    expected = [fit_lines_to_box(lines, c, "Helvetica-Bold", 9, MAX_TEXT_WIDTH_MM) for lines in raw]
+    assert fit_many_lines_to_box(raw, "Helvetica-Bold", 9, MAX_TEXT_WIDTH_MM) == expected
+
+
+def _break_with_stringwidth(text, font, size, max_width):
+    # The same paragraph broken with stringWidth measuring (the non-Type1 path)
+    _WORD_UNITS[(text, font)] = None
+    try:
+        return break_paragraph.__wrapped__(text, font, size, max_width)
+    finally:
+        _WORD_UNITS.pop((text, font), None)
+
+
+def test_break_paragraph_glyph_units_match_stringwidth():
+    for text in TEXTS + ["Mercurius solubilis hahnemanni 200C", "Kali bichromicum 6X 4 pills twice daily"]:
+        for size in (7, 9, 11):
+            for max_width in (40.0, 96.4, 140.0):
+                assert word_units(text, "Helvetica-Bold") is not None
+                expected = _break_with_stringwidth(text, "Helvetica-Bold", size, max_width)
+                assert break_paragraph.__wrapped__(text, "Helvetica-Bold", size, max_width) == expected
+
+
+def test_text_units_match_the_vectorized_lookup():
+    gw = glyph_widths("Helvetica-Bold")
+    words = [w for t in TEXTS for w in t.split()] + ["", " "]
+    assert [gw.text_units(w) for w in words] == gw.units(words).tolist()
+
+
+def _cheapest_by_enumeration(text, size, max_width, min_lines):
+    # Every way to break the words into lines, costed as break_paragraph does -> (cost, line count)
+    words = text.split()
+    units = word_units(text, "Helvetica-Bold")
+    widths = [u * 0.001 * size for u in units[:-1]]
+    space = units[-1] * 0.001 * size
+    n = len(words)
+    options = []
+    for k in range(n):
+        for cuts in combinations(range(1, n), k):
+            bounds = list(zip((0,) + cuts, cuts + (n,)))
+            if len(bounds) < min_lines and n >= min_lines:
+                continue
+            cost = 0.0
+            for i, j in bounds:
+                width = -space
+                for w in reversed(widths[i:j]):  # summed right to left, as the DP does
+                    width += w + space
+                if width > max_width and j - i > 1:
+                    break
+                if width > max_width:
+                    badness = OVERFULL_PENALTY
+                elif j == n:
+                    badness = 0.0
+                else:
+                    badness = SLACK_WEIGHT * ((max_width - width) / max_width) ** 2
+                cost = cost + badness + LINE_PENALTY
+            else:
+                options.append((cost, len(bounds)))
+    return min(options)
+
+
+def test_break_paragraph_is_the_cheapest_setting():
+    texts = ["Nux vomica 30C", "Calcarea carbonica ostrearum 200C", "Mercurius solubilis hahnemanni 1M",
+             "A B C D E F G", "WWWWWWWWWWWWWWW x"]
+    for text in texts:
+        for max_width in (30.0, 60.0, 96.4):
+            for min_lines in (1, 2, 3):
+                cost, lines = break_paragraph.__wrapped__(text, "Helvetica-Bold", 9, max_width, 6, min_lines)
+                assert (cost, len(lines)) == _cheapest_by_enumeration(text, 9, max_width, min_lines)
+
+
+def test_word_units_survive_concurrent_clears(monkeypatch):
+    # The cache is cleared when full while other threads are between measuring and reading
+    import sys
+    import threading
+    import homeolabel.linebreak as linebreak
+    monkeypatch.setattr(linebreak, "_WORD_UNITS_MAX", 1)
+    errors = []
+
+    def work(n):
+        try:
+            for i in range(3000):
+                assert word_units(f"Nux vomica {n} {i}", "Helvetica-Bold") is not None
+        except Exception as exc:
+            errors.append(exc)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
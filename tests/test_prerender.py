@@ -0,0 +1,109 @@
+# tests/test_prerender.py
+import threading
+
+import pytest
+
+import homeolabel.prerender as prerender
+from homeolabel.labeljob import LabelJob
+from homeolabel.prerender import Prerenderer
+
+
+def _job(name):
+    return LabelJob((name, "30C", "4 pills", "Twice daily", "Homeo Mahanagar", "Branch 1"))
+
+
+class _SlowRender:
+    # render_label_cached stand-in: every render blocks until the gate opens
+    def __init__(self):
+        self.gate = threading.Event()
+        self.started = threading.Event()
+        self.calls = []
+
+    def __call__(self, cache, fields, base_font_size=None, copies=1, fitlines=None, geometry=None):
+        self.calls.append((fields[0], copies))
+        self.started.set()
+        assert self.gate.wait(5.0)
+        return list(fitlines), f"{fields[0]} x{copies}".encode("ascii")
+
+
+@pytest.fixture
+def render(monkeypatch):
+    render = _SlowRender()
+    monkeypatch.setattr(prerender, "render_label_cached", render)
+    yield render
+    render.gate.set()
+
+
+@pytest.fixture
+def pre(render):
+    pre = Prerenderer()
+    yield pre
+    pre.close()
+
+
+def _started(pre, render, job, copies=1):
+    # Request `job` and wait until the worker is busy rendering it
+    render.started.clear()
+    pre.request(job.layout(), copies)
+    assert render.started.wait(5.0)
+
+
+def test_latest_request_wins(pre, render):
+    first, second, third = _job("Arnica"), _job("Bryonia"), _job("Belladonna")
+    _started(pre, render, first)
+    pre.request(second.layout())  # queued behind the running render
+    pre.request(third.layout())   # replaces it before it starts
+    pre.request(third.layout())   # same label again: nothing new
+    render.gate.set()
+    assert pre.take(third) == (list(third.layout()), b"Belladonna x1")
+    assert render.calls == [("Arnica", 1), ("Belladonna", 1)]
+    stats = pre.stats()
+    assert (stats['requested'], stats['rendered'], stats['used']) == (3, 2, 1)
+    assert stats['wasted'] == 1 and stats['superseded'] == 1  # the running one finished unused
+
+
+def test_invalidate_cancels_the_queued_render(pre, render):
+    first, second = _job("Arnica"), _job("Bryonia")
+    _started(pre, render, first)
+    pre.request(second.layout())
+    pre.invalidate("text changed")
+    render.gate.set()
+    assert pre.take(second) is None and pre.take(first) is None
+    assert render.calls == [("Arnica", 1)]
+    assert pre.stats()['superseded'] == 1 and pre.stats()['missed'] == 2
+
+
+def test_take_of_another_label_misses(pre, render):
+    job = _job("Arnica")
+    render.gate.set()
+    pre.request(job.layout())
+    assert pre.take(_job("Bryonia")) is None
+    assert pre.take(LabelJob(job.fields, 11)) is None  # same fields, other font size
+    # A miss leaves the speculation for the label it was made for
+    assert pre.take(job) == (list(job.layout()), b"Arnica x1")
+    assert pre.take(job) is None  # used once
+    assert pre.stats()['missed'] == 3 and pre.stats()['used'] == 1
+
+
+def test_take_waits_for_a_running_render(pre, render):
+    job = _job("Arnica")
+    _started(pre, render, job)
+    threading.Timer(0.1, render.gate.set).start()
+    assert pre.take(job, wait=5.0) == (list(job.layout()), b"Arnica x1")
+    assert pre.stats()['waited'] == 1 and pre.stats()['used'] == 1
+
+
+def test_take_gives_up_after_the_wait(pre, render):
+    job = _job("Arnica")
+    _started(pre, render, job)
+    assert pre.take(job, wait=0.05) is None  # the caller renders inline instead
+    assert pre.stats()['waited'] == 1 and pre.stats()['used'] == 0
+
+
+def test_copies_are_part_of_the_label(pre, render):
+    job = _job("Arnica")
+    render.gate.set()
+    pre.request(job.layout(), copies=3)
+    assert pre.take(job) is None
+    assert pre.take(job, copies=3) == (list(job.layout()), b"Arnica x3")
+    assert render.calls == [("Arnica", 3)]
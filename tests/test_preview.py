@@ -0,0 +1,51 @@
+# tests/test_preview.py
+from homeolabel.geometry import PROFILES
+from homeolabel.labeljob import LabelJob
+
+FIELDS = ("Nux Vomica", "30C", "4 pills", "Twice daily", "Homeo Mahanagar", "Branch 1")
+
+
+def _shown_preview(qapp):
+    from homeolabel.preview import LabelPreview
+    preview = LabelPreview()
+    preview.resize(300, 180)
+    preview.show()
+    qapp.processEvents()
+    return preview
+
+
+def _paints_after(qapp, preview, action):
+    before = preview.paints
+    result = action()
+    qapp.processEvents()
+    return result, preview.paints - before
+
+
+def test_set_lines_repaints_only_when_the_layout_changes(qapp):
+    preview = _shown_preview(qapp)
+    try:
+        layout = LabelJob(FIELDS).layout()
+        assert _paints_after(qapp, preview, lambda: preview.set_lines(layout)) == (True, 1)
+        # A space typed around a field: the same lines, no repaint
+        same = LabelJob(FIELDS[:2] + (" 4 pills ",) + FIELDS[3:]).layout()
+        assert same.lines == layout.lines
+        assert _paints_after(qapp, preview, lambda: preview.set_lines(same)) == (False, 0)
+        assert _paints_after(qapp, preview, lambda: preview.set_lines(list(layout.lines))) == (False, 0)
+        changed = LabelJob(("Nux Vomica Q",) + FIELDS[1:]).layout()
+        assert _paints_after(qapp, preview, lambda: preview.set_lines(changed)) == (True, 1)
+        assert preview.lines() == changed.lines
+    finally:
+        preview.close()
+
+
+def test_new_stock_repaints_at_its_proportions(qapp):
+    preview = _shown_preview(qapp)
+    try:
+        preview.set_lines(LabelJob(FIELDS).layout())
+        qapp.processEvents()
+        _, paints = _paints_after(qapp, preview, lambda: preview.set_geometry(PROFILES["38x25"]))
+        assert paints == 1 and preview.heightForWidth(380) == 250
+        _, paints = _paints_after(qapp, preview, lambda: preview.set_geometry(PROFILES["38x25"]))
+        assert paints == 0
+    finally:
+        preview.close()
@@ -0,0 +1,125 @@
+# tests/test_printerhealth.py
+import time
+import asyncio
+import threading
+
+import pytest
+
+from homeolabel.printerhealth import (PrinterHealthMonitor, FakeStatusBackend, HealthCheckedBackend,
+                                      PrinterUnavailable, READY, OFFLINE, ERROR, UNKNOWN)
+from homeolabel.printerpool import PrinterPool
+from homeolabel.spooler import PrintSpooler, PrintJob, FakePrinter
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_cached_status_expires_after_ttl():
+    backend = FakeStatusBackend({"p": OFFLINE})
+    monitor = PrinterHealthMonitor(backend, ttl=0.1)
+    assert monitor.cached("p").state == UNKNOWN and backend.queries == 0  # cached() never queries
+    assert monitor.status("p").state == OFFLINE and backend.queries == 1
+    assert monitor.status("p").state == OFFLINE and backend.queries == 1  # within the TTL
+    time.sleep(0.15)
+    assert monitor.cached("p").state == UNKNOWN
+    backend.set("p", READY)
+    assert monitor.status("p").state == READY and backend.queries == 2
+
+
+def test_failed_query_is_unknown_not_offline():
+    class Broken:
+        def query(self, printer):
+            raise OSError("RPC server unavailable")
+
+    status = PrinterHealthMonitor(Broken()).check("p")
+    assert status.state == UNKNOWN and status.ready
+
+
+def test_monitor_thread_reports_changes():
+    backend = FakeStatusBackend({"p": READY})
+    changes = []
+    changed = threading.Event()
+
+    def on_change(printer, status):
+        changes.append((printer, status.state))
+        if status.state == ERROR:
+            changed.set()
+
+    monitor = PrinterHealthMonitor(backend, interval=0.02, ttl=1.0, on_change=on_change)
+    monitor.watch(["p"])
+    monitor.start()
+    try:
+        time.sleep(0.1)
+        backend.set("p", ERROR, "paper out")
+        assert changed.wait(2.0)
+        assert monitor.ready_printers() == []
+    finally:
+        monitor.stop()
+    assert changes[:2] == [("p", READY), ("p", ERROR)]
+
+
+def test_each_owner_keeps_its_printers_watched():
+    backend = FakeStatusBackend({"selected": READY, "a": READY, "b": READY})
+    monitor = PrinterHealthMonitor(backend, interval=0.02, ttl=1.0)
+    monitor.watch(["selected", "a"])
+    monitor.watch(["a", "b"], owner="pool")
+    monitor.start()
+    try:
+        deadline = time.monotonic() + 2.0
+        while len(monitor.ready_printers()) < 3 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        # Enabling the pool did not drop the selected printer: it stays known, not UNKNOWN
+        assert monitor.ready_printers() == ["selected", "a", "b"]
+        monitor.watch(["selected"])  # the printer list refreshed
+        assert monitor.ready_printers() == ["selected", "a", "b"]
+        monitor.watch([], owner="pool")
+        assert monitor.ready_printers() == ["selected"]
+    finally:
+        monitor.stop()
+
+
+def test_offline_printer_fails_fast_without_printing():
+    printer = FakePrinter("p", 0.5)
+    monitor = PrinterHealthMonitor(FakeStatusBackend({"p": OFFLINE}), ttl=10.0)
+    backend = HealthCheckedBackend(printer, monitor)
+    start = time.monotonic()
+    with pytest.raises(PrinterUnavailable):
+        backend.print_job(PrintJob("p"))
+    assert time.monotonic() - start < 0.1
+    assert printer.jobs == []
+
+
+def test_pool_pick_skips_offline_member():
+    monitor = PrinterHealthMonitor(FakeStatusBackend({"fast": OFFLINE, "slow": READY}), ttl=10.0)
+    monitor.check("fast")
+    monitor.check("slow")
+    pool = PrinterPool("pool", ["fast", "slow"], health=monitor)
+    pool.record_success("fast", 0.01)
+    pool.record_success("slow", 1.0)
+    assert pool.pick(lambda p: 0) == "slow"
+    monitor.backend.set("fast", READY)
+    monitor.check("fast")
+    assert pool.pick(lambda p: 0) == "fast"
+
+
+def test_offline_member_is_rerouted_in_the_spooler():
+    printers = {"a": FakePrinter("a", 0.01), "b": FakePrinter("b", 0.01)}
+    status = FakeStatusBackend({"a": OFFLINE})
+    monitor = PrinterHealthMonitor(status, ttl=10.0)
+
+    async def scenario():
+        spooler = PrintSpooler(lambda name: HealthCheckedBackend(printers[name], monitor), timeout=5.0,
+                               backoff_base=0.02, jitter=0.0)
+        # No status cached yet: the pool may still pick "a", the backend refuses and the job moves
+        spooler.add_pool(PrinterPool("pool", ["a", "b"], health=monitor, cooldown=60.0))
+        jobs = [PrintJob("pool") for _ in range(6)]
+        results = await asyncio.gather(*[await spooler.submit(job) for job in jobs])
+        stats = spooler.pool_metrics()["pool"]
+        await spooler.close()
+        return jobs, results, stats
+
+    jobs, results, stats = _run(scenario())
+    assert results == jobs and all(job.printer == "b" for job in jobs)
+    assert stats['failovers'] >= 1 and stats['printers']["a"]['failures'] >= 1
+    assert printers["a"].jobs == [] and len(printers["b"].jobs) == 6
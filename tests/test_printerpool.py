@@ -0,0 +1,65 @@
+# tests/test_printerpool.py
+import asyncio
+from collections import Counter
+
+from homeolabel.spooler import PrintSpooler, PrintJob, FakePrinter, PrintUncertain
+from homeolabel.printerpool import PrinterPool
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def _pool_spooler(printers, **kw):
+    spooler = PrintSpooler(lambda name: printers[name], backoff_base=0.02, jitter=0.0, **kw)
+    spooler.add_pool(PrinterPool("pool", list(printers), cooldown=60.0))
+    return spooler
+
+
+def test_pool_prefers_faster_printer():
+    printers = {"fast": FakePrinter("fast", 0.01), "slow": FakePrinter("slow", 0.1)}
+
+    async def scenario():
+        spooler = _pool_spooler(printers, timeout=5.0)
+        futures = []
+        for _ in range(40):
+            futures.append(await spooler.submit(PrintJob("pool")))
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*futures)
+        stats = spooler.pool_metrics()["pool"]
+        await spooler.close()
+        return stats
+
+    stats = _run(scenario())
+    assert len(printers["fast"].jobs) > len(printers["slow"].jobs) > 0
+    assert stats['printers']["fast"]['latency_ms'] < stats['printers']["slow"]['latency_ms']
+    assert stats['failovers'] == 0
+
+
+def test_stalled_and_failing_members_print_each_label_once():
+    printers = {"stalls": FakePrinter("stalls"), "fails": FakePrinter("fails"), "ok": FakePrinter("ok", 0.02)}
+    printers["stalls"].stall()
+    printers["fails"].fail_next(10 ** 6)
+
+    async def scenario():
+        spooler = _pool_spooler(printers, timeout=0.3, max_retries=6)
+        jobs = [PrintJob("pool", label=str(i)) for i in range(12)]
+        futures = [await spooler.submit(job) for job in jobs]
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        printers["stalls"].resume()
+        await asyncio.sleep(0.3)
+        stats = spooler.pool_metrics()["pool"]
+        await spooler.close()
+        return jobs, results, stats
+
+    jobs, results, stats = _run(scenario())
+    printed = Counter(job.job_id for p in printers.values() for job in p.jobs)
+    assert printed == {job.job_id: 1 for job in jobs}
+    assert printers["fails"].jobs == []
+    # Unconfirmed jobs stayed on the stalled printer and printed there once it recovered
+    unconfirmed = [job for job, r in zip(jobs, results) if isinstance(r, PrintUncertain)]
+    assert unconfirmed and all(job.printer == "stalls" for job in unconfirmed)
+    assert not any(isinstance(r, Exception) and not isinstance(r, PrintUncertain) for r in results)
+    assert stats['printers']["fails"]['failures'] >= 1
+    assert stats['printers']["stalls"]['failures'] == 0  # slow, not broken
+    assert stats['failovers'] >= 1
@@ -0,0 +1,169 @@
+# tests/test_printhelper.py
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+
+import pytest
+
+from homeolabel.printhelper import PrintHelper, HelperPrinterBackend, default_helper_command
+from homeolabel.spooler import PrintSpooler, PrintJob, FakePrinter, PrintUncertain, PrintTimeout
+
+# Answers ping, then never answers a print request (a helper stuck inside the printer driver)
+_HANGING_HELPER = """
+import sys, json, time
+for line in sys.stdin:
+    request = json.loads(line)
+    if request.get('op') == 'print':
+        time.sleep(60)
+    sys.stdout.write(json.dumps({'id': request.get('id'), 'ok': True}) + "\\n")
+    sys.stdout.flush()
+"""
+
+
+def _recorded(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_record_helper_restarts_after_being_killed(tmp_path):
+    record = tmp_path / "jobs.jsonl"
+    helper = PrintHelper(command=default_helper_command(str(record)), timeout=10.0)
+    try:
+        assert helper.print_job("P1", "a.pdf", [("A", 9)]) == "record"
+        helper._proc.kill()
+        helper._proc.wait(timeout=5)
+        assert helper.print_job("P1", "b.pdf", [("B", 9)]) == "record"
+        assert helper.restarts == 1
+    finally:
+        helper.stop()
+    assert [os.path.basename(r['pdf_path']) for r in _recorded(record)] == ["a.pdf", "b.pdf"]
+
+
+def test_helper_lost_after_taking_job_is_uncertain_not_fallback():
+    fallback = FakePrinter("fallback")
+    helper = PrintHelper(command=[sys.executable, "-c", _HANGING_HELPER], timeout=0.5)
+    backend = HelperPrinterBackend(helper, fallback=fallback)
+    try:
+        with pytest.raises(PrintUncertain):
+            backend.print_job(PrintJob("P1", "a.pdf"))
+    finally:
+        backend.close()
+    assert fallback.jobs == []
+
+
+def test_helper_that_cannot_start_falls_back(tmp_path):
+    fallback = FakePrinter("fallback")
+    helper = PrintHelper(command=[str(tmp_path / "no-such-helper")], timeout=1.0)
+    backend = HelperPrinterBackend(helper, fallback=fallback)
+    job = PrintJob("P1", "a.pdf")
+    assert backend.print_job(job) == "fake"
+    assert fallback.jobs == [job]
+
+
+def _routes(monkeypatch, raster_error):
+    # Stub the three helper routes; raster fails with raster_error, the others record the call
+    from homeolabel import printhelper
+    calls = []
+
+    def raster(pdf_path, printer):
+        calls.append("raster")
+        raise raster_error
+
+    monkeypatch.setattr(printhelper, "print_pdf_raster", raster)
+    monkeypatch.setattr(printhelper, "print_label_direct", lambda *a, **k: calls.append("gdi"))
+    monkeypatch.setattr(printhelper, "print_pdf_to_printer", lambda *a, **k: calls.append("pdf"))
+    return calls
+
+
+def _serve_one(request):
+    import io
+    from homeolabel.printhelper import serve
+    out = io.StringIO()
+    serve(stdin=io.StringIO(json.dumps(request) + "\n"), stdout=out)
+    return json.loads(out.getvalue())
+
+
+def test_helper_tries_next_route_when_nothing_was_submitted(monkeypatch):
+    calls = _routes(monkeypatch, OSError("no printer DC"))
+    reply = _serve_one({'id': 1, 'op': "print", 'printer': "P1", 'pdf_path': "a.pdf", 'fitlines': [["A", 9]]})
+    assert reply == {'id': 1, 'ok': True, 'route': "gdi"} and calls == ["raster", "gdi"]
+
+
+def test_helper_stops_after_a_route_reached_the_spooler(monkeypatch):
+    from homeolabel.printing import PrintStartedError
+    calls = _routes(monkeypatch, PrintStartedError("EndDoc failed"))
+    reply = _serve_one({'id': 1, 'op': "print", 'printer': "P1", 'pdf_path': "a.pdf", 'fitlines': [["A", 9]]})
+    assert reply['ok'] is False and reply['uncertain'] is True and "raster: EndDoc failed" in reply['error']
+    assert calls == ["raster"]
+
+
+def test_uncertain_reply_raises_print_uncertain():
+    script = ("import sys, json\n"
+              "for line in sys.stdin:\n"
+              "    r = json.loads(line)\n"
+              "    reply = {'id': r['id'], 'ok': r['op'] == 'ping', 'uncertain': True, 'error': 'EndDoc failed'}\n"
+              "    sys.stdout.write(json.dumps(reply) + '\\n'); sys.stdout.flush()\n"
+              "    if r['op'] == 'quit': break\n")
+    fallback = FakePrinter("fallback")
+    backend = HelperPrinterBackend(PrintHelper(command=[sys.executable, "-c", script], timeout=5.0), fallback)
+    try:
+        with pytest.raises(PrintUncertain):
+            backend.print_job(PrintJob("P1", "a.pdf"))
+    finally:
+        backend.close()
+    assert fallback.jobs == []
+
+
+# Hangs on every print to the printer named "stuck", records the rest
+_PER_PRINTER_HELPER = """
+import sys, json, time
+for line in sys.stdin:
+    request = json.loads(line)
+    if request.get('op') == 'print' and request.get('printer') == 'stuck':
+        time.sleep(60)
+    sys.stdout.write(json.dumps({'id': request.get('id'), 'ok': True, 'route': 'record'}) + "\\n")
+    sys.stdout.flush()
+    if request.get('op') == 'quit':
+        break
+"""
+
+
+def test_stalled_printer_does_not_block_another():
+    backend = HelperPrinterBackend(
+        helper_factory=lambda: PrintHelper(command=[sys.executable, "-c", _PER_PRINTER_HELPER], timeout=3.0))
+
+    async def scenario():
+        spooler = PrintSpooler(backend, timeout=10.0, backoff_base=0.01, jitter=0.0)
+        stuck = await spooler.submit(PrintJob("stuck", "a.pdf"))
+        await asyncio.sleep(0.5)  # the stuck helper has the job
+        start = time.monotonic()
+        other = await asyncio.wait_for(await spooler.submit(PrintJob("P2", "b.pdf")), timeout=2.5)
+        elapsed = time.monotonic() - start
+        results = await asyncio.gather(stuck, return_exceptions=True)
+        await spooler.close()
+        return other, elapsed, results[0]
+
+    try:
+        other, elapsed, stuck_result = asyncio.run(scenario())
+    finally:
+        backend.close()
+    assert other.route == "record" and elapsed < 2.5
+    assert isinstance(stuck_result, PrintUncertain)
+    assert backend.helper_for("stuck") is not backend.helper_for("P2")
+
+
+def test_busy_helper_is_a_retryable_timeout():
+    helper = PrintHelper(command=[sys.executable, "-c", _PER_PRINTER_HELPER], timeout=2.0)
+    first = threading.Thread(target=lambda: pytest.raises(PrintUncertain, helper.print_job, "stuck", "a.pdf"))
+    try:
+        helper.start()
+        first.start()
+        time.sleep(0.3)
+        with pytest.raises(PrintTimeout):
+            helper.print_job("stuck", "b.pdf")
+    finally:
+        first.join()
+        helper.stop()
@@ -0,0 +1,85 @@
+# tests/test_printing.py
+import types
+
+import pytest
+
+import homeolabel.printing as printing
+from homeolabel.printing import print_label_direct, PrintStartedError
+from homeolabel.render import fit_label
+
+FIELDS = ("Nux Vomica", "30C", "4 pills", "Twice daily", "Homeo Mahanagar", "Branch 1")
+
+
+class _FakeDC:
+    # Printer device context stand-in: records the calls print_label_direct makes
+    def __init__(self, log, fail_on_page=None):
+        self.log = log
+        self.fail_on_page = fail_on_page
+        self.pages = 0
+
+    def CreatePrinterDC(self, name):
+        self.log.append(("dc", name))
+
+    def StartDoc(self, name):
+        self.log.append(("doc", name))
+
+    def GetDeviceCaps(self, cap):
+        return 203
+
+    def StartPage(self):
+        self.pages += 1
+        if self.pages == self.fail_on_page:
+            raise RuntimeError("printer went offline")
+        self.log.append(("page",))
+
+    def Rectangle(self, rect):
+        pass
+
+    def SelectObject(self, font):
+        pass
+
+    def GetTextExtent(self, text):
+        return len(text) * 10, 20
+
+    def TextOut(self, x, y, text):
+        self.log.append(("text", text))
+
+    def EndPage(self):
+        pass
+
+    def EndDoc(self):
+        self.log.append(("end",))
+
+    def DeleteDC(self):
+        pass
+
+
+@pytest.fixture
+def gdi(monkeypatch):
+    log = []
+    state = types.SimpleNamespace(log=log, fonts=[], fail_on_page=None)
+    monkeypatch.setattr(printing, "win32print", types.SimpleNamespace(
+        OpenPrinter=lambda name: name, ClosePrinter=lambda handle: log.append(("closed", handle))))
+    monkeypatch.setattr(printing, "win32ui", types.SimpleNamespace(
+        CreateDC=lambda: _FakeDC(log, state.fail_on_page),
+        CreateFont=lambda spec: state.fonts.append(spec["height"]) or spec["height"]))
+    monkeypatch.setattr(printing, "win32con", types.SimpleNamespace(LOGPIXELSX=88, LOGPIXELSY=90))
+    return state
+
+
+def test_copies_are_pages_of_one_document(gdi):
+    fitlines = fit_label(FIELDS)
+    print_label_direct("Label 1", fitlines, copies=3)
+    texts = [entry[1] for entry in gdi.log if entry[0] == "text"]
+    assert texts == [text for text, _ in fitlines] * 3
+    assert [entry[0] for entry in gdi.log].count("doc") == 1 and gdi.log.count(("page",)) == 3
+    assert gdi.log[-2:] == [("end",), ("closed", "Label 1")]
+    # Fonts are created once per size for the whole job, not per copy
+    assert len(gdi.fonts) == len({size for _, size in fitlines})
+
+
+def test_failure_after_the_first_page_is_print_started(gdi):
+    gdi.fail_on_page = 2
+    with pytest.raises(PrintStartedError):
+        print_label_direct("Label 1", fit_label(FIELDS), copies=2)
+    assert gdi.log[-1] == ("closed", "Label 1")
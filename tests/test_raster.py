@@ -0,0 +1,121 @@
+# tests/test_raster.py
+import os
+import json
+
+import numpy as np
+import pytest
+import reportlab
+from PIL import Image
+
+from homeolabel import raster
+from homeolabel.raster import (GlyphCache, RawBitmapBackend, RawRoutingBackend, label_bitmap, pack_rows,
+                               tspl_job, zpl_job)
+from homeolabel.geometry import PROFILES, ProfileStore
+from homeolabel.spooler import PrintJob, FakePrinter, PrintUncertain
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+VERA = os.path.join(os.path.dirname(reportlab.__file__), "fonts", "Vera.ttf")
+FIELDS = ("Nux Vomica", "30C", "4 pills", "Twice daily", "Homeo Mahanagar", "Branch 1 - 98300 00000")
+
+# Regenerate after an intended change, e.g.:
+#   python -m homeolabel.raster "Nux Vomica" 30C "4 pills" "Twice daily" "Homeo Mahanagar" \
+#       "Branch 1 - 98300 00000" --font <reportlab>/fonts/Vera.ttf --profile 38x25 --dpi 300 \
+#       --png tests/golden/label_38x25_300dpi.png
+
+
+def _golden_rows(name):
+    # PNG mode "1": True is white; the label bitmap uses True for a black dot
+    return pack_rows(~np.asarray(Image.open(os.path.join(GOLDEN_DIR, name)).convert("1")))
+
+
+@pytest.mark.parametrize("profile, dpi", [("50x30", 203), ("38x25", 300)])
+def test_label_bitmap_matches_golden(profile, dpi):
+    _, bits = label_bitmap(FIELDS, dpi=dpi, glyphs=GlyphCache(VERA), geometry=PROFILES[profile])
+    packed = pack_rows(bits)
+    golden = _golden_rows(f"label_{profile}_{dpi}dpi.png")
+    assert packed.shape == golden.shape
+    assert np.array_equal(packed, golden)
+
+
+def test_pack_rows_msb_first():
+    bits = np.zeros((2, 10), dtype=bool)
+    bits[0, 0] = bits[0, 9] = True
+    bits[1, 1:8] = True
+    assert pack_rows(bits).tolist() == [[0x80, 0x40], [0x7F, 0x00]]
+
+
+def test_raw_job_framing():
+    bits = np.zeros((16, 20), dtype=bool)
+    bits[0, 0] = True
+    tspl = tspl_job(bits, copies=3)
+    assert tspl.startswith(b"SIZE 50 mm,30 mm\r\n") and b"BITMAP 0,0,3,16,0," in tspl
+    assert tspl.endswith(b"\r\nPRINT 1,3\r\n")
+    assert len(tspl.split(b"BITMAP 0,0,3,16,0,", 1)[1]) == 16 * 3 + len(b"\r\nPRINT 1,3\r\n")
+    assert zpl_job(bits).startswith(b"^XA^PW20^LL16^FO0,0^GFA,48,48,3,80")
+
+
+def test_routing_sends_raw_printers_a_bitmap(monkeypatch, tmp_path):
+    sent = []
+    monkeypatch.setattr(raster, "print_raw", lambda printer, data: sent.append((printer, data)))
+    profiles = ProfileStore(str(tmp_path / "label_profiles.json"))
+    profiles.set_raw("TSC", "tspl", 203)
+    fallback = FakePrinter("pdf")
+    backend = RawRoutingBackend(ProfileStore(profiles.path).raw_settings, fallback, glyphs=GlyphCache(VERA))
+    fitlines, _ = label_bitmap(FIELDS, glyphs=GlyphCache(VERA))
+    raw_job = PrintJob("TSC", "a.pdf", fitlines, copies=2, geometry=PROFILES["50x30"])
+    pdf_job = PrintJob("Office", "b.pdf", fitlines)
+    assert backend.print_job(raw_job) == "raw"
+    assert backend.print_job(pdf_job) == "fake"
+    expected = RawBitmapBackend(203, "tspl", glyphs=GlyphCache(VERA)).build_job(fitlines, copies=2,
+                                                                                geometry=PROFILES["50x30"])
+    assert sent == [("TSC", expected)]
+    assert fallback.jobs == [pdf_job]
+
+
+def test_failed_raw_write_falls_back(tmp_path):
+    # No win32print here: print_raw raises and the PDF chain prints the label
+    path = tmp_path / "label_profiles.json"
+    path.write_text(json.dumps({'raw': {"Zebra": {'format': "zpl", 'dpi': 300}}}), encoding="utf-8")
+    fallback = FakePrinter("pdf")
+    backend = RawRoutingBackend(ProfileStore(str(path)).raw_settings, fallback, glyphs=GlyphCache(VERA))
+    job = PrintJob("Zebra", "a.pdf", [("NUX VOMICA", 9)])
+    assert backend.print_job(job) == "fake" and fallback.jobs == [job]
+    assert backend.backend_for("Zebra").raw_format == "zpl" and backend.backend_for("Zebra").dpi == 300
+
+
+class _FakeWin32Print:
+    # Records the calls; `fail` names the call that raises
+    def __init__(self, fail=None):
+        self.fail = fail
+        self.calls = []
+
+    def __getattr__(self, name):
+        def call(*args):
+            self.calls.append(name)
+            if name == self.fail:
+                raise OSError(f"{name} failed")
+            return "handle" if name == "OpenPrinter" else None
+        return call
+
+
+@pytest.mark.parametrize("fail", ["OpenPrinter", "StartDocPrinter", "StartPagePrinter"])
+def test_raw_error_before_write_falls_back(monkeypatch, fail):
+    fake = _FakeWin32Print(fail)
+    monkeypatch.setattr(raster, "win32print", fake)
+    fallback = FakePrinter("pdf")
+    backend = RawBitmapBackend(203, "tspl", fallback=fallback, glyphs=GlyphCache(VERA))
+    job = PrintJob("TSC", "a.pdf", [("NUX VOMICA", 9)])
+    assert backend.print_job(job) == "fake" and fallback.jobs == [job]
+    assert "WritePrinter" not in fake.calls
+
+
+@pytest.mark.parametrize("fail", ["WritePrinter", "EndPagePrinter", "EndDocPrinter"])
+def test_raw_error_after_write_is_uncertain(monkeypatch, fail):
+    # The data may already be in the spooler: printing it again through the PDF chain could print it twice
+    fake = _FakeWin32Print(fail)
+    monkeypatch.setattr(raster, "win32print", fake)
+    fallback = FakePrinter("pdf")
+    backend = RawBitmapBackend(203, "tspl", fallback=fallback, glyphs=GlyphCache(VERA))
+    with pytest.raises(PrintUncertain):
+        backend.print_job(PrintJob("TSC", "a.pdf", [("NUX VOMICA", 9)]))
+    assert fallback.jobs == [] and fake.calls[-1] == "ClosePrinter"
@@ -0,0 +1,35 @@
+# tests/test_render.py
+import re
+
+from homeolabel.render import render_label_pdf, fit_label
+from homeolabel.geometry import PROFILES
+
+FIELDS = ("Nux Vomica", "30C", "4 pills", "Twice daily", "Homeo Mahanagar", "Branch 1")
+
+
+def _pages(pdf):
+    return len(re.findall(rb"/Type /Page\b(?!s)", pdf))
+
+
+def test_copies_are_pages_of_one_form():
+    fitlines = fit_label(FIELDS)
+    returned, pdf = render_label_pdf(None, fitlines=fitlines, copies=3)
+    assert returned is fitlines
+    assert b"/Count 3" in pdf and _pages(pdf) == 3
+    # The label is drawn once: one form XObject, and every page places that same object
+    assert pdf.count(b"/Subtype /Form") == 1
+    refs = re.findall(rb"/FormXob\.label (\d+ \d+ R)", pdf)
+    assert len(refs) == 3 and len(set(refs)) == 1
+
+
+def test_single_copy_has_no_form():
+    _, pdf = render_label_pdf(None, fitlines=fit_label(FIELDS))
+    assert b"/Count 1" in pdf and _pages(pdf) == 1 and b"/Subtype /Form" not in pdf
+
+
+def test_copies_use_the_profile_page_size(tmp_path):
+    g = PROFILES["38x25"]
+    out = tmp_path / "label.pdf"
+    assert render_label_pdf(None, out=str(out), fitlines=fit_label(FIELDS, geometry=g), copies=2, geometry=g)[1] is None
+    pdf = out.read_bytes()
+    assert pdf.count(b"/MediaBox [ 0 0 107.7165 70.86614 ]") == 2 and _pages(pdf) == 2
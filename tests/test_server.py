@@ -0,0 +1,130 @@
+# tests/test_server.py
+import json
+import asyncio
+
+import pytest
+
+from homeolabel.catalog import CatalogIndex
+from homeolabel.geometry import ProfileStore
+from homeolabel.labelcache import RenderCache
+from homeolabel.server import LabelService, LabelServer, LoopbackClient, SAMPLE_JOB, MAX_SUGGEST_LIMIT, main
+
+ROWS = [("Arnica", "Arnica montana"), ("Bryonia", "Bryonia alba"), ("Belladonna", "Atropa belladonna")]
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+async def _with_server(scenario):
+    server = await LabelServer(LabelService(CatalogIndex(ROWS)), port=0).start()
+    try:
+        return await scenario(server)
+    finally:
+        await server.stop()
+
+
+async def _raw_request(port, data):
+    # For requests LoopbackClient cannot send (it always writes a correct Content-Length)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(data)
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    return int(response.split()[1]), response
+
+
+def test_good_requests_share_one_connection():
+    async def scenario(server):
+        client = LoopbackClient("127.0.0.1", server.port)
+        try:
+            _, health = await client.request("GET", "/health")
+            results = await client.suggest("arn", limit=5)
+            pdf = await client.render(dict(SAMPLE_JOB, copies="2"))
+            lines = json.loads(await client.render(dict(SAMPLE_JOB, format="lines")))
+        finally:
+            await client.close()
+        return json.loads(health), results, pdf, lines, server.requests_served
+
+    health, results, pdf, lines, served = _run(_with_server(scenario))
+    assert health['ok'] and health['remedies'] == 3
+    assert [r['common'] for r in results] == ["Arnica"]
+    assert pdf.startswith(b"%PDF") and b"/Count 2" in pdf  # "2" from JSON is still two pages
+    assert lines['lines'][0][0] == "ARNICA MONTANA"
+    assert served == 4
+
+
+@pytest.mark.parametrize("method, target, body, message", [
+    ("POST", "/render", b'{"medicine": "Arnica", "copies": "two"}', "copies must be an integer"),
+    ("POST", "/render", b'{"copies": [1]}', "copies must be an integer"),
+    ("POST", "/render", b'[1, 2]', "must be a JSON object"),
+    ("POST", "/render", b'{not json', "must be JSON"),
+    ("GET", "/suggest?q=arn&limit=ten", b"", "limit must be an integer"),
+    ("GET", "/suggest?q=arn&limit=0", b"", "limit must be at least 1"),
+    ("GET", "/suggest?q=arn&limit=-3", b"", "limit must be at least 1"),
+    ("POST", "/render", b'{"format": "png"}', "format must be one of"),
+    ("POST", "/render", b'{"profile": "100x100"}', "unknown profile"),
+    ("POST", "/render", b'{"format": "zpl", "dpi": 5}', "dpi must be between"),
+])
+def test_bad_requests_get_400(method, target, body, message):
+    async def scenario(server):
+        client = LoopbackClient("127.0.0.1", server.port)
+        try:
+            with pytest.raises(RuntimeError) as error:
+                await client.request(method, target, body)
+            # The connection stays usable after a 400
+            results = await client.suggest("bry")
+        finally:
+            await client.close()
+        return str(error.value), results
+
+    error, results = _run(_with_server(scenario))
+    assert "returned 400" in error and message in error
+    assert [r['common'] for r in results] == ["Bryonia"]
+
+
+@pytest.mark.parametrize("length", ["abc", "-5"])
+def test_bad_content_length_gets_400(length):
+    request = f"POST /render HTTP/1.1\r\nHost: x\r\nContent-Length: {length}\r\n\r\n{{}}".encode("latin-1")
+    status, response = _run(_with_server(lambda server: _raw_request(server.port, request)))
+    assert status == 400 and b"Content-Length" in response
+
+
+def test_suggest_limit_is_capped():
+    rows = [(f"Remedy {n:03d}", f"Remedy {n:03d}") for n in range(MAX_SUGGEST_LIMIT + 50)]
+    service = LabelService(CatalogIndex(rows))
+    assert len(service.suggest("remedy", limit=10 ** 6)) == MAX_SUGGEST_LIMIT
+    assert len(service.suggest("remedy", limit=3)) == 3
+
+
+def test_render_follows_the_profile_and_raw_formats(tmp_path):
+    profiles = ProfileStore(str(tmp_path / "label_profiles.json"))
+    profiles.assign("Counter 2", "38x25")
+    service = LabelService(CatalogIndex(ROWS), profiles=profiles)
+    _, default_pdf = service.render(dict(SAMPLE_JOB))
+    _, small_pdf = service.render(dict(SAMPLE_JOB, profile="38x25"))
+    _, assigned_pdf = service.render(dict(SAMPLE_JOB, printer="Counter 2"))
+    assert b"/MediaBox [ 0 0 141.7323 85.03937 ]" in default_pdf  # 50 x 30 mm
+    assert b"/MediaBox [ 0 0 107.7165 70.86614 ]" in small_pdf and assigned_pdf == small_pdf
+    # 8 pt is the 38x25 stock's base size
+    _, lines = service.render(dict(SAMPLE_JOB, profile="38x25", format="lines"))
+    assert max(size for _, size in json.loads(lines)['lines']) <= 8
+    content_type, tspl = service.render(dict(SAMPLE_JOB, format="tspl", copies=3))
+    assert content_type == "application/octet-stream"
+    assert tspl.startswith(b"SIZE 50 mm,30 mm") and tspl.endswith(b"PRINT 1,3\r\n")
+    _, zpl = service.render(dict(SAMPLE_JOB, format="zpl", profile="38x25", dpi=300))
+    assert zpl.startswith(b"^XA^PW449^") and zpl.endswith(b"^PQ1^XZ")
+
+
+def test_bench_uses_the_cache_dir(tmp_path, monkeypatch, capsys):
+    import pandas as pd
+    remedies = tmp_path / "remedies.csv"
+    monkeypatch.setattr("homeolabel.server.load_remedies_frame",
+                        lambda path: pd.DataFrame({'common_col': [r[0] for r in ROWS],
+                                                   'latin_col': [r[1] for r in ROWS]}))
+    assert main(["--bench", "--clients", "1", "--requests", "5", "--remedies", str(remedies),
+                 "--cache-dir", str(tmp_path / "cache")]) == 0
+    assert json.loads(capsys.readouterr().out)['count'] == 5
+    assert RenderCache(str(tmp_path / "cache")).stats()['disk_bytes'] > 0
@@ -0,0 +1,124 @@
+# tests/test_snapshot.py
+import os
+import time
+import struct
+
+import numpy as np
+import pytest
+
+from homeolabel.catalog import CatalogIndex
+from homeolabel.snapshot import (save_snapshot, load_snapshot, source_stamp, remove_stale_temp_files,
+                                 SNAPSHOT_VERSION, STALE_TMP_SECONDS)
+
+ROWS = [("Nux vomica", "Strychnos nux-vomica"), ("Arnica", "Arnica montana")]
+STATE = {'autocomplete': {'potency': ["30C", "200C"]}, 'printers': ["Label Printer"], 'printer': "Label Printer"}
+
+
+def _source(tmp_path, content=b"remedies"):
+    path = tmp_path / "remedies.xlsx"
+    path.write_bytes(content)
+    return str(path)
+
+
+def _saved(tmp_path, index, keep=1):
+    remedies = _source(tmp_path)
+    return save_snapshot(str(tmp_path / "warm_start"), {'remedies': source_stamp(remedies)}, STATE, index,
+                         keep=keep)
+
+
+def test_round_trip(tmp_path):
+    # No aliases: alias_names is an empty array, and so is every array of an empty catalog
+    for rows in (ROWS, []):
+        index = CatalogIndex(rows, aliases=[("Nux vom",), ()] if rows else None)
+        path = _saved(tmp_path, index)
+        snap = load_snapshot(str(tmp_path / "warm_start"))
+        assert snap.path == path and snap.state == STATE
+        arrays = index.to_arrays()
+        assert set(snap.arrays) == {"catalog." + name for name in arrays}
+        for name, arr in arrays.items():
+            loaded = snap.arrays["catalog." + name]
+            assert loaded.dtype == arr.dtype and np.array_equal(loaded, arr)
+        warm = snap.catalog_index()
+        assert warm.records() == index.records()
+        assert warm.search_matches("nux") == index.search_matches("nux")
+
+
+def test_empty_alias_array_round_trips(tmp_path):
+    _saved(tmp_path, CatalogIndex(ROWS))
+    snap = load_snapshot(str(tmp_path / "warm_start"))
+    assert snap.arrays["catalog.alias_names"].shape == (0,)
+    assert snap.catalog_index().search("arn") == [("Arnica", "Arnica montana")]
+
+
+def test_snapshot_without_index_has_no_catalog(tmp_path):
+    _saved(tmp_path, None)
+    snap = load_snapshot(str(tmp_path / "warm_start"))
+    assert snap.arrays == {} and snap.catalog_index() is None and snap.state == STATE
+
+
+def test_fresh_follows_the_source_stamp(tmp_path):
+    _saved(tmp_path, CatalogIndex(ROWS))
+    snap = load_snapshot(str(tmp_path / "warm_start"))
+    remedies = str(tmp_path / "remedies.xlsx")
+    assert snap.fresh('remedies', remedies)
+    assert not snap.fresh('autocomplete', remedies)  # never recorded
+    _source(tmp_path, b"remedies, edited")
+    assert not snap.fresh('remedies', remedies)
+    os.remove(remedies)
+    assert not snap.fresh('remedies', remedies)
+
+
+def test_unreadable_newer_files_are_skipped(tmp_path):
+    directory = str(tmp_path / "warm_start")
+    good = _saved(tmp_path, CatalogIndex(ROWS), keep=3)
+    truncated = _saved(tmp_path, CatalogIndex(ROWS), keep=3)
+    with open(truncated, "r+b") as f:
+        f.truncate(os.path.getsize(truncated) // 2)
+    wrong_version = _saved(tmp_path, CatalogIndex(ROWS), keep=3)
+    with open(wrong_version, "r+b") as f:
+        f.seek(8)
+        f.write(struct.pack("<I", SNAPSHOT_VERSION + 1))
+    snap = load_snapshot(directory)
+    assert snap is not None and snap.path == good
+    assert snap.catalog_index().search("nux") == [("Nux vomica", "Strychnos nux-vomica")]
+
+
+def test_load_without_snapshot(tmp_path):
+    assert load_snapshot(str(tmp_path / "missing")) is None
+
+
+def test_save_keeps_only_the_newest(tmp_path):
+    directory = tmp_path / "warm_start"
+    paths = [_saved(tmp_path, CatalogIndex(ROWS), keep=3) for _ in range(3)]
+    assert sorted(os.listdir(directory)) == sorted(os.path.basename(p) for p in paths)
+    newest = _saved(tmp_path, CatalogIndex(ROWS), keep=1)
+    assert os.listdir(directory) == [os.path.basename(newest)]
+    assert load_snapshot(str(directory)).path == newest
+
+
+def test_failed_save_leaves_no_temp_file(tmp_path, monkeypatch):
+    kept = _saved(tmp_path, CatalogIndex(ROWS))
+
+    def disk_full(fd):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(os, "fsync", disk_full)
+    with pytest.raises(OSError):
+        _saved(tmp_path, CatalogIndex(ROWS))
+    assert os.listdir(tmp_path / "warm_start") == [os.path.basename(kept)]
+
+
+def test_stale_temp_files_are_swept(tmp_path):
+    directory = tmp_path / "warm_start"
+    kept = _saved(tmp_path, CatalogIndex(ROWS))
+    stale = directory / "warm_start-1.snap.tmp"
+    fresh = directory / "warm_start-2.snap.tmp"  # maybe another instance's save in progress
+    unrelated = directory / "notes.tmp"
+    for path in (stale, fresh, unrelated):
+        path.write_bytes(b"HLSNAP")
+    old = time.time() - STALE_TMP_SECONDS - 1
+    os.utime(stale, (old, old))
+    os.utime(unrelated, (old, old))
+    assert remove_stale_temp_files(str(directory)) == 1
+    assert sorted(os.listdir(directory)) == sorted([os.path.basename(kept), fresh.name, unrelated.name])
+    assert remove_stale_temp_files(str(tmp_path / "missing")) == 0
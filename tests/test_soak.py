@@ -0,0 +1,48 @@
+# tests/test_soak.py
+import os
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from homeolabel.memwatch import MemoryWatch
+from homeolabel.loadtest import run_load_test, SOAK_MAX_GROWTH_MB, SOAK_MAX_QT_GROWTH
+
+# The traced 250-session run takes ~95 s: opt in with HOMEOLABEL_SOAK=1 (python -m homeolabel.loadtest
+# --soak is the real check). The untraced run is marked slow: deselect it with -m "not slow"
+SOAK = os.environ.get("HOMEOLABEL_SOAK", "").lower() in ("1", "true", "yes")
+
+
+def _soak(tmp_path, sessions, warmup, sample_every, frames=1):
+    memwatch = MemoryWatch(str(tmp_path / "memory_report.txt"), frames=frames).start()
+    try:
+        summary = run_load_test(sessions=sessions, catalog_rows=500, keystroke_ms=0.0,
+                                workdir=str(tmp_path / "run"), memwatch=memwatch, warmup=warmup,
+                                sample_every=sample_every)
+    finally:
+        memwatch.stop()
+    return summary, memwatch
+
+
+@pytest.mark.slow
+def test_soak_growth_is_bounded_untraced(tmp_path):
+    # Enough sessions after the warm-up for a leak per session to show; RSS and Qt counts only
+    # (tracing alone costs ~40 s), checked against the same limits as loadtest --soak --trace-frames 0
+    summary, memwatch = _soak(tmp_path, sessions=60, warmup=20, sample_every=10, frames=0)
+    assert summary['lost_sessions'] == 0 and summary['extra_jobs'] == 0
+    assert len(memwatch.samples) == 6  # after the warm-up, every 10 sessions, at the end
+    growth = memwatch.growth()
+    assert growth['rss_mb'] <= SOAK_MAX_GROWTH_MB, open(memwatch.report_path).read()
+    assert growth['qt_objects'] <= SOAK_MAX_QT_GROWTH, open(memwatch.report_path).read()
+
+
+@pytest.mark.slow
+@pytest.mark.skipif(not SOAK, reason="set HOMEOLABEL_SOAK=1 to run the long soak test")
+def test_soak_memory_stays_bounded(tmp_path):
+    # A shorter loadtest --soak: the real window, 250 sessions, growth measured after a warm-up
+    summary, memwatch = _soak(tmp_path, sessions=250, warmup=50, sample_every=50)
+    assert summary['lost_sessions'] == 0 and summary['extra_jobs'] == 0
+    assert len(memwatch.samples) == 6  # after the warm-up, every 50 sessions, at the end
+    growth = memwatch.growth()
+    assert growth['traced_mb'] <= SOAK_MAX_GROWTH_MB, open(memwatch.report_path).read()
+    assert growth['qt_objects'] <= SOAK_MAX_QT_GROWTH, open(memwatch.report_path).read()
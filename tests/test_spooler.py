@@ -0,0 +1,132 @@
+# tests/test_spooler.py
+import time
+import asyncio
+from collections import Counter
+
+import pytest
+
+from homeolabel.spooler import PrintSpooler, PrintJob, FakePrinter, PrintUncertain
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def _spooler(printer, **kw):
+    kw.setdefault('timeout', 5.0)
+    kw.setdefault('backoff_base', 0.05)
+    kw.setdefault('jitter', 0.0)
+    return PrintSpooler(printer, **kw)
+
+
+def _prints(*printers):
+    return Counter(job.job_id for p in printers for job in p.jobs)
+
+
+def test_retry_with_backoff_then_success():
+    printer = FakePrinter("p")
+    printer.fail_next(2)
+
+    async def scenario():
+        spooler = _spooler(printer, max_retries=3)
+        job = PrintJob("p", label="a")
+        start = time.monotonic()
+        done = await (await spooler.submit(job))
+        elapsed = time.monotonic() - start
+        metrics = spooler.metrics()["p"]
+        await spooler.close()
+        return done, elapsed, metrics
+
+    job, elapsed, metrics = _run(scenario())
+    assert job.state == "printed" and job.attempts == 3
+    assert elapsed >= 0.05 + 0.1  # backoff 0.05 then 0.1
+    assert metrics['retried'] == 2 and metrics['failed_attempts'] == 2 and metrics['completed'] == 1
+    assert _prints(printer) == {job.job_id: 1}
+
+
+def test_dead_letter_after_retries():
+    printer = FakePrinter("p")
+    printer.fail_next(10)
+
+    async def scenario():
+        spooler = _spooler(printer, max_retries=2)
+        job = PrintJob("p")
+        with pytest.raises(RuntimeError):
+            await (await spooler.submit(job))
+        metrics = spooler.metrics()["p"]
+        dead = list(spooler.dead_letters)
+        await spooler.close()
+        return job, metrics, dead
+
+    job, metrics, dead = _run(scenario())
+    assert dead == [job] and job.state == "dead" and job.attempts == 3
+    assert metrics['dead'] == 1 and metrics['retried'] == 2
+    assert printer.jobs == []
+
+
+def test_queue_depth_metrics_while_stalled():
+    printer = FakePrinter("p")
+    printer.stall()
+
+    async def scenario():
+        spooler = _spooler(printer)
+        futures = [await spooler.submit(PrintJob("p")) for _ in range(3)]
+        await asyncio.sleep(0.1)
+        stalled = (spooler.queue_depth("p"), dict(spooler.metrics()["p"]))
+        printer.resume()
+        await asyncio.gather(*futures)
+        drained = (spooler.queue_depth("p"), dict(spooler.metrics()["p"]))
+        await spooler.close()
+        return stalled, drained
+
+    (depth, metrics), (depth_after, metrics_after) = _run(scenario())
+    assert depth == 3 and metrics['in_flight'] == 1 and metrics['queued'] == 2
+    assert depth_after == 0 and metrics_after['completed'] == 3 and metrics_after['queued'] == 0
+
+
+def test_stall_timeout_is_unconfirmed_not_reprinted():
+    # The stalled call is still running when the attempt times out: retrying would print twice
+    printer = FakePrinter("p")
+    printer.stall()
+
+    async def scenario():
+        spooler = _spooler(printer, timeout=0.2, max_retries=3)
+        job = PrintJob("p")
+        with pytest.raises(PrintUncertain):
+            await (await spooler.submit(job))
+        assert job.state == "unconfirmed" and spooler.unconfirmed == [job]
+        printer.resume()
+        await asyncio.sleep(0.2)
+        metrics = spooler.metrics()["p"]
+        await spooler.close()
+        return job, metrics
+
+    job, metrics = _run(scenario())
+    assert _prints(printer) == {job.job_id: 1}
+    assert job.attempts == 1 and metrics['retried'] == 0
+    assert metrics['unconfirmed'] == 1 and metrics['late_printed'] == 1 and job.state == "printed"
+
+
+def test_attempt_that_never_started_is_retried_once_printer_recovers():
+    # Both printer threads are held by stalled calls, so the third job's attempt never starts:
+    # that timeout is safe to retry, and every label still prints exactly once
+    printer = FakePrinter("p")
+    printer.stall()
+
+    async def scenario():
+        spooler = _spooler(printer, timeout=0.3, max_retries=3, max_in_flight=1)
+        jobs = [PrintJob("p") for _ in range(3)]
+        futures = [await spooler.submit(job) for job in jobs]
+        await asyncio.sleep(1.0)
+        printer.resume()
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        await asyncio.sleep(0.2)
+        metrics = spooler.metrics()["p"]
+        await spooler.close()
+        return jobs, results, metrics
+
+    jobs, results, metrics = _run(scenario())
+    assert isinstance(results[0], PrintUncertain) and isinstance(results[1], PrintUncertain)
+    assert results[2] is jobs[2] and jobs[2].attempts >= 2
+    assert _prints(printer) == {job.job_id: 1 for job in jobs}
+    assert metrics['late_printed'] == 2
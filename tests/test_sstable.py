@@ -0,0 +1,96 @@
+# tests/test_sstable.py
+import pandas as pd
+
+from homeolabel.catalog import frame_rows, diff_rows, ALIAS_COL
+from homeolabel.sstable import write_string_table
+
+RECORDS = [("Nux vomica", "Strychnos nux-vomica", ("Nux vom", "Nux-v")),
+           ("Arnica", "Arnica montana", ()),
+           ("Natrum muriaticum", "Natrum muriaticum", ("Nat mur",))]
+
+
+def _table(tmp_path, records=RECORDS):
+    source = tmp_path / "remedies.xlsx"
+    if not source.exists():
+        source.write_bytes(b"remedies")
+    return write_string_table(str(tmp_path / "tables"), records, str(source))
+
+
+def test_has_name_matches_whole_names_only(tmp_path):
+    table = _table(tmp_path)
+    try:
+        assert table.has_name("nux VOMICA") and table.has_name("Arnica Montana") and table.has_name("Nat. mur")
+        # "vomica" is a word start of Nux vomica, "Nux" only a prefix: neither is a remedy name
+        assert not table.has_name("vomica") and not table.has_name("Nux") and not table.has_name("")
+    finally:
+        table.close()
+
+
+def test_search_matches_word_starts_not_substrings(tmp_path):
+    table = _table(tmp_path)
+    try:
+        assert table.search("vom") == [("Nux vomica", "Strychnos nux-vomica")]
+        assert table.search("omica") == [] and table.search("") == []
+        assert table.match_mode == "word start"
+    finally:
+        table.close()
+
+
+def test_alias_hit_is_reported_with_the_alias(tmp_path):
+    table = _table(tmp_path, RECORDS + [("Lycopodium", "Lycopodium clavatum", ("Club moss",))])
+    try:
+        assert table.search_matches("club") == [(("Lycopodium", "Lycopodium clavatum"), "Club moss")]
+        # The remedy's own name matches too: no alias is shown
+        assert table.search_matches("lyco") == [(("Lycopodium", "Lycopodium clavatum"), None)]
+    finally:
+        table.close()
+
+
+def test_one_hit_per_remedy(tmp_path):
+    # "nux" is a word start of the common and latin names and of both aliases
+    table = _table(tmp_path)
+    try:
+        assert table.search_matches("nux") == [(("Nux vomica", "Strychnos nux-vomica"), None)]
+        assert table.search("nat") == [("Natrum muriaticum", "Natrum muriaticum")]
+    finally:
+        table.close()
+
+
+def test_limit_over_a_wide_prefix(tmp_path):
+    # 300 keys per remedy: the first window of the range holds a single remedy and has to grow
+    records = [(f"Remedy {n:03d}", f"Remedy {n:03d}", tuple(f"Remedy {n:03d} x{a}" for a in range(300)))
+               for n in range(20)]
+    table = _table(tmp_path, records)
+    try:
+        everything = table.search("remedy")
+        assert len(everything) == 20 and everything[0] == ("Remedy 000", "Remedy 000")
+        for limit in (1, 5, 20, 50):
+            assert table.search("remedy", limit=limit) == everything[:limit]
+    finally:
+        table.close()
+
+
+def test_fresh_follows_the_source_file(tmp_path):
+    table = _table(tmp_path)
+    try:
+        source = str(tmp_path / "remedies.xlsx")
+        assert table.fresh(source)
+        (tmp_path / "remedies.xlsx").write_bytes(b"remedies, edited")
+        assert not table.fresh(source)
+        assert not table.fresh(str(tmp_path / "missing.xlsx"))
+    finally:
+        table.close()
+
+
+def test_records_round_trip_through_frame_rows(tmp_path):
+    df = pd.DataFrame({'common_col': ["Nux vomica", "Arnica", "Arnica"],
+                       'latin_col': ["Strychnos nux-vomica", "Arnica montana", "Arnica montana"],
+                       ALIAS_COL: ["Nux vom; Nux-v", "", "Leopard's bane"]})
+    rows = frame_rows(df)
+    table = _table(tmp_path, rows)
+    try:
+        assert table.records() == rows
+        assert diff_rows(rows, table.records()) == ([], [])
+        assert len(table) == 3
+    finally:
+        table.close()